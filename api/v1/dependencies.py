@@ -1,8 +1,8 @@
 from fastapi import Depends
 from httpx import AsyncClient
 from services.telegram_service import TelegramService
-from services.google_service import GoogleService
-from services.openai_service import OpenAIService
+from services.google_service import GoogleService, get_shared_google_service
+from services.openai_service import OpenAIService, get_shared_openai_service
 from utils.http_client import get_http_client
 from typing import AsyncGenerator
 
@@ -10,7 +10,7 @@ def get_telegram_service(client: AsyncClient = Depends(get_http_client)) -> Tele
     return TelegramService(client)
 
 def get_google_service() -> GoogleService:
-    return GoogleService()
+    return get_shared_google_service()
 
 def get_openai_service() -> OpenAIService:
-    return OpenAIService()
+    return get_shared_openai_service()
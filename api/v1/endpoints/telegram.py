@@ -1,55 +1,25 @@
 from fastapi import APIRouter, Body, HTTPException, Depends
 from models.telegram_models import Update
 from services.telegram_service import TelegramService
+from services.telegram_outbox import telegram_outbox
 from services.google_service import GoogleService
 from services.openai_service import OpenAIService
+from services.update_queue import update_queue, process_in_chat_order, QueueFullError
+from services.update_deduplicator import update_deduplicator
+from services.update_poller import update_poller
+from services.transcription_cache import transcription_cache
+from core.semantic_cache import semantic_cache
+from services.conversation_memory import conversation_memory
+from services.scheduler_service import scheduler_stats
+from services.issue_tracker import get_issue_tracker
 from core.config import settings
-from core.agent_graph import process_telegram_update
+from utils.http_client import HttpClient
+from utils.metrics import WEBHOOK_LATENCY, observe_latency
 from api.v1.dependencies import get_telegram_service, get_google_service, get_openai_service
 import logging
-import tempfile
-import os
 
 router = APIRouter()
 
-async def _transcribe_voice_message(
-    update: Update,
-    telegram_service: TelegramService,
-    google_service: GoogleService,
-    openai_service: OpenAIService,
-) -> str | None:
-    if not update.message or not update.message.voice:
-        return None
-
-    file_id = update.message.voice.file_id
-    file_path = await telegram_service.get_file_path(file_id)
-    if not file_path:
-        logging.error("Could not retrieve file path for voice message.")
-        return "[Could not retrieve voice message]"
-
-    audio_content = await telegram_service.download_file(file_path)
-    if not audio_content:
-        logging.error("Could not download voice message.")
-        return "[Could not download voice message]"
-
-    logging.info(f"Transcription provider: {settings.LLM_PROVIDER}")
-
-    if settings.LLM_PROVIDER == "google":
-        return await google_service.transcribe_audio(audio_content)
-    elif settings.LLM_PROVIDER == "openai":
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_audio_file:
-            temp_audio_file.write(audio_content)
-            temp_audio_path = temp_audio_file.name
-        
-        try:
-            transcription = await openai_service.transcribe_audio(temp_audio_path)
-            return transcription.text
-        finally:
-            os.remove(temp_audio_path)
-    else:
-        logging.warning(f"Unsupported transcription provider: {settings.LLM_PROVIDER}")
-        return "[Unsupported transcription provider]"
-
 @router.post("/telegram/webhook", summary="Telegram Webhook")
 async def telegram_webhook(
     update: Update = Body(...),
@@ -59,43 +29,54 @@ async def telegram_webhook(
 ):
     """
     Handles incoming updates from the Telegram webhook.
+    In 'queue' mode the update is acknowledged immediately and processed by background workers.
+    Redelivered updates are short-circuited by update_id before any processing.
+    Updates of the same chat are processed one at a time, in arrival order, in both modes.
     """
-    chat_id = None
-    message_text = None
-    message_type = "unsupported"
+    with observe_latency(WEBHOOK_LATENCY, mode=settings.UPDATE_PROCESSING_MODE, status="") as labels:
+        if settings.UPDATE_PROCESSING_MODE == "queue":
+            if update_deduplicator.begin(update.update_id) is not None:
+                logging.info(f"Ignoring duplicate update {update.update_id}.")
+                labels["status"] = "duplicate"
+                return {"status": "duplicate"}
+            try:
+                await update_queue.enqueue(update)
+            except QueueFullError as e:
+                update_deduplicator.fail(update.update_id, e)
+                logging.warning(f"Rejecting update {update.update_id}: {e}")
+                labels["status"] = "rejected"
+                # A non-2xx response makes Telegram redeliver the update later.
+                raise HTTPException(status_code=503, detail="Update queue is full")
+            labels["status"] = "queued"
+            return {"status": "queued"}
 
-    if update.message:
-        chat_id = update.message.chat.id
-        if update.message.text:
-            message_text = update.message.text
-            message_type = "text"
-        elif update.message.voice:
-            message_text = await _transcribe_voice_message(
-                update, telegram_service, google_service, openai_service
-            )
-            message_type = "voice"
-        else:
-            logging.info("Unsupported message type.")
-            message_text = "[Unsupported message type]"
-    
-    if not chat_id or not message_text or message_type == "unsupported":
-        if chat_id:
-            await telegram_service.send_message(chat_id, "I received your message, but could not process it.")
-        return {"status": "received_but_not_processed"}
+        try:
+            status, is_duplicate = await process_in_chat_order(update, telegram_service, google_service, openai_service)
+        except Exception:
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+        labels["status"] = "duplicate" if is_duplicate else status
+        return {"status": labels["status"]}
 
-    try:
-        agent_response = await process_telegram_update(message_text, message_type)
-        if agent_response:
-            await telegram_service.send_message(chat_id, agent_response)
-        return {"status": "ok"}
-    except Exception as e:
-        logging.error(f"Error processing Telegram update: {e}", exc_info=True)
-        if chat_id:
-            try:
-                await telegram_service.send_message(chat_id, f"An internal error occurred: {e}")
-            except Exception as send_error:
-                logging.error(f"Failed to send error message to Telegram: {send_error}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+@router.get("/telegram/queue/stats", summary="Update Queue Statistics")
+async def queue_stats():
+    """
+    Returns depth, wait time and per-stage latency statistics of the background update queue,
+    along with update deduplication, file download and cache counters.
+    """
+    return {
+        **update_queue.stats(),
+        "deduplication": update_deduplicator.stats(),
+        "downloads": TelegramService.download_stats.snapshot(),
+        "streaming": TelegramService.streaming_stats.snapshot(),
+        "outbox": telegram_outbox.stats(),
+        "http_pool": HttpClient.pool_stats(),
+        "poller": update_poller.stats() if settings.INGESTION_MODE == "polling" else None,
+        "transcription_cache": transcription_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "conversation_memory": conversation_memory.stats() if conversation_memory else None,
+        "scheduler": scheduler_stats(),
+        "issues": get_issue_tracker().stats(),
+    }
 
 @router.get("/telegram/health", summary="Health Check")
 async def health_check():
@@ -0,0 +1,15 @@
+"""
+Benchmarks of the hot paths, run from the repository root, e.g. `python -m benchmarks.bench_message_setup`.
+External services are replaced by the in-process fakes of tests.fakes, so no credentials or
+network access are needed.
+"""
+import os
+import tempfile
+
+# Same dummy settings and scratch working directory as the test suite (see tests/conftest.py)
+os.environ.setdefault("telegram_token", "bench-token")
+os.environ.setdefault("OPENAI_API_KEY", "bench-openai-key")
+os.environ.setdefault("GOOGLE_API_KEY", "bench-google-key")
+os.environ.setdefault("TELEGRAM_WEBHOOK_URL", "https://bot.example.test/api/v1/telegram/webhook")
+os.environ.setdefault("TELEGRAM_API_BASE_URL", "http://telegram.test")
+os.chdir(tempfile.mkdtemp(prefix="assistant-bench-"))
@@ -0,0 +1,64 @@
+"""
+Latency of the schedule_appointment tool with a Calendar service built for every call (before:
+token.json is read and the API client is built each time) versus the pooled, thread-local service
+of CalendarServicePool (after). The Calendar API is a FakeCalendarBackend with a fixed round-trip
+latency, so the difference is the client setup cost.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import benchmarks  # noqa: F401  (dummy settings)
+import core.tools
+from services.calendar_service import CalendarService, CalendarServicePool
+from tests.fakes.calendar_api import FakeCalendarBackend
+
+def write_token_file():
+    # An unexpired access token: the credentials are loaded from disk but never refreshed
+    expiry = (datetime.now(timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with open("token.json", "w") as token:
+        json.dump({
+            "token": "fake-access-token",
+            "refresh_token": "fake-refresh-token",
+            "client_id": "fake-client-id",
+            "client_secret": "fake-client-secret",
+            "expiry": expiry,
+        }, token)
+
+def measure(calls: int) -> list:
+    timings = []
+    for i in range(calls):
+        started_at = time.perf_counter()
+        result = core.tools.schedule_appointment(f"Site visit {i}", "2030-03-04", "10:00", 30)
+        timings.append(time.perf_counter() - started_at)
+        assert result["status"] == "success", result
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    write_token_file()
+    backend = FakeCalendarBackend(latency=args.latency_ms / 1000)
+    pool = CalendarServicePool(http_factory=backend.http)
+    variants = {
+        "before (built per call)": lambda: CalendarService(creds=CalendarService._authenticate(), mirror=None, http=backend.http()),
+        "after (pooled)": pool.get,
+    }
+    print(f"Calendar API round trip: {args.latency_ms:.1f} ms")
+    for name, get_calendar_service in variants.items():
+        core.tools.get_calendar_service = get_calendar_service
+        timings = measure(args.calls)
+        print(
+            f"{name:24s} mean {statistics.mean(timings) * 1000:8.2f} ms"
+            f"  p50 {statistics.median(timings) * 1000:8.2f} ms"
+            f"  p95 {statistics.quantiles(timings, n=20)[-1] * 1000:8.2f} ms"
+        )
+    pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+LLM calls, tokens and wall time of the daily email digest on a synthetic inbox: one LLM call per
+email (before) versus token-budgeted batches of emails classified by one structured-output call
+(after, EmailDigest defaults). The LLM is a FakeDigestModel whose latency grows with the length
+of its answer; some calls fail and some answers leave an email out, exercising the retries.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import benchmarks  # noqa: F401  (dummy settings)
+from benchmarks.synthetic_inbox import synthetic_messages
+from core.config import settings
+from services.email_digest import EmailDigest, reduce_digest
+from tests.fakes.llm import FakeDigestModel
+
+async def run(name: str, messages, llm: FakeDigestModel, **digest_options):
+    digest = EmailDigest(llm=llm, **digest_options)
+    started_at = time.perf_counter()
+    # Chunks of GMAIL_BATCH_SIZE messages are digested concurrently, as in build_daily_summary
+    parts = await asyncio.gather(*(
+        digest.summarize(messages[offset:offset + settings.GMAIL_BATCH_SIZE])
+        for offset in range(0, len(messages), settings.GMAIL_BATCH_SIZE)
+    ))
+    elapsed = time.perf_counter() - started_at
+    daily_summary = reduce_digest(parts)
+    assert daily_summary.total_emails_processed == len(messages)
+    print(
+        f"{name:28s} {llm.calls:5d} LLM calls  {llm.input_tokens:8d} input + {llm.output_tokens:7d} output tokens"
+        f"  = {llm.input_tokens + llm.output_tokens:8d}  wall {elapsed:6.2f} s"
+    )
+    print(f"{'':28s} {digest.stats()}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fixed latency of every LLM call")
+    parser.add_argument("--per-output-token-ms", type=float, default=0.2, help="Added latency per output token")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--omit-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    # The injected failures are expected; their warnings would drown the results
+    logging.disable(logging.WARNING)
+
+    messages = synthetic_messages(args.emails)
+    print(f"{len(messages)} emails, {settings.EMAIL_SUMMARY_CONCURRENCY} concurrent LLM calls")
+    variants = {
+        "before (one call per email)": {"max_batch_emails": 1},
+        "after (batched)": {},
+    }
+    for name, options in variants.items():
+        llm = FakeDigestModel(
+            latency=args.latency_ms / 1000,
+            per_output_token=args.per_output_token_ms / 1000,
+            fail_rate=args.fail_rate,
+            omit_rate=args.omit_rate,
+            seed=3,
+        )
+        await run(name, messages, llm, **options)
+
+if __name__ == "__main__":
+    asyncio.run(main())
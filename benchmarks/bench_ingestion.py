@@ -0,0 +1,96 @@
+"""
+Update ingestion throughput: webhook deliveries (one POST per update, 20 concurrent connections
+like Telegram's default max_connections) versus getUpdates long polling (batches of up to
+TELEGRAM_POLL_LIMIT updates). Both the app and a fake Bot API are served by uvicorn on local
+ports, on the benchmark's event loop (the update queue is bound to it); update processing is
+stubbed out, so only ingestion is measured.
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+import httpx
+
+import benchmarks  # noqa: F401  (dummy settings)
+import services.update_queue
+from core.config import settings
+from main import app
+from services.update_poller import UpdatePoller
+from services.update_queue import update_queue
+from tests.fakes.telegram_api import FakeTelegramAPI, serve_in_loop, text_update
+
+WEBHOOK_CONNECTIONS = 20
+
+processed = []
+
+async def stub_process_update(update, *args, **kwargs):
+    processed.append(update.update_id)
+    return "ok"
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+async def wait_processed(count: int):
+    while len(processed) < count:
+        await asyncio.sleep(0.005)
+
+async def bench_webhook(app_url: str, updates: int):
+    payloads = [text_update(100000 + i, i % 50, f"message {i}") for i in range(updates)]
+    processed.clear()
+    started_at, cpu_started_at = time.perf_counter(), cpu_seconds()
+    async with httpx.AsyncClient(base_url=app_url, timeout=120) as client:
+        semaphore = asyncio.Semaphore(WEBHOOK_CONNECTIONS)
+
+        async def post(payload):
+            async with semaphore:
+                response = await client.post("/api/v1/telegram/webhook", json=payload)
+                assert response.status_code == 200, response.text
+        await asyncio.gather(*(post(payload) for payload in payloads))
+    await wait_processed(updates)
+    print(
+        f"webhook: {updates} updates in {time.perf_counter() - started_at:6.2f} s,"
+        f" process CPU {cpu_seconds() - cpu_started_at:6.2f} s (includes the sending client)"
+    )
+
+async def bench_polling(telegram: FakeTelegramAPI, updates: int):
+    telegram.add_updates([text_update(i, i % 50, f"message {i}") for i in range(1, updates + 1)])
+    processed.clear()
+    poller = UpdatePoller(poll_timeout=1)
+    started_at, cpu_started_at = time.perf_counter(), cpu_seconds()
+    poller.start()
+    await wait_processed(updates)
+    while poller.offset != updates + 1:
+        await asyncio.sleep(0.005)
+    getupdates_calls = sum(1 for call in telegram.calls if call["method"] == "getUpdates")
+    print(
+        f"polling: {updates} updates in {time.perf_counter() - started_at:6.2f} s,"
+        f" process CPU {cpu_seconds() - cpu_started_at:6.2f} s (includes the fake Bot API);"
+        f" {getupdates_calls} getUpdates calls"
+    )
+    print(poller.stats())
+    await poller.stop()
+
+async def run(updates: int):
+    telegram = FakeTelegramAPI()
+    async with serve_in_loop(telegram.asgi_app()) as telegram_url, serve_in_loop(app) as app_url:
+        settings.TELEGRAM_API_BASE_URL = telegram_url
+        update_queue.start()
+        try:
+            await bench_webhook(app_url, updates)
+            await bench_polling(telegram, updates)
+        finally:
+            await update_queue.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=3000)
+    args = parser.parse_args()
+
+    services.update_queue.process_update = stub_process_update
+    settings.UPDATE_QUEUE_MAX_SIZE = max(settings.UPDATE_QUEUE_MAX_SIZE, args.updates)
+    asyncio.run(run(args.updates))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Issue tracker at scale: a database with months of reports over many sites, then the cost of
+recording a report (deduplicated against the open issues of its site) and of building the daily
+briefing with briefing_rows(). The query plans show which indexes the two queries use.
+"""
+import argparse
+import random
+import time
+
+import benchmarks  # noqa: F401  (dummy settings)
+from models.openai_models import ConstructionIssue
+from services.issue_tracker import DEDUP_MAX_CANDIDATES, IssueTracker, format_briefing
+
+WORDS = (
+    "crack leak concrete rebar formwork crane pump water scaffold rail door window pipe wire dust noise "
+    "delay delivery paint tile"
+).split()
+
+def load(tracker: IssueTracker, days: int, sites: int, per_day: int, seed: int = 5) -> int:
+    """
+    Inserts per_day reports per site for each of the last `days` days (one in ten urgent).
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    rows = []
+    for day in range(days):
+        for site in range(sites):
+            for number in range(per_day):
+                reported_at = now - day * 86400 - rng.random() * 86400
+                description = " ".join(rng.sample(WORDS, 6))
+                rows.append((
+                    f"Site {site}", f"Site {site}, Block {number % 7}", "urgent" if rng.random() < 0.1 else "routine",
+                    description, "Site manager", "Inspect", " ".join(sorted(set(description.split()))), reported_at, reported_at,
+                ))
+    with tracker._lock:
+        tracker._conn.executemany(
+            "INSERT INTO issues (site, location, urgency, description, reported_by, action_required, terms, "
+            "reported_at, last_reported_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        tracker._conn.commit()
+    return len(rows)
+
+def query_plan(tracker: IssueTracker, sql: str, parameters: tuple) -> str:
+    with tracker._lock:
+        return "; ".join(row[-1] for row in tracker._conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--per-day", type=int, default=300, help="Reports per site and day")
+    parser.add_argument("--reports", type=int, default=200, help="Timed record() calls")
+    args = parser.parse_args()
+
+    tracker = IssueTracker("issues_benchmark.sqlite3")
+    started_at = time.perf_counter()
+    rows = load(tracker, args.days, args.sites, args.per_day)
+    print(f"loaded {rows} issues in {time.perf_counter() - started_at:.1f} s")
+
+    now = time.time()
+    print("dedup plan:", query_plan(
+        tracker,
+        "SELECT id, terms FROM issues WHERE site = ? AND status = 'open' AND last_reported_at >= ? "
+        "ORDER BY last_reported_at DESC LIMIT ?",
+        ("Site 3", now - tracker.dedup_window_seconds, DEDUP_MAX_CANDIDATES),
+    ))
+    print("briefing plan:", query_plan(
+        tracker,
+        "SELECT id FROM issues WHERE status = 'open' AND urgency = 'routine' AND last_reported_at >= ? AND last_reported_at < ?",
+        (now - 86400, now),
+    ))
+
+    started_at = time.perf_counter()
+    for number in range(args.reports):
+        tracker.record(ConstructionIssue(
+            urgency="routine", description=f"Unique issue number {number} with the crane pump",
+            location="Site 3, Block 1", reported_by="Site manager", action_required="Inspect",
+        ))
+    per_report = (time.perf_counter() - started_at) / args.reports
+    print(f"record(): {per_report * 1000:.2f} ms per report (up to {DEDUP_MAX_CANDIDATES} open candidates compared)")
+
+    for span_days in (1, 7):
+        started_at = time.perf_counter()
+        for _ in range(10):
+            briefing = tracker.briefing_rows(now - span_days * 86400, now + 10, 15)
+        elapsed = (time.perf_counter() - started_at) / 10
+        total = sum({issue.site: site_total for issue, site_total in briefing}.values())
+        print(f"briefing_rows({span_days}d): {elapsed * 1000:.1f} ms, {len(briefing)} issues listed of {total}")
+    text = format_briefing(tracker.briefing_rows(now - 86400, now + 10, 15), now)
+    print(f"briefing message: {len(text)} characters")
+    tracker.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-message setup overhead of the agent: building the LLM client and the tool-bound router for
+every message (before) versus reusing the ones cached by llm_registry (after).
+No request is sent; only the construction cost is measured.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import benchmarks  # noqa: F401  (dummy settings)
+from core.config import settings
+from core.llm_provider import _build_llm_model, get_llm_model, get_router_chain
+from core.tools import TOOLS
+from prompts.router_prompt import ROUTER_PROMPT
+
+def setup_before():
+    http_async_client = httpx.AsyncClient()
+    llm = _build_llm_model(settings.LLM_PROVIDER, http_async_client)
+    chain = ROUTER_PROMPT | llm.bind_tools(TOOLS)
+    return http_async_client, chain
+
+def setup_after():
+    llm = get_llm_model()
+    return None, get_router_chain(llm)
+
+async def measure(setup, messages: int) -> list:
+    timings = []
+    for _ in range(messages):
+        started_at = time.perf_counter()
+        http_async_client, _ = setup()
+        timings.append(time.perf_counter() - started_at)
+        if http_async_client is not None:
+            await http_async_client.aclose()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    settings.LLM_PROVIDER = "openai"
+
+    for name, setup in (("before (per message)", setup_before), ("after (cached)", setup_after)):
+        timings = asyncio.run(measure(setup, args.messages))
+        print(
+            f"{name:22s} mean {statistics.mean(timings) * 1000:8.3f} ms"
+            f"  p50 {statistics.median(timings) * 1000:8.3f} ms"
+            f"  max {max(timings) * 1000:8.3f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
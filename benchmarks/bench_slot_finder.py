@@ -0,0 +1,76 @@
+"""
+Free-slot search over synthetic calendars: dozens of attendees with thousands of busy blocks over
+a weeks-long window. The sweep in utils.slot_finder is compared with a naive scan that checks
+every aligned candidate start against every busy block.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, time as clock, timedelta
+from zoneinfo import ZoneInfo
+
+import benchmarks  # noqa: F401  (dummy settings)
+from utils.slot_finder import find_free_slots, merge_busy_intervals, working_windows
+
+TZ = ZoneInfo("Europe/Rome")
+MEETINGS_PER_DAY = 4
+WINDOW_START = datetime(2030, 3, 4, tzinfo=TZ)
+
+def synthetic_calendars(attendees: int, blocks_per_calendar: int, days: int, seed: int = 7):
+    """
+    Busy blocks of 15 minutes to 2 hours drawn from a few shared meetings per day (as in a team
+    whose members attend the same meetings), so the merged calendar still has free time.
+    """
+    rng = random.Random(seed)
+    meetings = []
+    for day in range(days):
+        for _ in range(MEETINGS_PER_DAY):
+            start = WINDOW_START + timedelta(days=day, minutes=15 * rng.randrange(28, 76))
+            meetings.append((start, start + timedelta(minutes=15 * rng.randint(1, 8))))
+    return [sorted(rng.choice(meetings) for _ in range(blocks_per_calendar)) for _ in range(attendees)]
+
+def naive_free_slots(calendars, window_start, window_end, duration, tz, align=timedelta(minutes=15)):
+    busy = [block for calendar in calendars for block in calendar]
+    slots = []
+    for day_start, day_end in working_windows(window_start, window_end, tz, clock(8), clock(18), (0, 1, 2, 3, 4)):
+        cursor = day_start
+        while cursor + duration <= day_end:
+            if all(end <= cursor or start >= cursor + duration for start, end in busy):
+                slots.append((cursor, cursor + duration))
+                cursor += duration
+            else:
+                cursor += align
+    return slots
+
+def run(attendees: int, blocks_per_calendar: int, days: int, naive: bool):
+    calendars = synthetic_calendars(attendees, blocks_per_calendar, days)
+    window_end = WINDOW_START + timedelta(days=days)
+    duration = timedelta(minutes=30)
+
+    started_at = time.perf_counter()
+    busy = merge_busy_intervals(calendars)
+    slots = find_free_slots(busy, WINDOW_START, window_end, duration, TZ)
+    sweep_seconds = time.perf_counter() - started_at
+
+    line = (
+        f"{attendees:4d} calendars x {blocks_per_calendar:4d} blocks over {days:3d} days:"
+        f" sweep {sweep_seconds * 1000:9.2f} ms ({len(slots)} slots)"
+    )
+    if naive:
+        started_at = time.perf_counter()
+        expected = naive_free_slots(calendars, WINDOW_START, window_end, duration, TZ)
+        naive_seconds = time.perf_counter() - started_at
+        assert expected == slots, "sweep and naive scan disagree"
+        line += f"  naive {naive_seconds * 1000:9.2f} ms  speedup x{naive_seconds / sweep_seconds:.0f}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skip-naive", action="store_true", help="Only time the sweep")
+    args = parser.parse_args()
+    for attendees, blocks, days in ((5, 20, 14), (20, 100, 28), (50, 200, 42), (50, 1000, 90)):
+        # The naive scan is quadratic: only run it on the smaller calendars
+        run(attendees, blocks, days, naive=not args.skip_naive and attendees * blocks <= 20000)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic inbox of a construction company for the email benchmarks: reply threads quoting each
+other (Gmail 'On ... wrote:' headers, Outlook header blocks, HTML with a gmail_quote container),
+signatures, legal disclaimers, mobile footers, HTML newsletters and emails delivered twice.
+The same seed always produces the same inbox.
+"""
+import html
+import random
+from typing import List
+
+from pydantic import BaseModel
+
+from models.gmail_models import EmailMessage
+from utils.email_preprocessing import ContentDeduplicator, clean_email_text
+
+NAMES = ["Marco Rossi", "Giulia Bianchi", "Tom Baker", "Sara Conti", "Luca Ferri"]
+SENTENCES = [
+    "The concrete pour for slab {n} is moved to Thursday at 7am.",
+    "Please confirm the crane inspection for site {n}.",
+    "Invoice {n} for the rebar delivery is attached, payment due in 30 days.",
+    "The permit for scaffolding on block {n} was approved.",
+    "We need two more electricians on floor {n} next week.",
+    "Can you sign the change order {n} before Friday?",
+]
+SIGNATURE = (
+    "\n\nBest regards,\n{name}\nSite Manager | Rossi Costruzioni S.r.l.\nVia Roma 12, 20121 Milano\n"
+    "Tel +39 02 1234 5678\nwww.rossicostruzioni.it"
+)
+DISCLAIMER = (
+    "\n\nCONFIDENTIALITY NOTICE: This email and any attachments are confidential and intended solely for the addressee. "
+    "If you are not the intended recipient, please notify the sender and delete it. "
+    "Please consider the environment before printing this email."
+)
+STYLE = "<head><style>body{font-family:Arial} .x{color:#333} " + "td{padding:4px} " * 40 + "</style></head>"
+
+class RawEmail(BaseModel):
+    """
+    An email body as delivered, before cleaning.
+    """
+    thread_id: str
+    sender: str
+    subject: str
+    text: str
+    is_html: bool = False
+    promotional: bool = False
+
+def _thread(rng: random.Random, thread_number: int) -> List[RawEmail]:
+    emails: List[RawEmail] = []
+    history = ""
+    subject = f"Site {thread_number % 9}: {rng.choice(SENTENCES).format(n=thread_number)[:40]}"
+    for reply in range(rng.randint(1, 8)):
+        name = rng.choice(NAMES)
+        sentences = " ".join(rng.choice(SENTENCES).format(n=thread_number) for _ in range(rng.randint(2, 4)))
+        text = f"Hi,\n\n{sentences}" + SIGNATURE.format(name=name) + DISCLAIMER
+        if reply and rng.random() < 0.2:
+            text = "Sent from my iPhone\n" + text
+        raw = text
+        if history:
+            if rng.random() < 0.6:
+                quoted = "\n".join("> " + line for line in history.splitlines())
+                raw += f"\n\nOn Mon, 3 Mar 2025 at 10:{reply:02d}, {name} <{name.split()[0].lower()}@example.it> wrote:\n" + quoted
+            else:
+                raw += f"\n\n________________________________\nFrom: {name}\nSent: Monday, March 3, 2025 10:{reply:02d}\nTo: Team\n\n" + history
+        is_html = rng.random() < 0.35
+        if is_html:
+            paragraphs = "".join(f"<p style=\"margin:0\">{html.escape(paragraph)}</p>" for paragraph in text.split("\n\n"))
+            quote = f"<div class=\"gmail_quote\"><blockquote>{html.escape(history)}</blockquote></div>" if history else ""
+            raw = f"<html>{STYLE}<body><div dir=\"ltr\">{paragraphs}</div>{quote}</body></html>"
+            history = text + ("\n" + history if history else "")
+        else:
+            history = raw
+        sender = f"{name} <{name.split()[0].lower()}@example.it>"
+        emails.append(RawEmail(thread_id=f"t{thread_number}", sender=sender, subject=("Re: " if reply else "") + subject, text=raw, is_html=is_html))
+    return emails
+
+def _newsletter(number: int) -> RawEmail:
+    items = "".join(
+        f"<tr><td><a href=\"https://shop.example.com/{item}\"><img src=\"https://shop.example.com/i{item}.png\" width=\"100\"></a></td>"
+        f"<td><h3>Offer {item}</h3><p>Save {item}% on drills and tools this week only.</p></td></tr>"
+        for item in range(12)
+    )
+    text = (
+        f"<html>{STYLE}<body><table>{items}</table>"
+        "<p>You are receiving this email because you subscribed. To unsubscribe from these emails click here.</p></body></html>"
+    )
+    return RawEmail(
+        thread_id=f"news{number}", sender="Tools Shop <news@shop.example.com>", subject=f"Weekly offers #{number}",
+        text=text, is_html=True, promotional=True,
+    )
+
+def synthetic_corpus(threads: int = 600, newsletters: int = 300, duplicates: int = 100, seed: int = 11) -> List[RawEmail]:
+    """
+    Reply threads and newsletters, plus `duplicates` emails delivered a second time (aliases, CCs).
+    """
+    rng = random.Random(seed)
+    corpus: List[RawEmail] = []
+    for thread_number in range(threads):
+        corpus.extend(_thread(rng, thread_number))
+    corpus.extend(_newsletter(number) for number in range(newsletters))
+    corpus.extend(rng.sample(corpus, min(duplicates, len(corpus))))
+    return corpus
+
+def synthetic_messages(count: int, seed: int = 11) -> List[EmailMessage]:
+    """
+    The first `count` emails of a shuffled corpus as GmailSync hands them to the digest: bodies
+    cleaned and deduplicated, promotional emails summarized from their snippet only.
+    """
+    threads = count // 3 + 1
+    corpus = synthetic_corpus(threads=threads, newsletters=count // 4 + 1, duplicates=count // 20, seed=seed)
+    random.Random(seed).shuffle(corpus)
+    deduplicator = ContentDeduplicator()
+    messages = []
+    for number, email in enumerate(corpus[:count]):
+        text = clean_email_text(email.text, email.is_html)
+        messages.append(EmailMessage(
+            id=f"m{number:06d}",
+            thread_id=email.thread_id,
+            sender=email.sender,
+            subject=email.subject,
+            snippet=text[:150],
+            label_ids=["INBOX", "CATEGORY_PROMOTIONS"] if email.promotional else ["INBOX"],
+            body=None if email.promotional else deduplicator.dedupe(text, email.thread_id) or None,
+        ))
+    return messages
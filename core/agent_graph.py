@@ -1,24 +1,46 @@
 import logging
+import time
+from functools import wraps
+from typing import Awaitable, Callable, Optional
 from langgraph.graph import StateGraph, END
 from models.agent_state import AgentState
+from core.config import settings
 from core.llm_provider import get_llm_model
+from services.conversation_memory import conversation_memory
+from utils.metrics import AGENT_LATENCY, NODE_LATENCY, TokenUsageCallbackHandler
+from utils.tracing import span
 from core.nodes import (
     router_node,
     email_draft_generator_node,
     general_message_handler_node,
     execute_tool_node, # Import the new execute_tool_node
+    USER_VISIBLE_TAG,
 )
 
 logging.basicConfig(level=logging.INFO)
 
+def instrument_node(name: str, node):
+    """
+    Wraps a graph node so that its latency is recorded in NODE_LATENCY and it runs in a tracing span.
+    """
+    @wraps(node)
+    async def instrumented(state: AgentState):
+        started_at = time.perf_counter()
+        try:
+            with span(f"node.{name}"):
+                return await node(state)
+        finally:
+            NODE_LATENCY.labels(provider=settings.LLM_PROVIDER, node=name).observe(time.perf_counter() - started_at)
+    return instrumented
+
 # Create a LangGraph StateGraph
 workflow = StateGraph(AgentState)
 
 # Add nodes
-workflow.add_node("router", router_node)
-workflow.add_node("email_draft_generator", email_draft_generator_node)
-workflow.add_node("general_message_handler", general_message_handler_node)
-workflow.add_node("execute_tool", execute_tool_node) # Add the execute_tool_node
+workflow.add_node("router", instrument_node("router", router_node))
+workflow.add_node("email_draft_generator", instrument_node("email_draft_generator", email_draft_generator_node))
+workflow.add_node("general_message_handler", instrument_node("general_message_handler", general_message_handler_node))
+workflow.add_node("execute_tool", instrument_node("execute_tool", execute_tool_node)) # Add the execute_tool_node
 
 # Set the entry point
 workflow.set_entry_point("router")
@@ -42,27 +64,79 @@ workflow.add_edge("execute_tool", END) # Tool execution is a terminal node for n
 # Compile the graph
 app = workflow.compile()
 
-async def process_telegram_update(message_text: str, message_type: str = "text"):
+EMAIL_DRAFT_HEADER = "Here is your email draft:\n\n"
+
+async def _stream_graph(inputs: dict, config: dict, on_token: Callable[[str], Awaitable[None]]) -> dict:
+    """
+    Runs the graph while forwarding the tokens of user-facing LLM calls (tagged with USER_VISIBLE_TAG) to on_token.
+    Returns the final state.
+    """
+    final_state = {}
+    email_header_sent = False
+    async for mode, payload in app.astream(inputs, config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final_state = payload
+            continue
+        chunk, metadata = payload
+        if USER_VISIBLE_TAG not in metadata.get("tags", []) or getattr(chunk, "tool_call_chunks", None):
+            continue
+        text = chunk.text
+        if not text:
+            continue
+        if metadata.get("langgraph_node") == "email_draft_generator" and not email_header_sent:
+            email_header_sent = True
+            text = EMAIL_DRAFT_HEADER + text
+        await on_token(text)
+    return final_state
+
+async def process_telegram_update(
+    message_text: str,
+    message_type: str = "text",
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    chat_id: Optional[int] = None,
+):
     """
     Processes a single Telegram update by running it through the LangGraph.
+    When chat_id is given, the bounded conversation history of the chat is added to the prompts
+    and the exchange is recorded afterwards.
+    When on_token is given, reply tokens are passed to it as they are generated; the returned
+    response is still the complete, authoritative reply.
     """
     llm = get_llm_model()
+    use_memory = conversation_memory is not None and chat_id is not None
     inputs = {
+        "chat_id": chat_id,
         "input_message": message_text,
         "message_type": message_type,
         "llm": llm,
+        "history": conversation_memory.get_context(chat_id) if use_memory else [],
     }
+    config = {"callbacks": [TokenUsageCallbackHandler(settings.LLM_PROVIDER)]}
     
     logging.info(f"Received new input message: {inputs['input_message'], inputs['message_type']}")
-    final_state = app.invoke(inputs)
+    started_at = time.perf_counter()
+    final_state = {}
+    try:
+        with span("process_telegram_update", message_type=message_type, provider=settings.LLM_PROVIDER):
+            if on_token is None:
+                final_state = await app.ainvoke(inputs, config)
+            else:
+                final_state = await _stream_graph(inputs, config, on_token)
+    finally:
+        AGENT_LATENCY.labels(
+            provider=settings.LLM_PROVIDER, route=final_state.get("next_node") or "none"
+        ).observe(time.perf_counter() - started_at)
     
     response_to_user = None
     if final_state.get("email_draft"):
-        response_to_user = f"Here is your email draft:\n\n{final_state['email_draft']}"
+        response_to_user = f"{EMAIL_DRAFT_HEADER}{final_state['email_draft']}"
     elif final_state.get("general_response"):
         response_to_user = final_state["general_response"]
     else:
         response_to_user = "An unexpected error occurred or tool executed." # More specific message needed here
+
+    if use_memory:
+        conversation_memory.record_turn(chat_id, message_text, response_to_user, llm)
         
     return response_to_user
 
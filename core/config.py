@@ -1,6 +1,6 @@
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     """
@@ -21,11 +21,134 @@ class Settings(BaseSettings):
 
     # Gmail API credentials
     GMAIL_CREDENTIALS_FILE: str = Field("path/to/your/credentials.json", description="Path to Gmail credentials JSON file")
+    GMAIL_TOKEN_FILE: str = Field("gmail_token.json", description="Where the Gmail OAuth access and refresh tokens are stored")
+    GMAIL_SYNC_STATE_PATH: str = Field("gmail_sync.sqlite3", description="SQLite file where the last synced Gmail historyId is kept")
+    GMAIL_INITIAL_LOOKBACK_DAYS: int = Field(1, description="How far back the first Gmail sync (or a resync after an expired historyId) looks")
+    GMAIL_BATCH_SIZE: int = Field(50, description="Message requests per Gmail batch request (Gmail allows up to 100)")
+    GMAIL_BATCH_RETRIES: int = Field(3, description="Retries of message requests rejected by a batch with a rate-limit or server error")
+    GMAIL_SNIPPET_ONLY_LABELS: List[str] = Field(
+        ["SPAM", "CATEGORY_PROMOTIONS", "CATEGORY_SOCIAL", "CATEGORY_FORUMS"],
+        description="Messages with any of these labels are summarized from their snippet without fetching the full body",
+    )
+    GMAIL_MAX_BODY_CHARS: int = Field(6000, description="Email body characters passed to the summarizer")
+    EMAIL_SUMMARY_CONCURRENCY: int = Field(8, description="Maximum number of concurrent email digest LLM calls")
+    EMAIL_DIGEST_BATCH_TOKEN_BUDGET: int = Field(6000, description="Maximum (estimated) tokens of emails packed into one digest LLM call")
+    EMAIL_DIGEST_MAX_BATCH_EMAILS: int = Field(25, description="Maximum number of emails classified in one digest LLM call")
+    EMAIL_DIGEST_MAX_EMAIL_TOKENS: int = Field(800, description="Each email is truncated to this many (estimated) tokens before it is packed into a batch")
     TELEGRAM_WEBHOOK_URL: str = Field(..., description="Webhook url")
 
+    # Calendar configurations
+    CALENDAR_TIMEZONE: str = Field("Europe/Rome", description="Timezone used for calendar events and working hours")
+    WORKING_HOURS_START: str = Field("08:00", description="Start of working hours (HH:MM) used when looking for free slots")
+    WORKING_HOURS_END: str = Field("18:00", description="End of working hours (HH:MM) used when looking for free slots")
+    WORKING_DAYS: List[int] = Field([0, 1, 2, 3, 4], description="Working weekdays (Monday=0 ... Sunday=6) used when looking for free slots")
+    CALENDAR_MIRROR_ENABLED: bool = Field(True, description="Keep a local SQLite mirror of the primary calendar for fast reads")
+    CALENDAR_MIRROR_PATH: str = Field("calendar_mirror.sqlite3", description="SQLite file of the local calendar mirror")
+    CALENDAR_MIRROR_MAX_STALENESS_SECONDS: float = Field(60.0, description="Age after which the calendar mirror is incrementally synced before a read")
+    CALENDAR_MIRROR_LOOKBACK_DAYS: int = Field(30, description="How far back the initial full calendar sync goes")
+
     # Model configurations
     OPENAI_MODEL_TRANSCRIPTION: str = Field("whisper-1", description="OpenAI model for transcription")
+    VOICE_DOWNLOAD_MAX_BYTES: int = Field(20 * 1024 * 1024, description="Maximum size of a downloaded voice note (Telegram bots can download up to 20 MB)")
+    VOICE_SPOOL_MAX_MEMORY_BYTES: int = Field(1024 * 1024, description="Voice note bytes kept in memory before the download spills to a temporary file")
+    TRANSCRIPTION_CACHE_MAX_MEMORY_ENTRIES: int = Field(1000, description="Maximum number of transcriptions kept in the in-memory cache tier")
+    TRANSCRIPTION_CACHE_TTL_SECONDS: float = Field(7 * 24 * 3600, description="How long cached transcriptions stay valid")
+    TRANSCRIPTION_CACHE_DIR: Optional[str] = Field(".transcription_cache", description="Directory of the on-disk transcription cache tier (unset to disable)")
+    GOOGLE_STREAMING_THRESHOLD_SECONDS: int = Field(50, description="Voice notes longer than this are transcribed with Google streaming recognition")
+    GOOGLE_STREAMING_MAX_SECONDS: int = Field(290, description="Voice notes longer than this are transcribed with Google long-running recognition (a streaming session ends after about 5 minutes)")
     LLM_PROVIDER: str = Field("google", description="LLM provider ('openai' or 'google')")
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(20, description="Maximum pooled keep-alive connections to the LLM provider")
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(60.0, description="How long idle LLM provider connections are kept alive")
+    LLM_HTTP_TIMEOUT_SECONDS: float = Field(60.0, description="Timeout for LLM provider HTTP requests")
+
+    # Semantic cache configurations
+    SEMANTIC_CACHE_ENABLED: bool = Field(False, description="Answer near-identical general messages from a local similarity cache instead of the router LLM")
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD: float = Field(0.9, description="Minimum cosine similarity for a semantic cache hit")
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(1000, description="Maximum number of cached router decisions")
+    SEMANTIC_CACHE_MAX_AGE_SECONDS: float = Field(3600.0, description="Age after which cached router decisions expire")
+    SEMANTIC_CACHE_AUDIT_LOG_PATH: Optional[str] = Field(None, description="JSONL file where every semantic cache hit is recorded for false-hit review")
+
+    # Pre-router configurations
+    PRE_ROUTER_ENABLED: bool = Field(True, description="Route unambiguous messages locally before calling the LLM router")
+    PRE_ROUTER_MODEL_PATH: Optional[str] = Field(None, description="Optional .npz classifier trained with 'python -m core.intent_classifier'")
+    PRE_ROUTER_CONFIDENCE_THRESHOLD: float = Field(0.9, description="Minimum confidence for the pre-router to skip the LLM router")
+    ROUTER_TRAFFIC_LOG_PATH: Optional[str] = Field(None, description="JSONL file where routing decisions are logged as classifier training data")
+
+    # Conversation memory configurations
+    CONVERSATION_MEMORY_ENABLED: bool = Field(True, description="Give the agent the recent history of each chat")
+    CONVERSATION_MEMORY_BACKEND: str = Field("memory", description="Where conversation history is kept ('memory' or 'sqlite')")
+    CONVERSATION_MEMORY_SQLITE_PATH: str = Field("conversation_memory.sqlite3", description="SQLite file used by the 'sqlite' conversation memory backend")
+    CONVERSATION_MAX_MESSAGES: int = Field(40, description="Ring buffer size: maximum number of unsummarized messages kept per chat (folding into the summary starts at half of it)")
+    CONVERSATION_HISTORY_TOKEN_BUDGET: int = Field(1500, description="Maximum (estimated) tokens of recent messages added to a prompt; older messages are summarized")
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = Field(300, description="Maximum (estimated) tokens of the rolling conversation summary")
+
+    # Shared HTTP client configurations
+    HTTP_MAX_CONNECTIONS: int = Field(100, description="Maximum concurrent connections per host transport of the shared HTTP client")
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(20, description="Maximum idle keep-alive connections kept per host transport")
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(30.0, description="How long idle connections of the shared HTTP client are kept alive")
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = Field(5.0, description="Connect timeout of the shared HTTP client")
+    HTTP_TIMEOUT_SECONDS: float = Field(10.0, description="Read, write and pool timeout of the shared HTTP client")
+    HTTP_HOST_TIMEOUTS: Dict[str, float] = Field({}, description="Per-host read/write/pool timeouts overriding HTTP_TIMEOUT_SECONDS, e.g. {\"api.telegram.org\": 30}")
+    HTTP2_ENABLED: bool = Field(True, description="Talk HTTP/2 to the Telegram Bot API (requires httpx[http2])")
+    HTTP_GET_RETRIES: int = Field(2, description="Retries of idempotent requests (getFile, file downloads) after connection errors or 502/503/504")
+
+    # Telegram Bot API configurations
+    TELEGRAM_API_BASE_URL: str = Field("https://api.telegram.org", description="Bot API server (point it at a local Bot API server or a fake one for testing)")
+    TELEGRAM_GLOBAL_MESSAGES_PER_SECOND: float = Field(30.0, description="Maximum outgoing Telegram calls per second across all chats")
+    TELEGRAM_CHAT_MESSAGES_PER_SECOND: float = Field(1.0, description="Maximum sustained outgoing Telegram calls per second to one chat")
+    TELEGRAM_CHAT_BURST: int = Field(3, description="Calls to one chat allowed in a burst before the per-chat rate applies")
+    TELEGRAM_MERGE_WINDOW_SECONDS: float = Field(0.0, description="Extra time queued messages to a chat wait to be merged (messages queued while a chat is throttled are always merged)")
+    TELEGRAM_SEND_MAX_RETRIES: int = Field(5, description="Retries of a Telegram call after a 429, a 5xx or a failure to connect")
+    TELEGRAM_RETRY_BASE_DELAY_SECONDS: float = Field(0.5, description="Base of the exponential backoff (with jitter) between Telegram retries")
+
+    # Response streaming configurations
+    RESPONSE_STREAMING_ENABLED: bool = Field(True, description="Show LLM replies progressively by editing a Telegram message as tokens arrive")
+    TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS: float = Field(1.0, description="Minimum time between two edits of a streamed reply (Telegram rate-limits edits)")
+    TELEGRAM_STREAM_PLACEHOLDER: str = Field("…", description="Text of the placeholder message sent before the first token arrives")
+
+    # Observability configurations
+    TRACING_ENABLED: bool = Field(False, description="Emit OpenTelemetry spans for agent runs and graph nodes (requires opentelemetry-api and a configured SDK)")
+
+    # Scheduler configurations
+    SCHEDULER_DATABASE_URL: str = Field("sqlite:///scheduler.sqlite3", description="SQLAlchemy URL of the scheduled-job store and leader lease (use a shared database for several hosts)")
+    SCHEDULER_LEASE_TTL_SECONDS: float = Field(30.0, description="How long the scheduler leader lease lasts without renewal")
+    SCHEDULER_LEASE_RENEW_SECONDS: float = Field(10.0, description="How often the leader renews its lease and followers try to take it")
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = Field(3600, description="How late a missed job run may still be executed (e.g. after a restart)")
+    SCHEDULER_COALESCE: bool = Field(True, description="Run a job once, not once per missed run, when several runs were missed")
+    EMAIL_SUMMARY_ENABLED: bool = Field(False, description="Send the daily email summary to telegram_chat_id (authorize Gmail first with `python -m services.gmail_service`)")
+    EMAIL_SUMMARY_HOUR: int = Field(7, description="Hour (CALENDAR_TIMEZONE) at which the daily email summary is sent")
+    EMAIL_SUMMARY_MINUTE: int = Field(0, description="Minute at which the daily email summary is sent")
+
+    # Construction issue configurations
+    ISSUE_TRACKER_PATH: str = Field("issues.sqlite3", description="SQLite file where reported construction issues are stored")
+    ISSUE_NOTIFY_CHAT_IDS: List[int] = Field([], description="Telegram chats alerted about urgent issues and sent the daily briefing (defaults to telegram_chat_id)")
+    ISSUE_DEDUP_WINDOW_HOURS: float = Field(48.0, description="How far back an open issue at the same site can absorb a near-identical report")
+    ISSUE_DEDUP_SIMILARITY: float = Field(0.75, description="Minimum word-set similarity (Jaccard) for two reports to count as the same issue")
+    ISSUE_BRIEFING_ENABLED: bool = Field(True, description="Send a daily briefing of the routine issues reported since the previous one")
+    ISSUE_BRIEFING_HOUR: int = Field(7, description="Hour (CALENDAR_TIMEZONE) at which the daily issue briefing is sent")
+    ISSUE_BRIEFING_MINUTE: int = Field(30, description="Minute at which the daily issue briefing is sent")
+    ISSUE_BRIEFING_MAX_PER_SITE: int = Field(15, description="Issues listed per site in the briefing; the rest are only counted")
+
+    # Concurrency configurations
+    TOOL_EXECUTOR_MAX_WORKERS: int = Field(8, description="Maximum number of threads used to run blocking tools (e.g. Google Calendar API)")
+    TOOL_CALL_CONCURRENCY: int = Field(4, description="Maximum number of independent tool calls from one message run concurrently")
+
+    # Update ingestion configurations
+    INGESTION_MODE: str = Field("webhook", description="How updates reach the bot ('webhook' via the webhook endpoint, 'polling' via getUpdates long polling)")
+    TELEGRAM_POLL_TIMEOUT_SECONDS: int = Field(30, description="Long-polling timeout of a getUpdates call")
+    TELEGRAM_POLL_LIMIT: int = Field(100, description="Maximum updates fetched per getUpdates call (Telegram allows up to 100)")
+    TELEGRAM_POLL_RETRY_DELAY_SECONDS: float = Field(5.0, description="Pause after a failed getUpdates call or a full update queue")
+    TELEGRAM_POLL_IN_FLIGHT_INTERVAL_SECONDS: float = Field(1.0, description="How soon getUpdates is repeated when only updates still being processed come back (Telegram does not long-poll while they are unconfirmed)")
+    UPDATE_PROCESSING_MODE: str = Field("queue", description="How webhook updates are processed ('queue' acknowledges immediately and processes in the background, 'sync' processes before responding)")
+    UPDATE_QUEUE_MAX_SIZE: int = Field(1000, description="Maximum number of updates waiting in the background queue")
+    UPDATE_QUEUE_WORKERS: int = Field(8, description="Number of background workers processing queued updates")
+    UPDATE_QUEUE_OVERFLOW_POLICY: str = Field("reject", description="What to do when the queue is full ('reject', 'drop_oldest' or 'block')")
+    UPDATE_QUEUE_ENQUEUE_TIMEOUT_SECONDS: float = Field(1.0, description="How long the 'block' overflow policy waits for space before rejecting")
+    UPDATE_QUEUE_DRAIN_TIMEOUT_SECONDS: float = Field(30.0, description="How long shutdown waits for queued updates to be processed")
+    UPDATE_DEDUP_BACKEND: str = Field("memory", description="Where processed update ids are remembered ('memory' or 'sqlite')")
+    UPDATE_DEDUP_TTL_SECONDS: float = Field(86400.0, description="How long a processed update id is remembered (Telegram keeps undelivered updates for 24 hours)")
+    UPDATE_DEDUP_MAX_ENTRIES: int = Field(10000, description="Maximum number of update ids kept in memory")
+    UPDATE_DEDUP_SQLITE_PATH: str = Field("update_dedup.sqlite3", description="SQLite file used by the 'sqlite' dedup backend")
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,222 @@
+import argparse
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.semantic_cache import TOOL_INTENT_PATTERN, HashingEmbedder
+
+# Routes the pre-router may take on its own; anything else (tool calls) always goes through the LLM.
+FAST_PATH_ROUTES = ("email_draft_generator", "general_message_handler")
+
+class KeywordIntentMatcher:
+    """
+    Compiled regex rules for messages whose intent is unambiguous.
+    Rules are anchored to the start of the message, so a request only matches when it opens with it.
+    """
+    RULES: Sequence[Tuple[str, str, float]] = (
+        (r"^\s*((please|pls|can you|could you)\s+)?(draft|write|compose|prepare)\s+(me\s+)?(an?\s+|the\s+)?(follow[- ]?up\s+)?(e-?mail|reply)\b", "email_draft_generator", 0.99),
+    )
+
+    def __init__(self):
+        self._rules = [(re.compile(pattern, re.IGNORECASE), route, confidence) for pattern, route, confidence in self.RULES]
+
+    def match(self, message: str) -> Optional[Tuple[str, float]]:
+        for pattern, route, confidence in self._rules:
+            if pattern.search(message):
+                return route, confidence
+        return None
+
+class HashedNgramClassifier:
+    """
+    Multinomial logistic regression over hashed word/character n-grams, trained with full-batch
+    gradient descent in NumPy. Small enough to train on logged router traffic in seconds.
+    """
+    def __init__(self, labels: Sequence[str], dim: int = 1024):
+        self.labels = list(labels)
+        self.embedder = HashingEmbedder(dim)
+        self.weights = np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+    def _features(self, texts: Iterable[str]) -> np.ndarray:
+        return np.stack([self.embedder.embed(text) for text in texts])
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str], epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4):
+        features = self._features(texts)
+        targets = np.zeros((len(labels), len(self.labels)), dtype=np.float32)
+        targets[np.arange(len(labels)), [self.labels.index(label) for label in labels]] = 1.0
+        for _ in range(epochs):
+            probabilities = self._softmax(features @ self.weights + self.bias)
+            error = (probabilities - targets) / len(labels)
+            self.weights -= learning_rate * (features.T @ error + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        return self
+
+    def predict(self, message: str) -> Tuple[str, float]:
+        probabilities = self._softmax(self._features([message]) @ self.weights + self.bias)[0]
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels))
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        data = np.load(path)
+        classifier = cls(data["labels"].tolist(), dim=data["weights"].shape[0])
+        classifier.weights = data["weights"]
+        classifier.bias = data["bias"]
+        return classifier
+
+class PreRouter:
+    """
+    Local routing stage run before the LLM router.
+    Keyword rules are tried first, then the optional classifier; a decision is only returned for
+    FAST_PATH_ROUTES at or above the confidence threshold, otherwise the LLM router decides.
+    Messages that also mention a calendar or issue action ("... and book a meeting Monday") always
+    go to the LLM router, which can call the tool.
+    """
+    def __init__(
+        self,
+        matcher: Optional[KeywordIntentMatcher] = None,
+        classifier: Optional[HashedNgramClassifier] = None,
+        threshold: float = settings.PRE_ROUTER_CONFIDENCE_THRESHOLD,
+    ):
+        self.matcher = matcher or KeywordIntentMatcher()
+        self.classifier = classifier
+        self.threshold = threshold
+        self.decided = 0
+        self.deferred = 0
+
+    def route(self, message: str) -> Optional[Tuple[str, float, str]]:
+        """
+        Returns (route, confidence, source) for a confident decision, or None to defer to the LLM.
+        """
+        decision = None
+        if TOOL_INTENT_PATTERN.search(message):
+            self.deferred += 1
+            return None
+        matched = self.matcher.match(message)
+        if matched:
+            decision = (*matched, "keyword")
+        elif self.classifier:
+            decision = (*self.classifier.predict(message), "classifier")
+
+        if decision and decision[0] in FAST_PATH_ROUTES and decision[1] >= self.threshold:
+            self.decided += 1
+            return decision
+        self.deferred += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"decided": self.decided, "deferred": self.deferred}
+
+def log_routing_decision(message: str, route: str, source: str):
+    """
+    Appends a routing decision to ROUTER_TRAFFIC_LOG_PATH, the training data for the classifier.
+    """
+    if not settings.ROUTER_TRAFFIC_LOG_PATH:
+        return
+    record = {"timestamp": time.time(), "message": message, "route": route, "source": source}
+    try:
+        with open(settings.ROUTER_TRAFFIC_LOG_PATH, "a", encoding="utf-8") as traffic_log:
+            traffic_log.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write router traffic log: {e}")
+
+def load_labelled_traffic(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads (message, route) pairs decided by the LLM router from a traffic log.
+    """
+    samples = []
+    with open(path, "r", encoding="utf-8") as traffic_log:
+        for line in traffic_log:
+            record = json.loads(line)
+            if record.get("source") == "llm":
+                samples.append((record["message"], record["route"]))
+    return samples
+
+def evaluate(pre_router: PreRouter, samples: Sequence[Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Replays labelled messages through the pre-router.
+    Reports coverage (share decided locally), accuracy of those decisions, and LLM calls saved.
+    Every local decision skips the tool-bound router call; email routes also skip the whole first
+    LLM round-trip, while general routes still need one plain reply call in general_message_handler.
+    """
+    decided = correct = email_routes = 0
+    confusion: Dict[str, Dict[str, int]] = {}
+    for message, expected_route in samples:
+        decision = pre_router.route(message)
+        if decision is None:
+            continue
+        decided += 1
+        correct += decision[0] == expected_route
+        email_routes += decision[0] == "email_draft_generator"
+        confusion.setdefault(expected_route, {}).setdefault(decision[0], 0)
+        confusion[expected_route][decision[0]] += 1
+
+    return {
+        "samples": len(samples),
+        "decided_locally": decided,
+        "coverage": round(decided / len(samples), 4) if samples else 0.0,
+        "accuracy": round(correct / decided, 4) if decided else 0.0,
+        "misrouted": decided - correct,
+        "router_llm_calls_saved": decided,
+        "total_llm_calls_saved": email_routes,
+        "confusion": confusion,
+    }
+
+def _load_pre_router() -> PreRouter:
+    classifier = None
+    if settings.PRE_ROUTER_MODEL_PATH:
+        try:
+            classifier = HashedNgramClassifier.load(settings.PRE_ROUTER_MODEL_PATH)
+        except (OSError, KeyError, ValueError) as e:
+            logging.error(f"Could not load pre-router model {settings.PRE_ROUTER_MODEL_PATH}: {e}")
+    return PreRouter(classifier=classifier)
+
+# Global pre-router instance (None when the pre-router is disabled)
+pre_router: Optional[PreRouter] = _load_pre_router() if settings.PRE_ROUTER_ENABLED else None
+
+def main():
+    """
+    Offline harness: train a classifier from a router traffic log and evaluate the pre-router on a holdout split.
+    Usage: python -m core.intent_classifier traffic.jsonl --out pre_router.npz
+    """
+    parser = argparse.ArgumentParser(description="Train and evaluate the local pre-router on logged router traffic.")
+    parser.add_argument("traffic_log", help="JSONL file written via ROUTER_TRAFFIC_LOG_PATH")
+    parser.add_argument("--out", help="Where to save the trained classifier (.npz)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of samples kept for evaluation")
+    parser.add_argument("--threshold", type=float, default=settings.PRE_ROUTER_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    samples = load_labelled_traffic(args.traffic_log)
+    random.Random(args.seed).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train, test = samples[:split], samples[split:]
+
+    labels = sorted({route for _, route in samples})
+    classifier = HashedNgramClassifier(labels).fit([m for m, _ in train], [r for _, r in train])
+    if args.out:
+        classifier.save(args.out)
+
+    report = {
+        "keywords_only": evaluate(PreRouter(threshold=args.threshold), test),
+        "keywords_and_classifier": evaluate(PreRouter(classifier=classifier, threshold=args.threshold), test),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
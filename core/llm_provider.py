@@ -1,15 +1,23 @@
+import logging
+import threading
+from typing import Any, Dict, Tuple
+
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
-from core.config import settings
-
-def get_llm_model():
-    """
-    Returns the appropriate LLM model based on the provider specified in the settings.
-    """
-    llm_provider = settings.LLM_PROVIDER
+from core.config import settings, Settings
+from core.tools import TOOLS
+from prompts.router_prompt import ROUTER_PROMPT
 
+def _build_llm_model(llm_provider: str, http_async_client: httpx.AsyncClient):
     if llm_provider == "openai":
-        return ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY)
+        return ChatOpenAI(
+            model="gpt-4o-mini",
+            api_key=settings.OPENAI_API_KEY,
+            http_async_client=http_async_client,
+            # Streamed replies also report token usage (counted in the llm_tokens_total metric)
+            stream_usage=True,
+        )
     elif llm_provider == "google":
         return ChatGoogleGenerativeAI(
             model="gemini-1.5-flash-latest",
@@ -17,3 +25,95 @@ def get_llm_model():
         )
     else:
         raise ValueError(f"Unsupported LLM_PROVIDER: {llm_provider}. Choose 'openai' or 'google'.")
+
+class LLMProviderRegistry:
+    """
+    Process-wide cache of LLM clients.
+    Each model is built once per provider configuration and shares a pooled keep-alive HTTP client,
+    and the tool-bound router runnable is compiled once per model instead of on every message.
+    Changing the provider settings transparently builds a new model; reload() re-reads them from the environment.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple, Any] = {}
+        self._router_chains: Dict[int, Tuple[Any, Any]] = {}
+        self._http_async_client: httpx.AsyncClient | None = None
+
+    @staticmethod
+    def _settings_key() -> Tuple:
+        return (settings.LLM_PROVIDER, settings.OPENAI_API_KEY, settings.GOOGLE_API_KEY)
+
+    def _get_http_async_client(self) -> httpx.AsyncClient:
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT_SECONDS),
+            )
+        return self._http_async_client
+
+    def get_model(self):
+        """
+        Returns the cached LLM model for the current provider settings, building it on first use.
+        """
+        key = self._settings_key()
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    logging.info(f"Building LLM model for provider: {settings.LLM_PROVIDER}")
+                    model = _build_llm_model(settings.LLM_PROVIDER, self._get_http_async_client())
+                    self._models[key] = model
+        return model
+
+    def get_router_chain(self, llm):
+        """
+        Returns the precompiled ROUTER_PROMPT | llm.bind_tools(TOOLS) runnable for the given model.
+        """
+        cached = self._router_chains.get(id(llm))
+        if cached is not None and cached[0] is llm:
+            return cached[1]
+        with self._lock:
+            chain = ROUTER_PROMPT | llm.bind_tools(TOOLS)
+            self._router_chains[id(llm)] = (llm, chain)
+        return chain
+
+    def reload(self):
+        """
+        Re-reads the settings from the environment and drops the cached models,
+        so the next message is served with the new configuration.
+        """
+        fresh_settings = Settings()
+        with self._lock:
+            for field_name in Settings.model_fields:
+                setattr(settings, field_name, getattr(fresh_settings, field_name))
+            self._models.clear()
+            self._router_chains.clear()
+        logging.info(f"LLM provider settings reloaded (provider: {settings.LLM_PROVIDER}).")
+
+    async def close(self):
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+            self._http_async_client = None
+        self._models.clear()
+        self._router_chains.clear()
+
+# Global LLM provider registry instance
+llm_registry = LLMProviderRegistry()
+
+def get_llm_model():
+    """
+    Returns the appropriate LLM model based on the provider specified in the settings.
+    Models are cached by llm_registry, so repeated calls reuse the same client.
+    """
+    return llm_registry.get_model()
+
+def get_router_chain(llm):
+    """
+    Returns the cached tool-bound router runnable for the given model.
+    """
+    return llm_registry.get_router_chain(llm)
@@ -2,10 +2,12 @@ from .router_node import router_node
 from .email_draft_generator_node import email_draft_generator_node
 from .general_message_handler_node import general_message_handler_node
 from .execute_tool_node import execute_tool_node # Import the new execute_tool_node
+from .streaming import USER_VISIBLE_TAG
 
 __all__ = [
     "router_node",
     "email_draft_generator_node",
     "general_message_handler_node",
     "execute_tool_node",
+    "USER_VISIBLE_TAG",
 ]
@@ -2,12 +2,13 @@ import logging
 from typing import Dict, Any
 from models.agent_state import AgentState
 from prompts.email_draft_prompt import EMAIL_DRAFT_PROMPT
+from core.nodes.streaming import USER_VISIBLE_TAG
 
-def email_draft_generator_node(state: AgentState) -> Dict[str, Any]:
+async def email_draft_generator_node(state: AgentState) -> Dict[str, Any]:
     """
     Generates an email draft using the LLM.
     """
-    logging.info(f"Entering email_draft_generator_node with state: {state.json()}")
+    logging.info("Entering email_draft_generator_node")
     # Accessing state attributes using dot notation as AgentState is a Pydantic BaseModel
     email_request_content = state.email_request_content
     llm = state.llm
@@ -15,11 +16,13 @@ def email_draft_generator_node(state: AgentState) -> Dict[str, Any]:
     if not email_request_content:
         return {"email_draft": "Error: No content provided for email draft."}
         
-    chain = EMAIL_DRAFT_PROMPT | llm
+    chain = (EMAIL_DRAFT_PROMPT | llm).with_config(tags=[USER_VISIBLE_TAG])
     
     try:
-        response = chain.invoke({"email_request_content": email_request_content})
-        email_draft = response.content
+        # Streamed so that the draft can be shown to the user while it is being written
+        email_draft = ""
+        async for chunk in chain.astream({"email_request_content": email_request_content, "history": state.history}):
+            email_draft += chunk.text
         return {"email_draft": email_draft}
     except Exception as e:
         logging.error(f"Error generating email draft: {e}", exc_info=True)
@@ -1,34 +1,64 @@
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 from models.agent_state import AgentState
-from core.tools import TOOL_MAP
+from core.config import settings
+from core.tools import TOOL_MAP, BATCHABLE_TOOLS, run_tool, run_tool_batch
 
-def execute_tool_node(state: AgentState) -> Dict[str, Any]:
+def _format_tool_result(tool_name: str, result: Dict[str, Any]) -> str:
+    return f"Tool '{tool_name}' executed successfully: {result.get('message', str(result))}"
+
+async def execute_tool_node(state: AgentState) -> Dict[str, Any]:
     """
     Executes the tool calls identified by the router.
+    Compatible Calendar calls are sent as one batch request; the remaining tools run
+    concurrently, up to TOOL_CALL_CONCURRENCY at a time. Results keep the order of the calls.
     """
     logging.info(f"Entering execute_tool_node")
     tool_calls = state.tool_calls
-    
+
     if not tool_calls:
         return {"general_response": "No tool calls found to execute."}
 
-    tool_results = []
-    for tool_call in tool_calls:
-        tool_name = tool_call['name']
-        tool_args = tool_call['args']
-        
-        if tool_name in TOOL_MAP:
+    tool_results: List[str] = [""] * len(tool_calls)
+    batch_indexes = [i for i, tool_call in enumerate(tool_calls) if tool_call['name'] in BATCHABLE_TOOLS]
+    if len(batch_indexes) < 2:
+        # A batch only pays off with at least two calls
+        batch_indexes = []
+    batch_index_set = set(batch_indexes)
+    semaphore = asyncio.Semaphore(settings.TOOL_CALL_CONCURRENCY)
+
+    async def execute_batch():
+        batch_calls = [tool_calls[i] for i in batch_indexes]
+        try:
+            results = await run_tool_batch(batch_calls)
+            for i, result in zip(batch_indexes, results):
+                tool_results[i] = _format_tool_result(tool_calls[i]['name'], result)
+        except Exception as e:
+            logging.error(f"Error executing calendar batch: {e}", exc_info=True)
+            for i in batch_indexes:
+                tool_results[i] = f"Error executing tool '{tool_calls[i]['name']}': {str(e)}"
+
+    async def execute_single(i: int):
+        tool_name = tool_calls[i]['name']
+        tool_args = tool_calls[i]['args']
+
+        if tool_name not in TOOL_MAP:
+            tool_results[i] = f"Unknown tool: {tool_name}"
+            return
+        async with semaphore:
             try:
-                tool_function = TOOL_MAP[tool_name]
-                result = tool_function(**tool_args)
-                tool_results.append(f"Tool '{tool_name}' executed successfully: {result.get('message', str(result))}")
+                result = await run_tool(tool_name, tool_args)
+                tool_results[i] = _format_tool_result(tool_name, result)
             except Exception as e:
                 logging.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
-                tool_results.append(f"Error executing tool '{tool_name}': {str(e)}")
-        else:
-            tool_results.append(f"Unknown tool: {tool_name}")
-            
+                tool_results[i] = f"Error executing tool '{tool_name}': {str(e)}"
+
+    tasks = [execute_single(i) for i in range(len(tool_calls)) if i not in batch_index_set]
+    if batch_indexes:
+        tasks.append(execute_batch())
+    await asyncio.gather(*tasks)
+
     return {
         "general_response": "\n".join(tool_results)
     }
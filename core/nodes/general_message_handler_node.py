@@ -1,13 +1,25 @@
 import logging
 from typing import Dict, Any
 from models.agent_state import AgentState
+from prompts.general_message_prompt import GENERAL_MESSAGE_PROMPT
+from core.nodes.streaming import USER_VISIBLE_TAG
 
-def general_message_handler_node(state: AgentState) -> Dict[str, Any]:
+async def general_message_handler_node(state: AgentState) -> Dict[str, Any]:
     """
     Handles general messages that are not email creation requests.
     """
     logging.info(f"Entering general_message_handler_node")
-    # The router_node already populates general_response.
-    # This node could potentially do more, like logging or simple text processing.
-    # For now, it just passes through the general response.
-    return {"general_response": state.general_response}
+    # The router_node usually populates general_response already.
+    if state.general_response is not None:
+        return {"general_response": state.general_response}
+
+    # Messages routed here by the local pre-router have no reply yet: answer without tools.
+    chain = (GENERAL_MESSAGE_PROMPT | state.llm).with_config(tags=[USER_VISIBLE_TAG])
+    try:
+        general_response = ""
+        async for chunk in chain.astream({"user_message": state.input_message, "history": state.history}):
+            general_response += chunk.text
+        return {"general_response": general_response}
+    except Exception as e:
+        logging.error(f"Error generating general response: {e}", exc_info=True)
+        return {"general_response": f"Error generating response: {e}"}
@@ -1,10 +1,23 @@
 import logging
 from typing import Dict, Any
 from models.agent_state import AgentState
-from prompts.router_prompt import ROUTER_PROMPT
-from core.tools import TOOLS # Import the tools
+from core.llm_provider import get_router_chain
+from core.semantic_cache import semantic_cache
+from core.intent_classifier import pre_router, log_routing_decision
+from core.nodes.streaming import USER_VISIBLE_TAG
 
-def router_node(state: AgentState) -> Dict[str, Any]:
+def _is_email_request(user_message: str) -> bool:
+    # Simple keyword-based check for email drafting
+    lowered = user_message.lower()
+    return "draft an email" in lowered or "write an email" in lowered
+
+def _from_cached_decision(decision: Dict[str, Any], user_message: str) -> Dict[str, Any]:
+    if decision["next_node"] == "email_draft_generator":
+        # The email content always comes from the current message, never from the cached one
+        return {**decision, "email_request_content": user_message}
+    return decision
+
+async def router_node(state: AgentState) -> Dict[str, Any]:
     """
     Routes the incoming message to the appropriate node based on intent,
     potentially identifying a tool call.
@@ -12,18 +25,37 @@ def router_node(state: AgentState) -> Dict[str, Any]:
     logging.info(f"Entering router_node")
     user_message = state.input_message
     llm = state.llm
+    # Self-contained messages may be answered from the cache in any conversation, follow-ups only
+    # without history. Only replies written without history are stored, so that no chat's earlier
+    # messages can leak into another chat's answer.
+    use_semantic_cache = semantic_cache is not None and not (state.history and semantic_cache.refers_to_context(user_message))
+    store_in_semantic_cache = semantic_cache is not None and not state.history
+
+    if use_semantic_cache:
+        cached_decision = semantic_cache.lookup(user_message)
+        if cached_decision:
+            return _from_cached_decision(cached_decision, user_message)
+
+    if pre_router:
+        local_decision = pre_router.route(user_message)
+        if local_decision:
+            route, confidence, source = local_decision
+            logging.info(f"Pre-router ({source}, confidence={confidence:.2f}) routed message to {route}")
+            log_routing_decision(user_message, route, source)
+            return _from_cached_decision({"next_node": route, "general_response": None}, user_message)
     
-    # Bind tools to the LLM for function calling
-    llm_with_tools = llm.bind_tools(TOOLS)
-    
-    # Use the LLM to process the router prompt and potentially call a tool
-    chain = ROUTER_PROMPT | llm_with_tools
-    response = chain.invoke({"user_message": user_message})
+    # Reuse the cached ROUTER_PROMPT | llm.bind_tools(TOOLS) chain for function calling
+    chain = get_router_chain(llm)
+    # A direct router reply is the answer to the user, so its tokens may be streamed, unless the
+    # message goes on to the email drafter, which replaces that reply.
+    tags = [] if _is_email_request(user_message) else [USER_VISIBLE_TAG]
+    response = await chain.ainvoke({"user_message": user_message, "history": state.history}, config={"tags": tags})
 
     tool_calls = response.tool_calls
     
     if tool_calls:
         # If the LLM decided to call a tool, pass the tool calls to the next node
+        log_routing_decision(user_message, "execute_tool", "llm")
         return {
             "next_node": "execute_tool",
             "tool_calls": tool_calls,
@@ -33,15 +65,18 @@ def router_node(state: AgentState) -> Dict[str, Any]:
         # If no tool call, it's a general message or email draft request
         general_response = response.content
         
-        # Simple keyword-based check for email drafting
-        if "draft an email" in user_message.lower() or "write an email" in user_message.lower():
-            return {
+        if _is_email_request(user_message):
+            decision = {
                 "next_node": "email_draft_generator",
-                "email_request_content": user_message, # Pass original message for email drafting
                 "general_response": None
             }
         else:
-            return {
+            decision = {
                 "next_node": "general_message_handler",
                 "general_response": general_response
             }
+
+        log_routing_decision(user_message, decision["next_node"], "llm")
+        if store_in_semantic_cache:
+            semantic_cache.store(user_message, decision)
+        return _from_cached_decision(decision, user_message)
@@ -0,0 +1,3 @@
+# LLM calls tagged with USER_VISIBLE_TAG produce the reply shown to the user: in streaming mode
+# their tokens are forwarded to Telegram as they arrive. Untagged calls (e.g. tool selection) are never streamed.
+USER_VISIBLE_TAG = "user_visible"
@@ -0,0 +1,184 @@
+import json
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+# Messages that look like actionable requests are never answered from the cache:
+# a cached general reply must not stand in for a tool call.
+TOOL_INTENT_PATTERN = re.compile(
+    r"\b(schedul\w*|reschedul\w*|book\w*|cancel\w*|move|appointment\w*|meeting\w*|calendar|"
+    r"free|available|availability|slot\w*|tomorrow|today|tonight|monday|tuesday|wednesday|"
+    r"thursday|friday|saturday|sunday|report\w*|leak\w*|damage\w*)\b",
+    re.IGNORECASE,
+)
+
+# Follow-ups that only make sense after the earlier messages of the chat ("yes", "move it to 3pm",
+# "what about the other one?"); in an ongoing conversation they are not answered from the cache.
+CONTEXT_REFERENCE_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|he|she|him|her|his|again|also|instead|same|above|"
+    r"previous|earlier|other|yes|yeah|yep|no|nope|ok|okay|sure)\b|^\W*(and|but|or|what about|how about)\b|^[\d\W]*([ap]m)?\W*$",
+    re.IGNORECASE,
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+class HashingEmbedder:
+    """
+    Local, dependency-free text embedding: word unigrams/bigrams and character trigrams are hashed
+    (with a stable CRC32, so vectors are identical across processes) into a fixed number of
+    buckets and L2-normalised, so a dot product gives the cosine similarity.
+    """
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+        joined = f" {' '.join(words)} "
+        features += [f"c:{joined[i:i + 3]}" for i in range(len(joined) - 2)]
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            hashed = zlib.crc32(feature.encode())
+            # The top bit picks the sign so that colliding features tend to cancel out
+            vector[hashed % self.dim] += 1.0 if hashed & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Similarity cache of router decisions backed by a preallocated NumPy matrix.
+    A lookup embeds the message and takes the best cosine match among live entries; matches above
+    the threshold are returned and written to the audit log so false hits can be reviewed.
+    Entries expire after max_age_seconds and, when the cache is full, the least recently used entry is replaced.
+    """
+    def __init__(
+        self,
+        threshold: float = settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+        max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        max_age_seconds: float = settings.SEMANTIC_CACHE_MAX_AGE_SECONDS,
+        audit_log_path: Optional[str] = settings.SEMANTIC_CACHE_AUDIT_LOG_PATH,
+        embedder: Optional[HashingEmbedder] = None,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.audit_log_path = audit_log_path
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._created_at = np.full(max_entries, -np.inf)
+        self._last_used = np.full(max_entries, -np.inf)
+        self._texts: List[Optional[str]] = [None] * max_entries
+        self._payloads: List[Optional[Dict[str, Any]]] = [None] * max_entries
+
+        self.lookups = 0
+        self.hits = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_cacheable(message: str) -> bool:
+        return not TOOL_INTENT_PATTERN.search(message)
+
+    @staticmethod
+    def refers_to_context(message: str) -> bool:
+        return bool(CONTEXT_REFERENCE_PATTERN.search(message))
+
+    def lookup(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached payload of the most similar live entry, or None.
+        """
+        if not self.is_cacheable(message):
+            self.bypassed += 1
+            return None
+
+        vector = self.embedder.embed(message)
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            live = self._created_at > now - self.max_age_seconds
+            if not live.any():
+                return None
+            similarities = np.where(live, self._vectors @ vector, -1.0)
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+            self.hits += 1
+            self._last_used[best] = now
+            matched_text = self._texts[best]
+            payload = dict(self._payloads[best])
+
+        self._audit(message, matched_text, similarity, payload)
+        return payload
+
+    def store(self, message: str, payload: Dict[str, Any]):
+        """
+        Caches a router decision. Decisions containing tool calls are never stored.
+        """
+        if payload.get("tool_calls") or not self.is_cacheable(message):
+            return
+
+        vector = self.embedder.embed(message)
+        now = time.time()
+        with self._lock:
+            expired = self._created_at <= now - self.max_age_seconds
+            if expired.any():
+                slot = int(np.argmax(expired))
+                if self._texts[slot] is not None:
+                    self.evictions += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._created_at[slot] = now
+            self._last_used[slot] = now
+            self._texts[slot] = message
+            self._payloads[slot] = dict(payload)
+            self.stores += 1
+
+    def _audit(self, message: str, matched_text: str, similarity: float, payload: Dict[str, Any]):
+        logging.info(f"Semantic cache hit (similarity={similarity:.3f}): {message!r} matched {matched_text!r}")
+        if not self.audit_log_path:
+            return
+        record = {
+            "timestamp": time.time(),
+            "message": message,
+            "matched_message": matched_text,
+            "similarity": round(similarity, 4),
+            "next_node": payload.get("next_node"),
+        }
+        try:
+            with open(self.audit_log_path, "a", encoding="utf-8") as audit_log:
+                audit_log.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write semantic cache audit log: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            live = int((self._created_at > time.time() - self.max_age_seconds).sum())
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": live,
+        }
+
+# Global semantic cache instance (None when the cache is disabled)
+semantic_cache: Optional[SemanticCache] = SemanticCache() if settings.SEMANTIC_CACHE_ENABLED else None
@@ -1,25 +1,41 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dateutil.parser import parse as date_parse
+from functools import partial
 from typing import List, Dict, Any, Optional
+from zoneinfo import ZoneInfo
 
-from services.calendar_service import CalendarService
+from core.config import settings
+from models.openai_models import ConstructionIssue
+from services.calendar_service import get_calendar_service
+from services.issue_tracker import get_issue_tracker
+from utils.dates import parse_datetime
+from utils.metrics import TOOL_CALL_LATENCY, observe_latency
 
 logging.basicConfig(level=logging.INFO)
 
+# Bounded thread pool for the blocking tools (the Google API client is synchronous).
+# Keeps slow Calendar calls off the event loop without spawning unbounded threads.
+TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.TOOL_EXECUTOR_MAX_WORKERS,
+    thread_name_prefix="tool-executor",
+)
+
 def schedule_appointment(summary: str, date: str, time: str, duration_minutes: int, notes: str = "", attendees: List[str] = []) -> Dict[str, Any]:
     """
     Schedules a new appointment using the CalendarService.
     """
     try:
         combined_datetime_str = f"{date} {time}"
-        start_datetime = date_parse(combined_datetime_str, fuzzy=True)
+        start_datetime = parse_datetime(combined_datetime_str, ZoneInfo(settings.CALENDAR_TIMEZONE))
         end_datetime = start_datetime + timedelta(minutes=duration_minutes)
         
         start_time_iso = start_datetime.isoformat()
         end_time_iso = end_datetime.isoformat()
 
-        calendar_service = CalendarService()
+        calendar_service = get_calendar_service()
+        conflicts = calendar_service.find_conflicts(start_time_iso, end_time_iso)
         result = calendar_service.create_event(
             summary=summary,
             start_time=start_time_iso,
@@ -27,7 +43,10 @@ def schedule_appointment(summary: str, date: str, time: str, duration_minutes: i
             attendees=attendees,
             description=notes
         )
-        return {"status": "success", "message": f"Appointment scheduled: {summary} on {start_datetime.strftime('%Y-%m-%d %H:%M')}. {result.get('message', '')}", "event_id": result.get('event_id')}
+        message = f"Appointment scheduled: {summary} on {start_datetime.strftime('%Y-%m-%d %H:%M')}. {result.get('message', '')}"
+        if conflicts:
+            message += f" Note: it overlaps with {', '.join(event.get('summary', 'an untitled event') for event in conflicts)}."
+        return {"status": "success", "message": message, "event_id": result.get('event_id')}
     except Exception as e:
         logging.error(f"Error scheduling appointment: {e}", exc_info=True)
         return {"status": "error", "message": f"Failed to schedule appointment: {str(e)}"}
@@ -38,13 +57,13 @@ def reschedule_appointment(event_id: str, new_date: str, new_time: str, new_dura
     """
     try:
         combined_datetime_str = f"{new_date} {new_time}"
-        new_start_datetime = date_parse(combined_datetime_str, fuzzy=True)
+        new_start_datetime = parse_datetime(combined_datetime_str, ZoneInfo(settings.CALENDAR_TIMEZONE))
         new_end_datetime = new_start_datetime + timedelta(minutes=new_duration_minutes)
 
         new_start_time_iso = new_start_datetime.isoformat()
         new_end_time_iso = new_end_datetime.isoformat()
 
-        calendar_service = CalendarService()
+        calendar_service = get_calendar_service()
         result = calendar_service.reschedule_event(
             event_id=event_id,
             new_start_time=new_start_time_iso,
@@ -55,13 +74,139 @@ def reschedule_appointment(event_id: str, new_date: str, new_time: str, new_dura
         logging.error(f"Error rescheduling appointment: {e}", exc_info=True)
         return {"status": "error", "message": f"Failed to reschedule appointment: {str(e)}"}
 
-def report_construction_issue(urgency: str, description: str, location: str, reported_by: str, action_required: str) -> Dict[str, Any]:
+def _prepare_schedule_appointment(calendar_service, summary: str, date: str, time: str, duration_minutes: int, notes: str = "", attendees: List[str] = []):
+    """
+    Batch variant of schedule_appointment: returns the insert request and a formatter for its outcome.
+    """
+    start_datetime = parse_datetime(f"{date} {time}", ZoneInfo(settings.CALENDAR_TIMEZONE))
+    end_datetime = start_datetime + timedelta(minutes=duration_minutes)
+    conflicts = calendar_service.find_conflicts(start_datetime.isoformat(), end_datetime.isoformat())
+    request = calendar_service.create_event_request(
+        summary=summary,
+        start_time=start_datetime.isoformat(),
+        end_time=end_datetime.isoformat(),
+        attendees=attendees,
+        description=notes
+    )
+
+    def format_result(event: Optional[Dict[str, Any]], error: Optional[Exception]) -> Dict[str, Any]:
+        if error is not None:
+            return {"status": "error", "message": f"Failed to schedule appointment: {str(error)}"}
+        message = f"Appointment scheduled: {summary} on {start_datetime.strftime('%Y-%m-%d %H:%M')}. Event created: {event.get('htmlLink')}"
+        if conflicts:
+            message += f" Note: it overlaps with {', '.join(conflict.get('summary', 'an untitled event') for conflict in conflicts)}."
+        return {"status": "success", "message": message, "event_id": event.get('id')}
+
+    return request, format_result
+
+def _prepare_reschedule_appointment(calendar_service, event_id: str, new_date: str, new_time: str, new_duration_minutes: int):
     """
-    Reports a construction site issue.
+    Batch variant of reschedule_appointment: returns the patch request and a formatter for its outcome.
     """
-    logging.info(f"Received construction issue report: Urgency={urgency}, Description={description}, Location={location}, Reported by={reported_by}, Action required={action_required}")
-    # In a real implementation, this would interact with an issue tracking system or notification service.
-    return {"status": "success", "message": "Construction issue reported successfully. I will proceed with the necessary actions."}
+    new_start_datetime = parse_datetime(f"{new_date} {new_time}", ZoneInfo(settings.CALENDAR_TIMEZONE))
+    new_end_datetime = new_start_datetime + timedelta(minutes=new_duration_minutes)
+    request = calendar_service.reschedule_event_request(
+        event_id=event_id,
+        new_start_time=new_start_datetime.isoformat(),
+        new_end_time=new_end_datetime.isoformat()
+    )
+
+    def format_result(event: Optional[Dict[str, Any]], error: Optional[Exception]) -> Dict[str, Any]:
+        if error is not None:
+            return {"status": "error", "message": f"Failed to reschedule appointment: {str(error)}"}
+        return {"status": "success", "message": f"Appointment {event_id} rescheduled to {new_start_datetime.strftime('%Y-%m-%d %H:%M')}. Event rescheduled: {event.get('htmlLink')}"}
+
+    return request, format_result
+
+def find_available_slots(start_date: str, end_date: str = "", duration_minutes: int = 60, attendees: List[str] = []) -> Dict[str, Any]:
+    """
+    Finds free time slots shared by the user's calendar and the attendees using the CalendarService.
+    """
+    try:
+        tz = ZoneInfo(settings.CALENDAR_TIMEZONE)
+        # Relative dates ('tomorrow', 'next Monday') are resolved against the current date in tz
+        window_start = parse_datetime(start_date, tz)
+        window_end = parse_datetime(end_date, tz) if end_date else window_start + timedelta(days=7)
+
+        calendar_service = get_calendar_service()
+        slots = calendar_service.find_available_slots(
+            start_time=window_start.isoformat(),
+            end_time=window_end.isoformat(),
+            duration_minutes=duration_minutes,
+            attendees=attendees,
+        )
+        if not slots:
+            return {"status": "success", "message": "No free slots found in the requested range.", "slots": []}
+        formatted_slots = ", ".join(datetime.fromisoformat(slot).astimezone(tz).strftime('%a %Y-%m-%d %H:%M') for slot in slots)
+        return {"status": "success", "message": f"Available {duration_minutes}-minute slots: {formatted_slots}", "slots": slots}
+    except Exception as e:
+        logging.error(f"Error finding available slots: {e}", exc_info=True)
+        return {"status": "error", "message": f"Failed to find available slots: {str(e)}"}
+
+def list_appointments(start_date: str, end_date: str = "") -> Dict[str, Any]:
+    """
+    Lists the appointments on the calendar within a date range using the CalendarService.
+    """
+    try:
+        tz = ZoneInfo(settings.CALENDAR_TIMEZONE)
+        # Relative dates ('tomorrow', 'next Monday') are resolved against the current date in tz
+        window_start = parse_datetime(start_date, tz)
+        window_end = parse_datetime(end_date, tz) if end_date else window_start + timedelta(days=1)
+
+        calendar_service = get_calendar_service()
+        events = calendar_service.list_events(window_start.isoformat(), window_end.isoformat())
+        if not events:
+            return {"status": "success", "message": "Your calendar is free in the requested range.", "events": []}
+        lines = []
+        for event in events:
+            start = event.get('start', {})
+            if 'dateTime' in start:
+                when = datetime.fromisoformat(start['dateTime']).astimezone(tz).strftime('%a %Y-%m-%d %H:%M')
+            else:
+                when = f"{start.get('date')} (all day)"
+            lines.append(f"- {when}: {event.get('summary', 'Untitled event')} (id: {event.get('id')})")
+        return {"status": "success", "message": "Appointments:\n" + "\n".join(lines), "events": events}
+    except Exception as e:
+        logging.error(f"Error listing appointments: {e}", exc_info=True)
+        return {"status": "error", "message": f"Failed to list appointments: {str(e)}"}
+
+async def report_construction_issue(urgency: str, description: str, location: str, reported_by: str, action_required: str) -> Dict[str, Any]:
+    """
+    Records a construction site issue in the issue tracker; urgent issues are sent to the notification chats right away.
+    """
+    try:
+        issue = ConstructionIssue(
+            urgency=urgency,
+            description=description,
+            location=location,
+            reported_by=reported_by,
+            action_required=action_required,
+        )
+        result = await get_issue_tracker().report(issue)
+        if result["duplicate"]:
+            message = f"This matches issue #{result['issue_id']} already open at {result['site']}; I added your report to it."
+        else:
+            message = f"Construction issue #{result['issue_id']} recorded for {result['site']}."
+        if result["notified_chats"]:
+            message += f" Urgent alert sent to {result['notified_chats']} chat(s)."
+        elif issue.urgency == "routine":
+            message += " It will be included in the daily issue briefing."
+        return {"status": "success", "message": message, "issue_id": result["issue_id"]}
+    except Exception as e:
+        logging.error(f"Error reporting construction issue: {e}", exc_info=True)
+        return {"status": "error", "message": f"Failed to report construction issue: {str(e)}"}
+
+def resolve_construction_issue(issue_id: int) -> Dict[str, Any]:
+    """
+    Marks a construction issue as resolved, removing it from briefings and deduplication.
+    """
+    try:
+        if not get_issue_tracker().set_status(issue_id, "resolved"):
+            return {"status": "error", "message": f"Construction issue #{issue_id} not found."}
+        return {"status": "success", "message": f"Construction issue #{issue_id} marked as resolved."}
+    except Exception as e:
+        logging.error(f"Error resolving construction issue: {e}", exc_info=True)
+        return {"status": "error", "message": f"Failed to resolve construction issue: {str(e)}"}
 
 # List of tools available to the LLM
 TOOLS = [
@@ -105,11 +250,47 @@ TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_available_slots",
+            "description": "Finds free time slots on the calendar, shared with the given attendees, within working hours.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {"type": "string", "description": "The start of the range to search (e.g., 'tomorrow', 'July 25th', 'next Monday')."},
+                    "end_date": {"type": "string", "description": "The end of the range to search. Defaults to one week after start_date."},
+                    "duration_minutes": {"type": "integer", "description": "The required duration of the meeting in minutes (default to 60 if not specified)."},
+                    "attendees": {
+                        "type": "array",
+                        "items": {"type": "string", "format": "email"},
+                        "description": "A list of attendees' email addresses whose availability must also be checked."
+                    }
+                },
+                "required": ["start_date", "duration_minutes"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_appointments",
+            "description": "Lists the appointments on the calendar within a date range (e.g. 'what's on my calendar tomorrow').",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {"type": "string", "description": "The start of the range (e.g., 'tomorrow', 'July 25th', 'next Monday')."},
+                    "end_date": {"type": "string", "description": "The end of the range. Defaults to one day after start_date."}
+                },
+                "required": ["start_date"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
             "name": "report_construction_issue",
-            "description": "Reports a construction site issue with its details.",
+            "description": "Reports a construction site issue with its details. Urgent issues are alerted immediately; routine ones go into the daily briefing.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -122,6 +303,20 @@ TOOLS = [
                 "required": ["urgency", "description", "location", "reported_by", "action_required"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "resolve_construction_issue",
+            "description": "Marks a previously reported construction issue as resolved.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "issue_id": {"type": "integer", "description": "The number of the issue (e.g. 42 for issue #42)."}
+                },
+                "required": ["issue_id"]
+            }
+        }
     }
 ]
 
@@ -129,5 +324,64 @@ TOOLS = [
 TOOL_MAP = {
     "schedule_appointment": schedule_appointment,
     "reschedule_appointment": reschedule_appointment,
+    "find_available_slots": find_available_slots,
+    "list_appointments": list_appointments,
     "report_construction_issue": report_construction_issue,
+    "resolve_construction_issue": resolve_construction_issue,
 }
+
+# Calendar write tools that can be combined into a single Calendar API batch request
+BATCHABLE_TOOLS = {
+    "schedule_appointment": _prepare_schedule_appointment,
+    "reschedule_appointment": _prepare_reschedule_appointment,
+}
+
+def run_calendar_batch(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Executes several BATCHABLE_TOOLS calls as one Calendar API batch request.
+    Returns one result per tool call, in order; a call that fails does not affect the others.
+    """
+    calendar_service = get_calendar_service()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+    prepared = []
+    for index, tool_call in enumerate(tool_calls):
+        try:
+            request, format_result = BATCHABLE_TOOLS[tool_call['name']](calendar_service, **tool_call['args'])
+            prepared.append((index, request, format_result))
+        except Exception as e:
+            logging.error(f"Error preparing tool '{tool_call['name']}': {e}", exc_info=True)
+            results[index] = {"status": "error", "message": f"Failed to prepare '{tool_call['name']}': {str(e)}"}
+
+    responses = calendar_service.execute_batch([request for _, request, _ in prepared])
+    for (index, _, format_result), (response, error) in zip(prepared, responses):
+        results[index] = format_result(response, error)
+    return results
+
+async def run_tool(tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs a tool from TOOL_MAP: async tools are awaited, blocking ones run on the bounded tool
+    executor so they do not block the event loop.
+    """
+    tool_function = TOOL_MAP[tool_name]
+    loop = asyncio.get_running_loop()
+    with observe_latency(TOOL_CALL_LATENCY, tool=tool_name, status="success") as labels:
+        if asyncio.iscoroutinefunction(tool_function):
+            result = await tool_function(**tool_args)
+        else:
+            result = await loop.run_in_executor(TOOL_EXECUTOR, partial(tool_function, **tool_args))
+        labels["status"] = result.get("status", "success")
+    return result
+
+async def run_tool_batch(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Runs run_calendar_batch on the bounded tool executor.
+    """
+    loop = asyncio.get_running_loop()
+    with observe_latency(TOOL_CALL_LATENCY, tool="calendar_batch", status="success"):
+        return await loop.run_in_executor(TOOL_EXECUTOR, run_calendar_batch, tool_calls)
+
+async def shutdown_tool_executor():
+    """
+    Shuts down the tool executor, waiting for running tool calls to complete without blocking the event loop.
+    """
+    await asyncio.to_thread(TOOL_EXECUTOR.shutdown, True)
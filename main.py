@@ -1,8 +1,20 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from api.v1.endpoints import telegram
 from services.scheduler_service import start_scheduler, shutdown_scheduler
 from utils.http_client import HttpClient
+from core.tools import shutdown_tool_executor
+from core.llm_provider import llm_registry
+from services.calendar_service import calendar_service_pool
+from services.calendar_mirror import close_calendar_mirror
+from services.issue_tracker import close_issue_tracker
+from core.config import settings
+from services.update_queue import update_queue
+from services.update_deduplicator import update_deduplicator
+from services.conversation_memory import conversation_memory
+from services.telegram_outbox import telegram_outbox
+from services.update_poller import update_poller
+from utils.metrics import render_metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -10,8 +22,23 @@ async def lifespan(app: FastAPI):
     Context manager to handle startup and shutdown events.
     """
     start_scheduler()
+    if settings.UPDATE_PROCESSING_MODE == "queue":
+        update_queue.start()
+    if settings.INGESTION_MODE == "polling":
+        update_poller.start()
     yield
-    shutdown_scheduler()
+    await update_poller.stop()
+    await update_queue.stop()
+    await telegram_outbox.aclose()
+    update_deduplicator.close()
+    await shutdown_scheduler()
+    await shutdown_tool_executor()
+    calendar_service_pool.shutdown()
+    close_calendar_mirror()
+    close_issue_tracker()
+    if conversation_memory:
+        await conversation_memory.aclose()
+    await llm_registry.close()
     await HttpClient.close_client()
 
 app = FastAPI(
@@ -30,3 +57,12 @@ async def read_root():
     Root endpoint to check if the API is running.
     """
     return {"message": "Welcome to the AI Assistant API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: webhook, transcription, agent, per-node, tool-call latencies, LLM token usage
+    and the connection pools of the shared HTTP client.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -6,7 +6,9 @@ class AgentState(BaseModel):
         arbitrary_types_allowed = True
 
     llm: Optional[Any] = Field(None, exclude=True)
+    chat_id: Optional[int] = None
     input_message: str = ""
+    history: List[Any] = Field(default_factory=list) # Conversation summary and recent messages of the chat
     message_type: str = "text"
     email_request_content: Optional[str] = None
     email_draft: Optional[str] = None
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class EmailMessage(BaseModel):
+    """
+    A Gmail message reduced to what the summarizer needs.
+    body is None when the message is summarized from its snippet only.
+    """
+    id: str
+    thread_id: str
+    sender: str = ""
+    subject: str = ""
+    date: str = ""
+    snippet: str = ""
+    label_ids: List[str] = Field(default_factory=list)
+    body: Optional[str] = None
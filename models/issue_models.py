@@ -0,0 +1,15 @@
+from typing import Literal
+
+from models.openai_models import ConstructionIssue
+
+class TrackedIssue(ConstructionIssue):
+    """
+    A ConstructionIssue as stored by the issue tracker.
+    report_count counts the near-identical reports merged into it; timestamps are Unix seconds.
+    """
+    id: int
+    site: str
+    status: Literal["open", "resolved"] = "open"
+    report_count: int = 1
+    reported_at: float
+    last_reported_at: float
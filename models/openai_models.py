@@ -11,6 +11,26 @@ class EmailSummary(BaseModel):
     original_sender: str
     original_subject: str
 
+class EmailAnalysis(BaseModel):
+    """
+    The part of an EmailSummary produced by the LLM; sender and subject come from the headers.
+    """
+    classification: Literal["Urgent", "FYI", "Spam", "Unknown"]
+    summary: str
+    is_construction_related: bool
+
+class EmailBatchEntry(EmailAnalysis):
+    """
+    The analysis of one email of a digest batch, identified by its index in the batch.
+    """
+    index: int
+
+class EmailBatchAnalysis(BaseModel):
+    """
+    The analyses of all emails of a digest batch.
+    """
+    entries: List[EmailBatchEntry]
+
 class DailySummary(BaseModel):
     """
     Represents the daily summary of all processed emails.
@@ -0,0 +1,9 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+CONVERSATION_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You maintain the running summary of a Telegram conversation between a construction company executive and their AI assistant.
+Update the existing summary with the new messages. Keep names, dates, commitments, open requests and decisions; drop small talk.
+Answer with the updated summary only, in at most {max_words} words.
+"""),
+    ("human", "Existing summary:\n{summary}\n\nNew messages:\n{transcript}")
+])
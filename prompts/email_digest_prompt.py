@@ -0,0 +1,11 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+EMAIL_DIGEST_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You triage the inbox of a construction company executive.
+You receive several emails, each introduced by its index in square brackets. Return exactly one entry per email, with its index:
+- 'classification': "Urgent" (needs their attention or action today), "FYI" (informational), "Spam" (unsolicited or promotional) or "Unknown".
+- 'summary': one or two sentences keeping names, dates, amounts and requested actions.
+- 'is_construction_related': true when it concerns a construction project, site, supplier, permit or crew.
+"""),
+    ("human", "{emails}")
+])
@@ -0,0 +1,10 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+EMAIL_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You triage the inbox of a construction company executive.
+Classify the email as "Urgent" (needs their attention or action today), "FYI" (informational), "Spam" (unsolicited or promotional) or "Unknown".
+Summarize it in one or two sentences, keeping names, dates, amounts and requested actions.
+Set is_construction_related when it concerns a construction project, site, supplier, permit or crew.
+"""),
+    ("human", "From: {sender}\nSubject: {subject}\n\n{content}")
+])
@@ -0,0 +1,9 @@
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+GENERAL_MESSAGE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an AI executive assistant for a construction company, chatting with your boss on Telegram.
+Reply to the user's message briefly, politely and helpfully.
+"""),
+    MessagesPlaceholder("history", optional=True),
+    ("human", "User Message: {user_message}")
+])
@@ -1,4 +1,4 @@
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 ROUTER_PROMPT = ChatPromptTemplate.from_messages([
     ("system", """You are an AI assistant for a Telegram bot. Your task is to analyze user messages and determine the user's intent.
@@ -8,5 +8,6 @@ If the user's message indicates an intent to perform an action that can be handl
 If the user wants to draft an email, respond with a message indicating that intent.
 Otherwise, respond with a general message.
 """),
+    MessagesPlaceholder("history", optional=True),
     ("human", "User Message: {user_message}")
 ])
@@ -0,0 +1,231 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+from core.config import settings
+
+class CalendarMirror:
+    """
+    Local SQLite mirror of a Google Calendar, kept current with incremental syncToken syncs.
+    Events are indexed by id and by time range, so availability, agenda and conflict queries are
+    answered locally. The mirror only needs an object exposing the Calendar API's events().list(),
+    which makes it testable against a fake backend.
+    """
+    def __init__(
+        self,
+        path: str = settings.CALENDAR_MIRROR_PATH,
+        calendar_id: str = "primary",
+        max_staleness_seconds: float = settings.CALENDAR_MIRROR_MAX_STALENESS_SECONDS,
+        lookback_days: int = settings.CALENDAR_MIRROR_LOOKBACK_DAYS,
+    ):
+        self.calendar_id = calendar_id
+        self.max_staleness_seconds = max_staleness_seconds
+        self.lookback_days = lookback_days
+        self.tz = ZoneInfo(settings.CALENDAR_TIMEZONE)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                calendar_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                summary TEXT,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL,
+                transparent INTEGER NOT NULL DEFAULT 0,
+                data TEXT NOT NULL,
+                PRIMARY KEY (calendar_id, id)
+            );
+            CREATE INDEX IF NOT EXISTS events_time_range ON events (calendar_id, start_ts, end_ts);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                calendar_id TEXT PRIMARY KEY,
+                sync_token TEXT,
+                synced_at REAL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _event_bounds(self, event: Dict[str, Any]) -> Tuple[float, float]:
+        def to_timestamp(value: Dict[str, Any]) -> float:
+            if "dateTime" in value:
+                return datetime.fromisoformat(value["dateTime"]).timestamp()
+            # All-day events carry a date in the calendar's timezone
+            return datetime.combine(date.fromisoformat(value["date"]), datetime.min.time(), tzinfo=self.tz).timestamp()
+        return to_timestamp(event["start"]), to_timestamp(event["end"])
+
+    def _upsert(self, event: Dict[str, Any]):
+        start_ts, end_ts = self._event_bounds(event)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO events (calendar_id, id, summary, start_ts, end_ts, transparent, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.calendar_id,
+                event["id"],
+                event.get("summary"),
+                start_ts,
+                end_ts,
+                1 if event.get("transparency") == "transparent" else 0,
+                json.dumps(event),
+            ),
+        )
+
+    def _delete(self, event_id: str):
+        self._conn.execute("DELETE FROM events WHERE calendar_id = ? AND id = ?", (self.calendar_id, event_id))
+
+    def _apply(self, event: Dict[str, Any]):
+        if event.get("status") == "cancelled":
+            self._delete(event["id"])
+        elif "start" in event and "end" in event:
+            self._upsert(event)
+
+    def _sync_state(self) -> Tuple[Optional[str], Optional[float]]:
+        row = self._conn.execute(
+            "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def sync(self, service) -> int:
+        """
+        Pulls changes since the last sync (or everything since the lookback window on first sync)
+        and applies them to the mirror. Returns the number of changed events.
+        A full resync is performed when Google reports the sync token as expired (HTTP 410).
+        """
+        with self._lock:
+            sync_token, _ = self._sync_state()
+            try:
+                return self._sync_pages(service, sync_token)
+            except HttpError as error:
+                if sync_token and error.resp.status == 410:
+                    logging.warning("Calendar sync token expired, performing a full resync.")
+                    self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+                    return self._sync_pages(service, None)
+                raise
+
+    def _sync_pages(self, service, sync_token: Optional[str]) -> int:
+        params: Dict[str, Any] = {"calendarId": self.calendar_id, "singleEvents": True, "maxResults": 2500}
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            time_min = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+            params["timeMin"] = time_min.isoformat()
+
+        changed = 0
+        page_token = None
+        while True:
+            if page_token:
+                params["pageToken"] = page_token
+            response = service.events().list(**params).execute()
+            for event in response.get("items", []):
+                self._apply(event)
+                changed += 1
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+            (self.calendar_id, response.get("nextSyncToken"), time.time()),
+        )
+        self._conn.commit()
+        logging.info(f"Calendar mirror synced ({changed} changes, incremental={bool(sync_token)}).")
+        return changed
+
+    def ensure_fresh(self, service):
+        """
+        Syncs the mirror if it has never been synced or the last sync is older than the staleness limit.
+        """
+        _, synced_at = self._sync_state()
+        if synced_at is None or time.time() - synced_at > self.max_staleness_seconds:
+            self.sync(service)
+
+    def record_event(self, event: Dict[str, Any]):
+        """
+        Writes an event returned by an insert/patch call through to the mirror.
+        """
+        with self._lock:
+            self._apply(event)
+            self._conn.commit()
+
+    def remove_event(self, event_id: str):
+        with self._lock:
+            self._delete(event_id)
+            self._conn.commit()
+
+    def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM events WHERE calendar_id = ? AND id = ?", (self.calendar_id, event_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _timestamp(self, moment: datetime) -> float:
+        # Naive datetimes are interpreted in the calendar's timezone
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=self.tz)
+        return moment.timestamp()
+
+    def events_between(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Returns the events overlapping [start, end), ordered by start time.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+                (self.calendar_id, self._timestamp(end), self._timestamp(start)),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def busy_intervals(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        Returns the sorted busy intervals overlapping [start, end); transparent events are ignored.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start_ts, end_ts FROM events "
+                "WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? AND transparent = 0 ORDER BY start_ts",
+                (self.calendar_id, self._timestamp(end), self._timestamp(start)),
+            ).fetchall()
+        return [
+            (datetime.fromtimestamp(start_ts, tz=self.tz), datetime.fromtimestamp(end_ts, tz=self.tz))
+            for start_ts, end_ts in rows
+        ]
+
+    def conflicts(self, start: datetime, end: datetime, exclude_event_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the busy events overlapping [start, end), optionally ignoring one event (e.g. the one being moved).
+        """
+        return [
+            event for event in self.events_between(start, end)
+            if event.get("id") != exclude_event_id and event.get("transparency") != "transparent"
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+@lru_cache(maxsize=1)
+def get_calendar_mirror() -> Optional[CalendarMirror]:
+    """
+    Returns the process-wide calendar mirror, opening its database on first use, or None when the mirror is disabled.
+    """
+    return CalendarMirror() if settings.CALENDAR_MIRROR_ENABLED else None
+
+def close_calendar_mirror():
+    """
+    Closes the process-wide calendar mirror if it was opened.
+    """
+    if get_calendar_mirror.cache_info().currsize:
+        mirror = get_calendar_mirror()
+        if mirror:
+            mirror.close()
+        get_calendar_mirror.cache_clear()
@@ -1,23 +1,71 @@
 import logging
 import os.path
-from typing import List, Dict, Any, Optional
+import threading
+from datetime import datetime, time, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from core.config import settings
+from services.calendar_mirror import CalendarMirror, get_calendar_mirror
+from utils.slot_finder import merge_busy_intervals, find_free_slots
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# Maximum number of calendars in a single free/busy query
+FREEBUSY_MAX_ITEMS = 50
+
+# Maximum number of calls in a single Calendar API batch request
+CALENDAR_BATCH_MAX_REQUESTS = 50
+
+# Default mirror of CalendarService: the process-wide one, looked up when the service is built
+_SHARED_MIRROR = object()
+
 class CalendarService:
-    def __init__(self):
+    def __init__(self, creds: Optional[Credentials] = None, mirror: Optional[CalendarMirror] = _SHARED_MIRROR, http=None):
+        """
+        mirror defaults to the process-wide calendar mirror; pass None to always query the API.
+        http is an optional httplib2.Http-compatible transport (e.g. a fake Calendar backend in tests);
+        the credentials, when given, are applied on top of it. Without it, the credentials are
+        loaded from token.json when not given.
+        """
         logging.info("Initializing CalendarService.")
-        self.creds = self._authenticate()
-        self.service = build("calendar", "v3", credentials=self.creds)
+        # The bundled static discovery document avoids fetching it over the network on every build.
+        if http is None:
+            self.creds = creds or self._authenticate()
+            self.service = build("calendar", "v3", credentials=self.creds, static_discovery=True, cache_discovery=False)
+        else:
+            self.creds = creds
+            if creds is not None:
+                http = AuthorizedHttp(creds, http=http)
+            self.service = build("calendar", "v3", http=http, static_discovery=True, cache_discovery=False)
+        # Optional local mirror of the primary calendar used to answer reads without API calls
+        self.mirror = get_calendar_mirror() if mirror is _SHARED_MIRROR else mirror
 
-    def _authenticate(self):
+    def _fresh_mirror(self) -> Optional[CalendarMirror]:
+        """
+        Returns the mirror after an incremental sync if it is stale, or None when it is disabled or unavailable.
+        """
+        if self.mirror is None:
+            return None
+        try:
+            self.mirror.ensure_fresh(self.service)
+            return self.mirror
+        except HttpError as error:
+            logging.error(f"Calendar mirror sync failed, falling back to the API: {error}")
+            return None
+
+    @staticmethod
+    def _authenticate():
         creds = None
         # The file token.json stores the user's access and refresh tokens, and is
         # created automatically when the authorization flow completes for the first
@@ -38,21 +86,18 @@ class CalendarService:
                 token.write(creds.to_json())
         return creds
 
-    def create_event(self, summary: str, start_time: str, end_time: str, attendees: List[str], description: Optional[str] = None) -> Dict[str, Any]:
-        """
-        Creates a new calendar event.
-        start_time and end_time should be in ISO format (e.g., '2025-07-25T09:00:00-07:00')
-        """
-        event = {
+    @staticmethod
+    def _event_body(summary: str, start_time: str, end_time: str, attendees: List[str], description: Optional[str] = None) -> Dict[str, Any]:
+        return {
             'summary': summary,
             'description': description,
             'start': {
                 'dateTime': start_time,
-                'timeZone': 'Europe/Rome', # Assuming a default timezone
+                'timeZone': settings.CALENDAR_TIMEZONE,
             },
             'end': {
                 'dateTime': end_time,
-                'timeZone': 'Europe/Rome',
+                'timeZone': settings.CALENDAR_TIMEZONE,
             },
             'attendees': [{'email': att} for att in attendees],
             'reminders': {
@@ -63,45 +108,157 @@ class CalendarService:
                 ],
             },
         }
+
+    def create_event_request(self, summary: str, start_time: str, end_time: str, attendees: List[str], description: Optional[str] = None) -> HttpRequest:
+        """
+        Builds (without executing) the request that creates a calendar event, e.g. for execute_batch.
+        """
+        body = self._event_body(summary, start_time, end_time, attendees, description)
+        return self.service.events().insert(calendarId='primary', body=body)
+
+    def reschedule_event_request(self, event_id: str, new_start_time: str, new_end_time: str) -> HttpRequest:
+        """
+        Builds (without executing) the patch request that moves a calendar event, e.g. for execute_batch.
+        """
+        body = {
+            'start': {'dateTime': new_start_time, 'timeZone': settings.CALENDAR_TIMEZONE},
+            'end': {'dateTime': new_end_time, 'timeZone': settings.CALENDAR_TIMEZONE},
+        }
+        return self.service.events().patch(calendarId='primary', eventId=event_id, body=body)
+
+    def execute_batch(self, requests: List[HttpRequest]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Executes event requests in as few Calendar API batch requests as possible.
+        Returns a (response, error) pair per request, in the order given.
+        Created or updated events are written through to the local mirror.
+        """
+        results: List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]] = [(None, None)] * len(requests)
+
+        def on_response(index: int, request_id: str, response: Optional[Dict[str, Any]], exception: Optional[Exception]):
+            results[index] = (response, exception)
+
+        for offset in range(0, len(requests), CALENDAR_BATCH_MAX_REQUESTS):
+            batch = self.service.new_batch_http_request()
+            for index, request in enumerate(requests[offset:offset + CALENDAR_BATCH_MAX_REQUESTS], start=offset):
+                batch.add(request, callback=partial(on_response, index))
+            try:
+                batch.execute()
+            except HttpError as error:
+                logging.error(f"Calendar batch request failed: {error}")
+                for index in range(offset, min(offset + CALENDAR_BATCH_MAX_REQUESTS, len(requests))):
+                    if results[index] == (None, None):
+                        results[index] = (None, error)
+
+        if self.mirror:
+            for response, exception in results:
+                if response and exception is None:
+                    self.mirror.record_event(response)
+        return results
+
+    def create_event(self, summary: str, start_time: str, end_time: str, attendees: List[str], description: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Creates a new calendar event.
+        start_time and end_time should be in ISO format (e.g., '2025-07-25T09:00:00-07:00')
+        """
         try:
-            event = self.service.events().insert(calendarId='primary', body=event).execute()
+            event = self.create_event_request(summary, start_time, end_time, attendees, description).execute()
+            if self.mirror:
+                self.mirror.record_event(event)
             logging.info(f"Event created: {event.get('htmlLink')}")
             return {"status": "success", "message": f"Event created: {event.get('htmlLink')}", "event_id": event.get('id')}
         except HttpError as error:
             logging.error(f"An error occurred: {error}")
             return {"status": "error", "message": f"Failed to create event: {error}"}
 
-    def find_available_slots(self, start_time: str, end_time: str, duration_minutes: int, attendees: List[str]) -> List[str]:
+    def find_available_slots(self, start_time: str, end_time: str, duration_minutes: int, attendees: List[str], max_results: int = 10) -> List[str]:
         """
-        Finds available time slots for a meeting.
-        This is a more complex operation requiring free/busy queries.
-        For simplicity, this will return dummy data or require more detailed implementation.
+        Finds free time slots of duration_minutes shared by the primary calendar and all attendees.
+        start_time and end_time should be timezone-aware ISO strings.
+        Busy intervals from the free/busy query are merged and swept against the configured working hours.
+        Returns the start times of the slots in ISO format.
         """
-        logging.warning("find_available_slots is a placeholder and needs full implementation.")
-        # Example of a free/busy query structure
-        body = {
-            "timeMin": start_time,
-            "timeMax": end_time,
-            "items": [{"id": 'primary'}] + [{"id": att} for att in attendees]
-        }
+        window_start = datetime.fromisoformat(start_time)
+        window_end = datetime.fromisoformat(end_time)
+
+        busy_by_calendar = []
+        mirror = self._fresh_mirror()
+        if mirror:
+            busy_by_calendar.append(mirror.busy_intervals(window_start, window_end))
+            calendar_ids = list(attendees)
+        else:
+            calendar_ids = ["primary"] + list(attendees)
+
+        try:
+            # The free/busy endpoint accepts at most FREEBUSY_MAX_ITEMS calendars per query
+            for offset in range(0, len(calendar_ids), FREEBUSY_MAX_ITEMS):
+                body = {
+                    "timeMin": start_time,
+                    "timeMax": end_time,
+                    "items": [{"id": calendar_id} for calendar_id in calendar_ids[offset:offset + FREEBUSY_MAX_ITEMS]],
+                }
+                response = self.service.freebusy().query(body=body).execute()
+                for calendar_id, calendar in response.get("calendars", {}).items():
+                    if calendar.get("errors"):
+                        logging.warning(f"Free/busy lookup failed for {calendar_id}: {calendar['errors']}")
+                    busy_by_calendar.append([
+                        (datetime.fromisoformat(busy["start"]), datetime.fromisoformat(busy["end"]))
+                        for busy in calendar.get("busy", [])
+                    ])
+        except HttpError as error:
+            logging.error(f"An error occurred: {error}")
+            return []
+
+        busy = merge_busy_intervals(busy_by_calendar)
+        slots = find_free_slots(
+            busy,
+            window_start,
+            window_end,
+            timedelta(minutes=duration_minutes),
+            ZoneInfo(settings.CALENDAR_TIMEZONE),
+            work_start=time.fromisoformat(settings.WORKING_HOURS_START),
+            work_end=time.fromisoformat(settings.WORKING_HOURS_END),
+            working_days=settings.WORKING_DAYS,
+            max_results=max_results,
+        )
+        return [slot_start.isoformat() for slot_start, _ in slots]
+
+    def list_events(self, start_time: str, end_time: str) -> List[Dict[str, Any]]:
+        """
+        Lists the events overlapping the given ISO time range, ordered by start time.
+        Served from the local mirror when it is enabled.
+        """
+        window_start = datetime.fromisoformat(start_time)
+        window_end = datetime.fromisoformat(end_time)
+        mirror = self._fresh_mirror()
+        if mirror:
+            return mirror.events_between(window_start, window_end)
         try:
-            response = self.service.freebusy().query(body=body).execute()
-            # Process response to find actual free slots
-            # This is a simplified placeholder
-            return ["2025-07-22T10:00:00Z", "2025-07-22T14:00:00Z"]
+            response = self.service.events().list(
+                calendarId='primary', timeMin=start_time, timeMax=end_time, singleEvents=True, orderBy='startTime'
+            ).execute()
+            return response.get('items', [])
         except HttpError as error:
             logging.error(f"An error occurred: {error}")
             return []
 
+    def find_conflicts(self, start_time: str, end_time: str, exclude_event_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the events on the primary calendar that overlap the given ISO time range.
+        Requires the local mirror; returns an empty list when it is disabled.
+        """
+        mirror = self._fresh_mirror()
+        if not mirror:
+            return []
+        return mirror.conflicts(datetime.fromisoformat(start_time), datetime.fromisoformat(end_time), exclude_event_id)
+
     def reschedule_event(self, event_id: str, new_start_time: str, new_end_time: str) -> Dict[str, Any]:
         """
-        Reschedules an existing calendar event.
+        Reschedules an existing calendar event with a single patch request.
         """
         try:
-            event = self.service.events().get(calendarId='primary', eventId=event_id).execute()
-            event['start']['dateTime'] = new_start_time
-            event['end']['dateTime'] = new_end_time
-            updated_event = self.service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
+            updated_event = self.reschedule_event_request(event_id, new_start_time, new_end_time).execute()
+            if self.mirror:
+                self.mirror.record_event(updated_event)
             logging.info(f"Event rescheduled: {updated_event.get('htmlLink')}")
             return {"status": "success", "message": f"Event rescheduled: {updated_event.get('htmlLink')}"}
         except HttpError as error:
@@ -114,8 +271,95 @@ class CalendarService:
         """
         try:
             self.service.events().delete(calendarId='primary', eventId=event_id).execute()
+            if self.mirror:
+                self.mirror.remove_event(event_id)
             logging.info(f"Event {event_id} deleted.")
             return {"status": "success", "message": f"Event {event_id} deleted."}
         except HttpError as error:
             logging.error(f"An error occurred: {error}")
             return {"status": "error", "message": f"Failed to delete event: {error}"}
+
+class CalendarServicePool:
+    """
+    Process-wide, thread-safe provider of CalendarService instances.
+    Credentials are loaded once and shared; each worker thread gets its own CalendarService because
+    the underlying httplib2 transport is not thread-safe. A background thread refreshes the OAuth
+    token ahead of its expiry so that tool calls never wait on a refresh.
+    http_factory, when given, builds the per-thread HTTP transport (e.g. a fake Calendar backend).
+    """
+    def __init__(
+        self,
+        refresh_margin_seconds: float = 300.0,
+        retry_interval_seconds: float = 30.0,
+        http_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self.http_factory = http_factory
+        self.retry_interval_seconds = retry_interval_seconds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._creds: Optional[Credentials] = None
+        self._stop_event = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def _get_credentials(self) -> Credentials:
+        if self._creds is None:
+            with self._lock:
+                if self._creds is None:
+                    self._creds = CalendarService._authenticate()
+                    self._start_refresher()
+        return self._creds
+
+    def _start_refresher(self):
+        if self._creds.refresh_token is None:
+            logging.warning("Calendar credentials have no refresh token; proactive refresh disabled.")
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="calendar-token-refresher", daemon=True)
+        self._refresher.start()
+
+    def _seconds_until_refresh(self) -> float:
+        if self._creds.expiry is None:
+            return self.retry_interval_seconds
+        # google-auth stores expiry as a naive UTC datetime
+        refresh_at = self._creds.expiry.replace(tzinfo=timezone.utc) - self.refresh_margin
+        return max((refresh_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self._seconds_until_refresh()):
+            try:
+                self._creds.refresh(Request())
+                with open("token.json", "w") as token:
+                    token.write(self._creds.to_json())
+                logging.info(f"Calendar credentials refreshed, valid until {self._creds.expiry}.")
+            except Exception as e:
+                logging.error(f"Failed to refresh Calendar credentials: {e}", exc_info=True)
+                if self._stop_event.wait(self.retry_interval_seconds):
+                    break
+
+    def get(self) -> CalendarService:
+        """
+        Returns the CalendarService bound to the current thread, building it on first use.
+        """
+        calendar_service = getattr(self._local, "calendar_service", None)
+        if calendar_service is None:
+            http = self.http_factory() if self.http_factory else None
+            calendar_service = CalendarService(creds=self._get_credentials(), http=http)
+            self._local.calendar_service = calendar_service
+        return calendar_service
+
+    def shutdown(self):
+        """
+        Stops the background token refresher.
+        """
+        self._stop_event.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=5)
+
+# Global calendar service pool instance
+calendar_service_pool = CalendarServicePool()
+
+def get_calendar_service() -> CalendarService:
+    """
+    Returns a cached, thread-local CalendarService with shared, proactively refreshed credentials.
+    """
+    return calendar_service_pool.get()
@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from core.config import settings
+from prompts.conversation_summary_prompt import CONVERSATION_SUMMARY_PROMPT
+from utils.metrics import TokenUsageCallbackHandler
+
+# A stored message: (id, role, content); ids increase with insertion order within a chat
+StoredMessage = Tuple[int, str, str]
+
+# Rough characters-per-token ratio used for budgeting; exact counts would need a provider-specific tokenizer
+CHARS_PER_TOKEN = 4
+# Fixed per-message overhead (role markers) added to each estimate
+MESSAGE_TOKEN_OVERHEAD = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_TOKEN_OVERHEAD
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(max_tokens - MESSAGE_TOKEN_OVERHEAD, 1) * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+class InMemoryConversationBackend:
+    """
+    Per-chat ring buffers of messages plus the rolling summary, lost on restart.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._chats: Dict[int, Tuple[Optional[str], Deque[StoredMessage]]] = {}
+
+    def load(self, chat_id: int) -> Tuple[Optional[str], List[StoredMessage]]:
+        with self._lock:
+            summary, messages = self._chats.get(chat_id, (None, ()))
+            return summary, list(messages)
+
+    def append(self, chat_id: int, messages: List[Tuple[str, str]], max_messages: int) -> int:
+        """
+        Appends messages, evicting the oldest beyond max_messages. Returns the number of evicted messages.
+        """
+        with self._lock:
+            summary, buffer = self._chats.setdefault(chat_id, (None, deque(maxlen=max_messages)))
+            evicted = max(len(buffer) + len(messages) - max_messages, 0)
+            buffer.extend((next(self._ids), role, content) for role, content in messages)
+            return evicted
+
+    def fold(self, chat_id: int, summary: str, up_to_id: int):
+        """
+        Replaces the summary and forgets the messages it now covers.
+        """
+        with self._lock:
+            _, buffer = self._chats.get(chat_id, (None, deque()))
+            remaining = deque((m for m in buffer if m[0] > up_to_id), maxlen=buffer.maxlen)
+            self._chats[chat_id] = (summary, remaining)
+
+    def close(self):
+        pass
+
+class SQLiteConversationBackend:
+    """
+    Persistent conversation history, so chats keep their context across restarts.
+    """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversation_messages_chat ON conversation_messages (chat_id, id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_summaries ("
+            "chat_id INTEGER PRIMARY KEY, summary TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, chat_id: int) -> Tuple[Optional[str], List[StoredMessage]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM conversation_summaries WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+            messages = self._conn.execute(
+                "SELECT id, role, content FROM conversation_messages WHERE chat_id = ? ORDER BY id", (chat_id,)
+            ).fetchall()
+        return (row[0] if row else None), messages
+
+    def append(self, chat_id: int, messages: List[Tuple[str, str]], max_messages: int) -> int:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO conversation_messages (chat_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(chat_id, role, content, now) for role, content in messages],
+            )
+            # Ring buffer: keep only the newest max_messages rows of the chat
+            evicted = self._conn.execute(
+                "DELETE FROM conversation_messages WHERE chat_id = ? AND id NOT IN ("
+                "SELECT id FROM conversation_messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?)",
+                (chat_id, chat_id, max_messages),
+            ).rowcount
+            self._conn.commit()
+            return evicted
+
+    def fold(self, chat_id: int, summary: str, up_to_id: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversation_summaries (chat_id, summary, updated_at) VALUES (?, ?, ?)",
+                (chat_id, summary, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM conversation_messages WHERE chat_id = ? AND id <= ?", (chat_id, up_to_id)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ConversationMemory:
+    """
+    Bounded per-chat conversation history for the agent prompts.
+    Recent messages are kept in a ring buffer; once they exceed the token budget or fill half of the
+    buffer, the oldest ones are folded into a rolling LLM summary in the background. The context
+    handed to a prompt is the summary plus the newest messages that fit the budget, so its size is
+    bounded by history_token_budget + summary_max_tokens no matter how long the conversation runs.
+    Messages are folded well before the buffer is full, so they only fall out of the buffer unsummarized
+    when summaries keep failing or lag behind by max_messages / 2 messages; such losses are logged
+    and counted in messages_dropped.
+    """
+    def __init__(
+        self,
+        backend: str = settings.CONVERSATION_MEMORY_BACKEND,
+        sqlite_path: str = settings.CONVERSATION_MEMORY_SQLITE_PATH,
+        max_messages: int = settings.CONVERSATION_MAX_MESSAGES,
+        history_token_budget: int = settings.CONVERSATION_HISTORY_TOKEN_BUDGET,
+        summary_max_tokens: int = settings.CONVERSATION_SUMMARY_MAX_TOKENS,
+    ):
+        if backend == "sqlite":
+            self._backend = SQLiteConversationBackend(sqlite_path)
+        elif backend == "memory":
+            self._backend = InMemoryConversationBackend()
+        else:
+            raise ValueError(f"Unsupported conversation memory backend: {backend}. Choose 'memory' or 'sqlite'.")
+        self.max_messages = max_messages
+        self.history_token_budget = history_token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self._summarizing: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.summaries = 0
+        self.summary_failures = 0
+        self.messages_dropped = 0
+
+    def get_context(self, chat_id: int) -> List[BaseMessage]:
+        """
+        Returns the rolling summary (as a system message) followed by the newest messages within the token budget.
+        """
+        summary, messages = self._backend.load(chat_id)
+        selected: List[BaseMessage] = []
+        used = 0
+        for _, role, content in reversed(messages):
+            tokens = estimate_tokens(content)
+            if used + tokens > self.history_token_budget:
+                break
+            used += tokens
+            selected.append(HumanMessage(content) if role == "human" else AIMessage(content))
+        selected.reverse()
+        if summary:
+            selected.insert(0, SystemMessage(_truncate_to_tokens(SUMMARY_PREFIX + summary, self.summary_max_tokens)))
+        return selected
+
+    def _needs_summary(self, messages: List[StoredMessage]) -> bool:
+        return (
+            len(messages) > self.max_messages // 2
+            or sum(estimate_tokens(content) for _, _, content in messages) > self.history_token_budget
+        )
+
+    def record_turn(self, chat_id: int, user_message: str, assistant_message: str, llm: Any):
+        """
+        Appends a user/assistant exchange and, when the history outgrows the budget, starts summarizing it with llm.
+        """
+        # A single message may take at most half the budget, so recent context is never crowded out entirely
+        max_message_tokens = self.history_token_budget // 2
+        evicted = self._backend.append(
+            chat_id,
+            [
+                ("human", _truncate_to_tokens(user_message, max_message_tokens)),
+                ("ai", _truncate_to_tokens(assistant_message, max_message_tokens)),
+            ],
+            self.max_messages,
+        )
+        if evicted:
+            self.messages_dropped += evicted
+            logging.warning(f"Dropped {evicted} unsummarized messages of chat {chat_id}: summaries are failing or lagging.")
+
+        _, messages = self._backend.load(chat_id)
+        if not self._needs_summary(messages):
+            return
+        if chat_id in self._summarizing:
+            return
+        self._summarizing.add(chat_id)
+        task = asyncio.create_task(self._summarize(chat_id, llm))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, chat_id: int, llm: Any):
+        try:
+            summary, messages = self._backend.load(chat_id)
+            # Fold the oldest messages until what remains fits in half of the budget and a quarter of the buffer
+            remaining = sum(estimate_tokens(content) for _, _, content in messages)
+            folded: List[StoredMessage] = []
+            for message in messages:
+                if remaining <= self.history_token_budget // 2 and len(messages) - len(folded) <= self.max_messages // 4:
+                    break
+                folded.append(message)
+                remaining -= estimate_tokens(message[2])
+            if not folded:
+                return
+
+            transcript = "\n".join(
+                f"{'User' if role == 'human' else 'Assistant'}: {content}" for _, role, content in folded
+            )
+            chain = CONVERSATION_SUMMARY_PROMPT | llm
+            response = await chain.ainvoke({
+                "summary": summary or "(none)",
+                "transcript": transcript,
+                "max_words": self.summary_max_tokens * 3 // 4,
+            }, config={"callbacks": [TokenUsageCallbackHandler(settings.LLM_PROVIDER, "conversation_summary")]})
+            new_summary = _truncate_to_tokens(response.text.strip(), self.summary_max_tokens)
+            self._backend.fold(chat_id, new_summary, folded[-1][0])
+            self.summaries += 1
+        except Exception as e:
+            # The context stays bounded by get_context; summarization is retried on the next turn
+            self.summary_failures += 1
+            logging.error(f"Error summarizing conversation of chat {chat_id}: {e}", exc_info=True)
+        finally:
+            self._summarizing.discard(chat_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "messages_dropped": self.messages_dropped,
+            "summarizing": len(self._summarizing),
+        }
+
+    async def aclose(self):
+        """
+        Waits for pending summaries and closes the backend.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._backend.close()
+
+# Global conversation memory instance (None when conversation memory is disabled)
+conversation_memory: Optional[ConversationMemory] = ConversationMemory() if settings.CONVERSATION_MEMORY_ENABLED else None
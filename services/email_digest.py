@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from core.llm_provider import get_llm_model
+from models.gmail_models import EmailMessage
+from models.openai_models import DailySummary, EmailBatchAnalysis, EmailSummary
+from prompts.email_digest_prompt import EMAIL_DIGEST_PROMPT
+from services.conversation_memory import CHARS_PER_TOKEN, estimate_tokens
+from utils.metrics import TokenUsageCallbackHandler
+
+class EmailDigest:
+    """
+    Map-reduce email summarizer.
+    Map: emails are packed, in order, into batches of at most batch_token_budget (estimated) tokens
+    and max_batch_emails emails, and each batch is classified into EmailSummary entries by one
+    structured-output LLM call; at most `concurrency` calls run at a time.
+    A batch that fails (an error, or entries missing from the answer) is retried adaptively: the
+    emails left without an entry are retried on their own, and a batch that failed entirely is split
+    in half. An email that fails alone is retried once, then falls back to an 'Unknown' entry with its snippet.
+    Reduce: the entries are merged back into one DailySummary in the original email order.
+    """
+    def __init__(
+        self,
+        llm=None,
+        batch_token_budget: int = settings.EMAIL_DIGEST_BATCH_TOKEN_BUDGET,
+        max_batch_emails: int = settings.EMAIL_DIGEST_MAX_BATCH_EMAILS,
+        max_email_tokens: int = settings.EMAIL_DIGEST_MAX_EMAIL_TOKENS,
+        concurrency: int = settings.EMAIL_SUMMARY_CONCURRENCY,
+    ):
+        llm = llm or get_llm_model()
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_emails = max_batch_emails
+        self.max_email_tokens = max_email_tokens
+        self._chain = (EMAIL_DIGEST_PROMPT | llm.with_structured_output(EmailBatchAnalysis)).with_config(
+            callbacks=[TokenUsageCallbackHandler(settings.LLM_PROVIDER, "email_digest")]
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        self.emails = 0
+        self.llm_calls = 0
+        self.failed_calls = 0
+        self.splits = 0
+        self.fallbacks = 0
+
+    def _render(self, message: EmailMessage) -> str:
+        content = message.body or message.snippet
+        max_chars = self.max_email_tokens * CHARS_PER_TOKEN
+        if len(content) > max_chars:
+            content = content[:max_chars] + " [...]"
+        return f"From: {message.sender}\nSubject: {message.subject}\n{content}"
+
+    def pack_batches(self, rendered: List[str]) -> List[List[int]]:
+        """
+        Greedily groups the rendered emails (by index) into batches within the token and size limits.
+        """
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        batch_tokens = 0
+        for index, text in enumerate(rendered):
+            tokens = estimate_tokens(text)
+            if batch and (batch_tokens + tokens > self.batch_token_budget or len(batch) >= self.max_batch_emails):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def summarize(self, messages: List[EmailMessage]) -> List[EmailSummary]:
+        """
+        Returns one EmailSummary per message, in order.
+        """
+        rendered = [self._render(message) for message in messages]
+        results: List[Optional[EmailSummary]] = [None] * len(messages)
+        await asyncio.gather(*(
+            self._summarize_batch(messages, rendered, batch, results) for batch in self.pack_batches(rendered)
+        ))
+        self.emails += len(messages)
+        return results
+
+    async def _summarize_batch(
+        self,
+        messages: List[EmailMessage],
+        rendered: List[str],
+        indexes: List[int],
+        results: List[Optional[EmailSummary]],
+        retried: bool = False,
+    ):
+        analysis = None
+        async with self._semaphore:
+            self.llm_calls += 1
+            try:
+                analysis = await self._chain.ainvoke({
+                    "emails": "\n\n".join(f"[{position}] {rendered[index]}" for position, index in enumerate(indexes))
+                })
+            except Exception as e:
+                self.failed_calls += 1
+                logging.warning(f"Email digest batch of {len(indexes)} emails failed: {e}")
+
+        if analysis is not None:
+            for entry in analysis.entries:
+                if 0 <= entry.index < len(indexes) and results[indexes[entry.index]] is None:
+                    message = messages[indexes[entry.index]]
+                    results[indexes[entry.index]] = EmailSummary(
+                        classification=entry.classification,
+                        summary=entry.summary,
+                        is_construction_related=entry.is_construction_related,
+                        original_sender=message.sender,
+                        original_subject=message.subject,
+                    )
+
+        missing = [index for index in indexes if results[index] is None]
+        if not missing:
+            return
+        if len(indexes) == 1 and not retried:
+            await self._summarize_batch(messages, rendered, indexes, results, retried=True)
+            return
+        if len(indexes) == 1:
+            self.fallbacks += 1
+            message = messages[indexes[0]]
+            results[indexes[0]] = EmailSummary(
+                classification="Unknown",
+                summary=message.snippet,
+                is_construction_related=False,
+                original_sender=message.sender,
+                original_subject=message.subject,
+            )
+            return
+
+        # Every retry covers fewer emails than this batch, so the recursion ends at single emails
+        self.splits += 1
+        if len(missing) < len(indexes):
+            retries = [missing]
+        else:
+            half = len(indexes) // 2
+            retries = [indexes[:half], indexes[half:]]
+        await asyncio.gather(*(self._summarize_batch(messages, rendered, retry, results) for retry in retries))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "emails": self.emails,
+            "llm_calls": self.llm_calls,
+            "failed_calls": self.failed_calls,
+            "splits": self.splits,
+            "fallbacks": self.fallbacks,
+        }
+
+def reduce_digest(parts: List[List[EmailSummary]], report_date: Optional[str] = None) -> DailySummary:
+    """
+    Merges the per-batch summaries (in fetch order) into a DailySummary.
+    """
+    summaries = [summary for part in parts for summary in part]
+    return DailySummary(
+        summaries=summaries,
+        total_emails_processed=len(summaries),
+        report_date=report_date or date.today().isoformat(),
+    )
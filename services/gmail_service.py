@@ -1,48 +1,418 @@
+import asyncio
+import base64
+import html
+import logging
+import os.path
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
 from core.config import settings
+from models.gmail_models import EmailMessage
+from models.openai_models import DailySummary
+from services.email_digest import EmailDigest, reduce_digest
 from services.telegram_service import TelegramService
-# from services.openai_service import summarize_email
+from utils.email_preprocessing import ContentDeduplicator, clean_email_text
+
+SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+
+# Headers requested with format=metadata
+METADATA_HEADERS = ["From", "Subject", "Date"]
+
+# Per-request errors inside a batch that are worth retrying
+RETRYABLE_BATCH_STATUSES = (429, 500, 502, 503, 504)
+BATCH_RETRY_BASE_DELAY_SECONDS = 1.0
+
+class GmailNotAuthorizedError(RuntimeError):
+    """
+    Raised when there is no stored (or refreshable) Gmail token; run `python -m services.gmail_service` once to authorize.
+    """
+
+def _load_credentials() -> Optional[Credentials]:
+    """
+    Returns valid credentials from GMAIL_TOKEN_FILE, refreshing (and saving) them if they expired,
+    or None when there is no usable token (missing, malformed, or the refresh token was revoked).
+    """
+    if not os.path.exists(settings.GMAIL_TOKEN_FILE):
+        return None
+    try:
+        creds = Credentials.from_authorized_user_file(settings.GMAIL_TOKEN_FILE, SCOPES)
+    except ValueError as e:
+        logging.error(f"Unusable Gmail token file {settings.GMAIL_TOKEN_FILE}: {e}")
+        return None
+    if creds.valid:
+        return creds
+    if not (creds.expired and creds.refresh_token):
+        return None
+    try:
+        creds.refresh(Request())
+    except RefreshError as e:
+        logging.error(f"Could not refresh the Gmail token (revoked?): {e}")
+        return None
+    with open(settings.GMAIL_TOKEN_FILE, "w") as token:
+        token.write(creds.to_json())
+    return creds
+
+def get_gmail_service():
+    """
+    Returns a Gmail API (read-only) service object authorized with the token in GMAIL_TOKEN_FILE.
+    Never starts the interactive OAuth flow, which would block a headless server (and the scheduled
+    job) forever: without a stored token it raises GmailNotAuthorizedError.
+    """
+    creds = _load_credentials()
+    if creds is None:
+        raise GmailNotAuthorizedError(
+            f"No valid Gmail token in {settings.GMAIL_TOKEN_FILE}. "
+            "Run `python -m services.gmail_service` on a machine with a browser to authorize, then copy the token file."
+        )
+    return build("gmail", "v1", credentials=creds, static_discovery=True, cache_discovery=False)
+
+def authorize():
+    """
+    Runs the installed-app OAuth flow in the browser and stores the token in GMAIL_TOKEN_FILE.
+    """
+    flow = InstalledAppFlow.from_client_secrets_file(settings.GMAIL_CREDENTIALS_FILE, SCOPES)
+    creds = flow.run_local_server(port=0)
+    with open(settings.GMAIL_TOKEN_FILE, "w") as token:
+        token.write(creds.to_json())
+    print(f"Gmail token saved to {settings.GMAIL_TOKEN_FILE}")
+
+class GmailSyncState:
+    """
+    Remembers the Gmail historyId up to which the mailbox has been summarized.
+    """
+    def __init__(self, path: str = settings.GMAIL_SYNC_STATE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS gmail_sync_state (user_id TEXT PRIMARY KEY, history_id TEXT, synced_at REAL)"
+        )
+        self._conn.commit()
+
+    def get_history_id(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history_id FROM gmail_sync_state WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_history_id(self, user_id: str, history_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gmail_sync_state (user_id, history_id, synced_at) VALUES (?, ?, ?)",
+                (user_id, history_id, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _decode_body(data: str) -> str:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", errors="replace")
 
-async def get_gmail_service():
+def extract_body(payload: Dict[str, Any]) -> str:
     """
-    Authenticates with the Gmail API and returns a service object.
-    This will involve handling OAuth2 credentials.
+    Returns the cleaned text of a message payload (format=full), preferring text/plain parts over
+    text/html. Quoted history, signatures and boilerplate are removed (see utils.email_preprocessing).
     """
-    # Placeholder for Gmail authentication logic
-    print("Authenticating with Gmail...")
-    # In a real implementation, you would use google-auth-oauthlib
-    # to get credentials and build the service object.
-    return None # Placeholder
+    plain: List[str] = []
+    markup: List[str] = []
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get("parts"):
+            stack.extend(reversed(part["parts"]))
+            continue
+        data = part.get("body", {}).get("data")
+        if not data or part.get("filename"):
+            continue
+        mime_type = part.get("mimeType", "")
+        if mime_type == "text/plain":
+            plain.append(_decode_body(data))
+        elif mime_type == "text/html":
+            markup.append(_decode_body(data))
+    if plain:
+        return clean_email_text("\n".join(plain))
+    return clean_email_text("\n".join(markup), is_html=True)
 
-async def fetch_recent_emails(service):
+def _headers(message: Dict[str, Any]) -> Dict[str, str]:
+    return {header["name"].lower(): header["value"] for header in message.get("payload", {}).get("headers", [])}
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+class GmailSync:
+    """
+    Incremental reader of a Gmail inbox.
+    New messages are found with users.history.list from the last stored historyId instead of
+    re-scanning a time window; the first sync (or a resync after Gmail expired the historyId)
+    lists the last GMAIL_INITIAL_LOOKBACK_DAYS. Messages are fetched with batched users.messages.get
+    calls: metadata for all of them, then the full body only for messages whose snippet is not
+    enough (everything without a GMAIL_SNIPPET_ONLY_LABELS label). Bodies are cleaned before they
+    are summarized, and content repeated across the messages of a thread is only kept once.
+    Only the methods of the Gmail API client used here are needed, so a fake backend can stand in.
+    The methods are blocking; run them in a worker thread.
+    """
+    def __init__(
+        self,
+        service,
+        state: GmailSyncState,
+        user_id: str = "me",
+        batch_size: int = settings.GMAIL_BATCH_SIZE,
+        batch_retries: int = settings.GMAIL_BATCH_RETRIES,
+        snippet_only_labels: Iterable[str] = settings.GMAIL_SNIPPET_ONLY_LABELS,
+        max_body_chars: int = settings.GMAIL_MAX_BODY_CHARS,
+        initial_lookback_days: int = settings.GMAIL_INITIAL_LOOKBACK_DAYS,
+    ):
+        self.service = service
+        self.state = state
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.batch_retries = batch_retries
+        self.snippet_only_labels = frozenset(snippet_only_labels)
+        self.max_body_chars = max_body_chars
+        self.initial_lookback_days = initial_lookback_days
+        self.deduplicator = ContentDeduplicator()
+
+        self.list_pages = 0
+        self.batches = 0
+        self.metadata_fetches = 0
+        self.full_fetches = 0
+        self.batch_retried = 0
+        self.fetch_failures = 0
+
+    def list_new_message_ids(self) -> Tuple[List[str], Optional[str]]:
+        """
+        Returns the ids of inbox messages added since the stored historyId, oldest first, and the
+        historyId to store once they have been handled.
+        """
+        start_history_id = self.state.get_history_id(self.user_id)
+        if start_history_id:
+            try:
+                return self._list_history(start_history_id)
+            except HttpError as error:
+                if error.resp.status != 404:
+                    raise
+                logging.warning("Gmail historyId expired, resyncing the recent inbox.")
+        return self._list_recent()
+
+    def _list_history(self, start_history_id: str) -> Tuple[List[str], Optional[str]]:
+        message_ids: Dict[str, None] = {}
+        history_id = start_history_id
+        page_token = None
+        while True:
+            params: Dict[str, Any] = {
+                "userId": self.user_id,
+                "startHistoryId": start_history_id,
+                "historyTypes": ["messageAdded"],
+                "labelId": "INBOX",
+                "maxResults": 500,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.service.users().history().list(**params).execute()
+            self.list_pages += 1
+            for record in response.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    message_ids[added["message"]["id"]] = None
+            history_id = response.get("historyId", history_id)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        return list(message_ids), history_id
+
+    def _list_recent(self) -> Tuple[List[str], Optional[str]]:
+        # Read the historyId first: anything arriving while listing is picked up by the next sync
+        history_id = self.service.users().getProfile(userId=self.user_id).execute().get("historyId")
+        message_ids: List[str] = []
+        page_token = None
+        while True:
+            params: Dict[str, Any] = {
+                "userId": self.user_id,
+                "labelIds": ["INBOX"],
+                "q": f"newer_than:{self.initial_lookback_days}d",
+                "maxResults": 500,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.service.users().messages().list(**params).execute()
+            self.list_pages += 1
+            message_ids.extend(message["id"] for message in response.get("messages", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        # messages.list returns the newest first
+        message_ids.reverse()
+        return message_ids, history_id
+
+    def _batch_get(self, message_ids: List[str], **params: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        Runs users.messages.get for every id in batch requests, retrying rate-limited and failed
+        requests with backoff. Messages that still fail (or were deleted meanwhile) are left out.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(message_ids)
+        for attempt in range(self.batch_retries + 1):
+            retry: List[str] = []
+
+            def on_response(message_id: str, request_id: str, response: Optional[Dict[str, Any]], exception: Optional[Exception]):
+                if exception is None:
+                    results[message_id] = response
+                elif isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_BATCH_STATUSES:
+                    retry.append(message_id)
+                else:
+                    self.fetch_failures += 1
+                    logging.warning(f"Could not fetch Gmail message {message_id}: {exception}")
+
+            for chunk in _chunks(pending, self.batch_size):
+                batch = self.service.new_batch_http_request()
+                for message_id in chunk:
+                    request = self.service.users().messages().get(userId=self.user_id, id=message_id, **params)
+                    batch.add(request, callback=partial(on_response, message_id))
+                batch.execute()
+                self.batches += 1
+
+            if not retry:
+                break
+            if attempt == self.batch_retries:
+                self.fetch_failures += len(retry)
+                logging.error(f"Giving up on {len(retry)} Gmail messages after {attempt + 1} attempts.")
+                break
+            self.batch_retried += len(retry)
+            time.sleep(BATCH_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+            pending = retry
+        return results
+
+    def _needs_body(self, metadata: Dict[str, Any]) -> bool:
+        return not self.snippet_only_labels.intersection(metadata.get("labelIds", []))
+
+    def fetch_messages(self, message_ids: List[str]) -> List[EmailMessage]:
+        """
+        Fetches messages (metadata first, the full body only when needed), in the order of message_ids.
+        """
+        metadata = self._batch_get(message_ids, format="metadata", metadataHeaders=METADATA_HEADERS)
+        self.metadata_fetches += len(metadata)
+        full_ids = [message_id for message_id in message_ids if message_id in metadata and self._needs_body(metadata[message_id])]
+        full = self._batch_get(full_ids, format="full") if full_ids else {}
+        self.full_fetches += len(full)
+
+        messages = []
+        for message_id in message_ids:
+            message = metadata.get(message_id)
+            if message is None:
+                continue
+            headers = _headers(message)
+            body = None
+            if message_id in full:
+                body = self.deduplicator.dedupe(extract_body(full[message_id]["payload"]), message.get("threadId", ""))
+                # Empty for a message whose whole content was already seen: summarized from its snippet
+                body = body[:self.max_body_chars] or None
+            messages.append(EmailMessage(
+                id=message_id,
+                thread_id=message.get("threadId", ""),
+                sender=headers.get("from", ""),
+                subject=headers.get("subject", ""),
+                date=headers.get("date", ""),
+                snippet=html.unescape(message.get("snippet", "")),
+                label_ids=message.get("labelIds", []),
+                body=body,
+            ))
+        return messages
+
+    def commit(self, history_id: Optional[str]):
+        """
+        Stores the historyId returned by list_new_message_ids once its messages have been handled.
+        """
+        if history_id:
+            self.state.set_history_id(self.user_id, history_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "list_pages": self.list_pages,
+            "batches": self.batches,
+            "metadata_fetches": self.metadata_fetches,
+            "full_fetches": self.full_fetches,
+            "batch_retried": self.batch_retried,
+            "fetch_failures": self.fetch_failures,
+            **self.deduplicator.stats(),
+        }
+
+async def build_daily_summary(gmail_sync: GmailSync, digest: EmailDigest) -> Tuple[DailySummary, Optional[str]]:
     """
-    Fetches emails from the last 24 hours.
+    Summarizes the messages added since the last sync.
+    Message batches are fetched in a worker thread while the previously fetched ones are being
+    digested. Returns the summary and the historyId to commit once the summary has been delivered.
     """
-    # Placeholder for email fetching logic
-    print("Fetching recent emails...")
-    # This would use the Gmail API to search for messages
-    # within a specific time frame.
-    return [] # Placeholder
+    message_ids, history_id = await asyncio.to_thread(gmail_sync.list_new_message_ids)
+    tasks: List[asyncio.Task] = []
+    try:
+        for chunk in _chunks(message_ids, gmail_sync.batch_size):
+            messages = await asyncio.to_thread(gmail_sync.fetch_messages, chunk)
+            tasks.append(asyncio.create_task(digest.summarize(messages)))
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return reduce_digest(parts), history_id
+
+def format_daily_summary(daily_summary: DailySummary) -> str:
+    """
+    Renders a DailySummary as a Telegram message: urgent emails first, spam only counted.
+    """
+    if not daily_summary.summaries:
+        return f"Email summary for {daily_summary.report_date}: no new emails."
+    lines = [f"Email summary for {daily_summary.report_date} ({daily_summary.total_emails_processed} emails)"]
+    for classification, title in (("Urgent", "Urgent"), ("FYI", "For your information"), ("Unknown", "Unclassified")):
+        entries = [summary for summary in daily_summary.summaries if summary.classification == classification]
+        if not entries:
+            continue
+        lines.append(f"\n{title}:")
+        for summary in entries:
+            marker = " [construction]" if summary.is_construction_related else ""
+            lines.append(f"- {summary.original_subject} ({summary.original_sender}){marker}: {summary.summary}")
+    spam = sum(1 for summary in daily_summary.summaries if summary.classification == "Spam")
+    if spam:
+        lines.append(f"\n{spam} spam or promotional emails skipped.")
+    return "\n".join(lines)
 
 async def process_and_summarize_emails(telegram_service: TelegramService):
     """
     Orchestrates the process of fetching, summarizing, and sending reports.
-    This is the main function called by the scheduler.
-    """
-    print("Starting daily email summary process...")
-    # gmail_service = await get_gmail_service()
-    # if not gmail_service:
-    #     print("Failed to authenticate with Gmail. Aborting.")
-    #     return
-
-    # emails = await fetch_recent_emails(gmail_service)
-    # summaries = []
-    # for email in emails:
-    #     summary = await summarize_email(email.body)
-    #     summaries.append(summary)
-    
-    # report = {"summaries": summaries} # Simplified
-    if settings.telegram_chat_id:
-        # await telegram_service.send_message(chat_id=settings.telegram_chat_id, text=str(report))
-        print(f"Email summary process would run here and send a message to {settings.telegram_chat_id}.")
-    else:
-        print("Email summary process would run here, but no chat_id is configured.")
+    This is the main function called by the scheduler. The historyId is only advanced once the
+    report has been sent, so a failed run is repeated in full by the next one.
+    """
+    if not settings.telegram_chat_id:
+        logging.warning("No telegram_chat_id configured; skipping the email summary.")
+        return
+
+    started_at = time.perf_counter()
+    service = await asyncio.to_thread(get_gmail_service)
+    sync_state = GmailSyncState()
+    try:
+        gmail_sync = GmailSync(service, sync_state)
+        digest = EmailDigest()
+        daily_summary, history_id = await build_daily_summary(gmail_sync, digest)
+        await telegram_service.send_message(int(settings.telegram_chat_id), format_daily_summary(daily_summary))
+        gmail_sync.commit(history_id)
+        logging.info(
+            f"Email summary sent: {daily_summary.total_emails_processed} emails in "
+            f"{time.perf_counter() - started_at:.1f}s (gmail: {gmail_sync.stats()}, digest: {digest.stats()})."
+        )
+    finally:
+        sync_state.close()
+
+if __name__ == "__main__":
+    authorize()
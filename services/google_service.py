@@ -1,10 +1,24 @@
 from google.cloud import speech
 from google.oauth2 import service_account
 import json
+from functools import lru_cache
 import logging
+from typing import AsyncIterator, Iterable
 from core.config import settings
 
+# Maximum audio bytes per StreamingRecognizeRequest
+STREAMING_CHUNK_BYTES = 16 * 1024
+# Long-running recognition accepts at most 10 MB of inline audio
+LONG_RUNNING_MAX_CONTENT_BYTES = 10 * 1024 * 1024
+LONG_RUNNING_TIMEOUT_SECONDS = 600
+
 class GoogleService:
+    # Identifies the recognition setup in cache keys; change it when the RecognitionConfig changes
+    TRANSCRIPTION_MODEL = "default-ogg_opus-en-US"
+
+    # One SpeechAsyncClient (and its gRPC channel) is shared by every GoogleService instance
+    _client: speech.SpeechAsyncClient | None = None
+
     def __init__(self):
         self.credentials = None
         if settings.GOOGLE_SERVICE_ACCOUNT_CREDENTIALS_JSON:
@@ -18,28 +32,91 @@ class GoogleService:
                 logging.error(f"Error loading Google service account credentials: {e}")
                 raise
 
+    def _get_client(self) -> speech.SpeechAsyncClient:
+        if GoogleService._client is None:
+            if self.credentials:
+                GoogleService._client = speech.SpeechAsyncClient(credentials=self.credentials)
+            else:
+                GoogleService._client = speech.SpeechAsyncClient()
+        return GoogleService._client
+
+    @staticmethod
+    def _recognition_config() -> speech.RecognitionConfig:
+        return speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+            sample_rate_hertz=48000,
+            language_code="en-US",
+        )
+
+    @staticmethod
+    def _join_results(results: Iterable) -> str:
+        """
+        Concatenates the top alternative of every result segment.
+        """
+        return " ".join(
+            result.alternatives[0].transcript.strip()
+            for result in results
+            if result.alternatives
+        ).strip()
+
     async def transcribe_audio(self, audio_content: bytes) -> str:
         """
         Transcribes the given audio content using Google Cloud Speech-to-Text.
+        Suited to short audio (synchronous recognition is limited to about one minute).
         """
         logging.info("Start google transcription...")
 
-        if self.credentials:
-            client = speech.SpeechAsyncClient(credentials=self.credentials)
-        else:
-            client = speech.SpeechAsyncClient()
+        client = self._get_client()
+        audio = speech.RecognitionAudio(content=audio_content)
+        response = await client.recognize(config=self._recognition_config(), audio=audio)
+        logging.info(f"Transcribed text: {response}")
+
+        return self._join_results(response.results)
+
+    async def transcribe_long_audio(self, audio_content: bytes) -> str:
+        """
+        Transcribes audio with long-running (asynchronous) recognition, for notes too long for a
+        streaming session. Raises ValueError above the inline content limit.
+        """
+        if len(audio_content) > LONG_RUNNING_MAX_CONTENT_BYTES:
+            raise ValueError(f"{len(audio_content)} bytes of audio exceed the long-running recognition limit.")
+        logging.info("Start google long-running transcription...")
 
+        client = self._get_client()
         audio = speech.RecognitionAudio(content=audio_content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
-            sample_rate_hertz=48000,
-            language_code="en-US",
-        )
+        operation = await client.long_running_recognize(config=self._recognition_config(), audio=audio)
+        response = await operation.result(timeout=LONG_RUNNING_TIMEOUT_SECONDS)
 
-        response = await client.recognize(config=config, audio=audio)
-        logging.info(f"Transcribed text: {response}")
+        return self._join_results(response.results)
+
+    async def transcribe_audio_stream(self, audio_chunks: AsyncIterator[bytes]) -> str:
+        """
+        Transcribes audio with streaming recognition while it is still being downloaded.
+        audio_chunks can be any async iterator of raw audio bytes; only final results are kept.
+        A streaming session is limited to about five minutes of audio (GOOGLE_STREAMING_MAX_SECONDS).
+        """
+        logging.info("Start google streaming transcription...")
+        client = self._get_client()
+        streaming_config = speech.StreamingRecognitionConfig(config=self._recognition_config())
+
+        async def requests():
+            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+            async for chunk in audio_chunks:
+                for offset in range(0, len(chunk), STREAMING_CHUNK_BYTES):
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk[offset:offset + STREAMING_CHUNK_BYTES])
+
+        final_results = []
+        responses = await client.streaming_recognize(requests=requests())
+        async for response in responses:
+            final_results.extend(result for result in response.results if result.is_final)
 
-        if not response.results:
-            return ""
+        transcript = self._join_results(final_results)
+        logging.info(f"Transcribed {len(final_results)} segments with streaming recognition.")
+        return transcript
 
-        return response.results[0].alternatives[0].transcript
+@lru_cache(maxsize=1)
+def get_shared_google_service() -> GoogleService:
+    """
+    Returns the process-wide GoogleService, so the service account credentials are parsed once.
+    """
+    return GoogleService()
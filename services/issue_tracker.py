@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from core.config import settings
+from models.issue_models import TrackedIssue
+from models.openai_models import ConstructionIssue
+from services.telegram_service import create_telegram_service
+
+_WORD_PATTERN = re.compile(r"\w+")
+_SITE_SEPARATOR_PATTERN = re.compile(r",|;|\s[-–]\s")
+_STOPWORDS = frozenset(
+    "the and for with from that this there are was were has have not but its into onto near at on in of to a an is "
+    "il lo la le gli di da del della dei delle con per che non una uno sul sulla nel nella".split()
+)
+# Open issues of a site compared with each new report; bounds the dedup cost for very busy sites
+DEDUP_MAX_CANDIDATES = 1000
+# The first briefing covers this far back
+BRIEFING_INITIAL_LOOKBACK_SECONDS = 24 * 3600
+
+_ISSUE_COLUMNS = (
+    "id, site, location, urgency, status, description, reported_by, action_required, "
+    "report_count, reported_at, last_reported_at"
+)
+_ISSUE_FIELDS = [column.strip() for column in _ISSUE_COLUMNS.split(",")]
+
+def site_of(location: str) -> str:
+    """
+    The site part of a location: its first component ("Site A, Building 3" -> "Site A").
+    """
+    site = _SITE_SEPARATOR_PATTERN.split(location, maxsplit=1)[0]
+    return " ".join(site.split()) or "Unknown site"
+
+def issue_terms(issue: ConstructionIssue) -> FrozenSet[str]:
+    """
+    Normalized content words of a report, used to recognize near-identical reports.
+    """
+    words = _WORD_PATTERN.findall(f"{issue.description} {issue.location}".lower())
+    return frozenset(word for word in words if word not in _STOPWORDS and (len(word) > 2 or word.isdigit()))
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def _to_issue(row: Tuple) -> TrackedIssue:
+    return TrackedIssue(**dict(zip(_ISSUE_FIELDS, row)))
+
+class IssueTracker:
+    """
+    Stores reported construction issues in SQLite, indexed by site and status (for deduplication)
+    and by status, urgency and report time (for the briefing).
+    A report that closely matches an open issue of the same site, reported within the dedup window,
+    is merged into it instead of creating a new issue. Urgent issues are sent to the notification
+    chats as soon as they are reported (once per issue); routine ones wait for the daily briefing,
+    which is built from a single query over the issues reported since the previous briefing.
+    """
+    def __init__(
+        self,
+        path: str = settings.ISSUE_TRACKER_PATH,
+        dedup_window_hours: float = settings.ISSUE_DEDUP_WINDOW_HOURS,
+        dedup_similarity: float = settings.ISSUE_DEDUP_SIMILARITY,
+    ):
+        self.dedup_window_seconds = dedup_window_hours * 3600
+        self.dedup_similarity = dedup_similarity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS issues (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                site TEXT NOT NULL COLLATE NOCASE,
+                location TEXT NOT NULL,
+                urgency TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'open',
+                description TEXT NOT NULL,
+                reported_by TEXT NOT NULL,
+                action_required TEXT NOT NULL,
+                terms TEXT NOT NULL,
+                report_count INTEGER NOT NULL DEFAULT 1,
+                reported_at REAL NOT NULL,
+                last_reported_at REAL NOT NULL,
+                notified_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS issues_site ON issues (site, status, last_reported_at);
+            CREATE INDEX IF NOT EXISTS issues_briefing ON issues (status, urgency, last_reported_at);
+            CREATE TABLE IF NOT EXISTS briefing_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                briefed_until REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+        self.reports = 0
+        self.duplicates = 0
+        self.escalations = 0
+        self.alerts_sent = 0
+        self.alert_failures = 0
+        self.briefings = 0
+
+    # --- Storage (blocking) ---
+
+    def record(self, issue: ConstructionIssue) -> Tuple[TrackedIssue, bool]:
+        """
+        Stores a report, merging it into a matching open issue of the same site if there is one.
+        Returns the stored issue and whether it still needs an urgent alert.
+        """
+        now = time.time()
+        site = site_of(issue.location)
+        terms = issue_terms(issue)
+        with self._lock:
+            candidates = self._conn.execute(
+                "SELECT id, terms FROM issues WHERE site = ? AND status = 'open' AND last_reported_at >= ? "
+                "ORDER BY last_reported_at DESC LIMIT ?",
+                (site, now - self.dedup_window_seconds, DEDUP_MAX_CANDIDATES),
+            ).fetchall()
+            best_id, best_similarity = None, 0.0
+            for candidate_id, candidate_terms in candidates:
+                similarity = _similarity(terms, frozenset(candidate_terms.split()))
+                if similarity > best_similarity:
+                    best_id, best_similarity = candidate_id, similarity
+
+            if best_id is not None and best_similarity >= self.dedup_similarity:
+                self.duplicates += 1
+                if issue.urgency == "urgent":
+                    escalated = self._conn.execute(
+                        "UPDATE issues SET urgency = 'urgent' WHERE id = ? AND urgency != 'urgent'", (best_id,)
+                    ).rowcount
+                    self.escalations += escalated
+                self._conn.execute(
+                    "UPDATE issues SET report_count = report_count + 1, last_reported_at = ? WHERE id = ?",
+                    (now, best_id),
+                )
+                issue_id = best_id
+            else:
+                issue_id = self._conn.execute(
+                    "INSERT INTO issues (site, location, urgency, description, reported_by, action_required, "
+                    "terms, reported_at, last_reported_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (site, issue.location, issue.urgency, issue.description, issue.reported_by,
+                     issue.action_required, " ".join(sorted(terms)), now, now),
+                ).lastrowid
+            # Claim the alert in the same transaction, so concurrent reports of one issue alert only once
+            needs_alert = self._conn.execute(
+                "UPDATE issues SET notified_at = ? WHERE id = ? AND urgency = 'urgent' AND notified_at IS NULL",
+                (now, issue_id),
+            ).rowcount == 1
+            self._conn.commit()
+            self.reports += 1
+            row = self._conn.execute(f"SELECT {_ISSUE_COLUMNS} FROM issues WHERE id = ?", (issue_id,)).fetchone()
+        return _to_issue(row), needs_alert
+
+    def clear_notified(self, issue_id: int):
+        """
+        Gives an alert claimed by record() back after it could not be sent, so the next report retries it.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE issues SET notified_at = NULL WHERE id = ?", (issue_id,))
+            self._conn.commit()
+
+    def get(self, issue_id: int) -> Optional[TrackedIssue]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_ISSUE_COLUMNS} FROM issues WHERE id = ?", (issue_id,)).fetchone()
+        return _to_issue(row) if row else None
+
+    def set_status(self, issue_id: int, status: str) -> bool:
+        """
+        Changes an issue's status ('open' or 'resolved'). Returns whether the issue exists.
+        """
+        with self._lock:
+            updated = self._conn.execute("UPDATE issues SET status = ? WHERE id = ?", (status, issue_id)).rowcount
+            self._conn.commit()
+        return updated == 1
+
+    def open_issues(self, site: str) -> List[TrackedIssue]:
+        """
+        Returns the open issues of a site, most recently reported first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_ISSUE_COLUMNS} FROM issues WHERE site = ? AND status = 'open' ORDER BY last_reported_at DESC",
+                (site_of(site),),
+            ).fetchall()
+        return [_to_issue(row) for row in rows]
+
+    def briefing_window(self) -> Tuple[float, float]:
+        """
+        The period the next briefing covers: from the end of the previous briefing until now.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT briefed_until FROM briefing_state WHERE id = 1").fetchone()
+        return (row[0] if row else now - BRIEFING_INITIAL_LOOKBACK_SECONDS), now
+
+    def briefing_rows(self, since: float, until: float, max_per_site: int) -> List[Tuple[TrackedIssue, int]]:
+        """
+        Returns the open routine issues reported in [since, until), grouped by site (busiest sites
+        first, most reported issues first), at most max_per_site per site, each with its site's total.
+        A single query: the issues_briefing index selects the rows and window functions rank and count them.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_ISSUE_COLUMNS}, site_total FROM ("
+                f"  SELECT {_ISSUE_COLUMNS},"
+                "   ROW_NUMBER() OVER (PARTITION BY site ORDER BY report_count DESC, last_reported_at DESC) AS site_rank,"
+                "   COUNT(*) OVER (PARTITION BY site) AS site_total"
+                "  FROM issues WHERE status = 'open' AND urgency = 'routine' AND last_reported_at >= ? AND last_reported_at < ?"
+                ") WHERE site_rank <= ? ORDER BY site_total DESC, site, site_rank",
+                (since, until, max_per_site),
+            ).fetchall()
+        return [(_to_issue(row[:-1]), row[-1]) for row in rows]
+
+    def mark_briefed(self, until: float):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO briefing_state (id, briefed_until) VALUES (1, ?)", (until,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Reporting and notifications ---
+
+    def notify_chat_ids(self) -> List[int]:
+        if settings.ISSUE_NOTIFY_CHAT_IDS:
+            return list(settings.ISSUE_NOTIFY_CHAT_IDS)
+        return [int(settings.telegram_chat_id)] if settings.telegram_chat_id else []
+
+    async def _broadcast(self, text: str) -> int:
+        """
+        Sends text to all notification chats concurrently. Returns the number of chats reached.
+        """
+        chat_ids = self.notify_chat_ids()
+        if not chat_ids:
+            logging.warning("No ISSUE_NOTIFY_CHAT_IDS or telegram_chat_id configured; issue notification not sent.")
+            return 0
+        telegram_service = create_telegram_service()
+        results = await asyncio.gather(
+            *(telegram_service.send_message(chat_id, text) for chat_id in chat_ids), return_exceptions=True
+        )
+        for chat_id, result in zip(chat_ids, results):
+            if isinstance(result, Exception):
+                logging.error(f"Could not send issue notification to chat {chat_id}: {result}")
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    async def report(self, issue: ConstructionIssue) -> Dict[str, Any]:
+        """
+        Records a report and, for an urgent issue not alerted yet, alerts the notification chats.
+        """
+        tracked, needs_alert = await asyncio.to_thread(self.record, issue)
+        duplicate = tracked.report_count > 1
+        result = {"issue_id": tracked.id, "site": tracked.site, "duplicate": duplicate, "notified_chats": 0}
+        if needs_alert:
+            notified = await self._broadcast(format_urgent_alert(tracked))
+            if notified:
+                self.alerts_sent += 1
+            else:
+                self.alert_failures += 1
+                await asyncio.to_thread(self.clear_notified, tracked.id)
+            result["notified_chats"] = notified
+        return result
+
+    async def send_daily_briefing(self) -> int:
+        """
+        Sends the briefing of the routine issues reported since the previous one. The window only
+        advances once the briefing reached a chat, so a failed briefing is included in the next one.
+        Returns the number of issues listed.
+        """
+        since, until = await asyncio.to_thread(self.briefing_window)
+        rows = await asyncio.to_thread(self.briefing_rows, since, until, settings.ISSUE_BRIEFING_MAX_PER_SITE)
+        if await self._broadcast(format_briefing(rows, until)):
+            await asyncio.to_thread(self.mark_briefed, until)
+            self.briefings += 1
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reports": self.reports,
+            "duplicates": self.duplicates,
+            "escalations": self.escalations,
+            "alerts_sent": self.alerts_sent,
+            "alert_failures": self.alert_failures,
+            "briefings": self.briefings,
+        }
+
+def format_urgent_alert(issue: TrackedIssue) -> str:
+    lines = [
+        f"URGENT construction issue #{issue.id} at {issue.location}",
+        issue.description,
+        f"Action required: {issue.action_required}",
+        f"Reported by: {issue.reported_by}",
+    ]
+    if issue.report_count > 1:
+        lines.append(f"Reported {issue.report_count} times.")
+    return "\n".join(lines)
+
+def format_briefing(rows: List[Tuple[TrackedIssue, int]], until: float) -> str:
+    """
+    Renders the briefing rows as a Telegram message, one section per site.
+    """
+    report_date = datetime.fromtimestamp(until, tz=ZoneInfo(settings.CALENDAR_TIMEZONE)).date().isoformat()
+    if not rows:
+        return f"Construction issue briefing for {report_date}: no new routine issues."
+    sections = []
+    total = 0
+    for _, site_rows in groupby(rows, key=lambda row: row[0].site.casefold()):
+        site_rows = list(site_rows)
+        site_total = site_rows[0][1]
+        total += site_total
+        lines = [f"{site_rows[0][0].site} ({site_total}):"]
+        for issue, _ in site_rows:
+            repeated = f" [reported {issue.report_count} times]" if issue.report_count > 1 else ""
+            lines.append(f"- #{issue.id} {issue.location}: {issue.description} (action: {issue.action_required}){repeated}")
+        if site_total > len(site_rows):
+            lines.append(f"- ... and {site_total - len(site_rows)} more")
+        sections.append("\n".join(lines))
+    return f"Construction issue briefing for {report_date} ({total} routine issues)\n\n" + "\n\n".join(sections)
+
+@lru_cache(maxsize=1)
+def get_issue_tracker() -> IssueTracker:
+    """
+    Returns the process-wide issue tracker, opening its database on first use.
+    """
+    return IssueTracker()
+
+def close_issue_tracker():
+    """
+    Closes the process-wide issue tracker if it was opened.
+    """
+    if get_issue_tracker.cache_info().currsize:
+        get_issue_tracker().close()
+        get_issue_tracker.cache_clear()
@@ -0,0 +1,233 @@
+import asyncio
+import itertools
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Generic, Hashable, List, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class KeyStats:
+    """
+    Queue counters of a single key.
+    """
+    def __init__(self):
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "max_depth": self.max_depth,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.processed, 6) if self.processed else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+        }
+
+class KeyedScheduler(Generic[T]):
+    """
+    Bounded async queue that hands out at most one item per key at a time.
+    Items with the same key are processed strictly in arrival order, while different keys are served
+    concurrently. Keys with pending work take turns round-robin: after a key's item is done, the key
+    goes to the back of the line, so one busy key cannot starve the others.
+    The API mirrors asyncio.Queue, except that get() returns (key, item) and task_done() takes the key.
+    """
+    def __init__(self, maxsize: int = 0, tracked_keys: int = 1000):
+        self.maxsize = maxsize
+        self.tracked_keys = tracked_keys
+        self._pending: Dict[Hashable, Deque[Tuple[int, float, T]]] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._active: Set[Hashable] = set()
+        self._size = 0
+        self._unfinished = 0
+        self._sequence = itertools.count()
+        self._getters: Deque[asyncio.Future] = deque()
+        self._putters: Deque[asyncio.Future] = deque()
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._key_stats: "OrderedDict[Hashable, KeyStats]" = OrderedDict()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    def key_depth(self, key: Hashable) -> int:
+        return len(self._pending.get(key, ()))
+
+    def _stats_for(self, key: Hashable) -> KeyStats:
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = KeyStats()
+            while len(self._key_stats) > self.tracked_keys:
+                self._key_stats.popitem(last=False)
+        self._key_stats.move_to_end(key)
+        return stats
+
+    @staticmethod
+    def _wakeup_next(waiters: Deque[asyncio.Future]):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    @staticmethod
+    async def _wait(waiters: Deque[asyncio.Future]):
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            waiter.cancel()
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass
+            raise
+
+    def put_nowait(self, key: Hashable, item: T):
+        """
+        Adds an item for key. Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        if self.full():
+            raise asyncio.QueueFull
+        queue = self._pending.setdefault(key, deque())
+        queue.append((next(self._sequence), asyncio.get_running_loop().time(), item))
+        if len(queue) == 1 and key not in self._active:
+            self._ready.append(key)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+
+        stats = self._stats_for(key)
+        stats.enqueued += 1
+        stats.max_depth = max(stats.max_depth, len(queue))
+        self._wakeup_next(self._getters)
+
+    async def put(self, key: Hashable, item: T):
+        """
+        Adds an item for key, waiting for space while the queue is full.
+        """
+        while self.full():
+            try:
+                await self._wait(self._putters)
+            except BaseException:
+                if not self.full():
+                    self._wakeup_next(self._putters)
+                raise
+        self.put_nowait(key, item)
+
+    async def get(self) -> Tuple[Hashable, T]:
+        """
+        Waits for the next key whose turn it is and returns its oldest item.
+        The key stays reserved until task_done(key) is called.
+        """
+        while not self._ready:
+            try:
+                await self._wait(self._getters)
+            except BaseException:
+                if self._ready:
+                    self._wakeup_next(self._getters)
+                raise
+        key = self._ready.popleft()
+        _, enqueued_at, item = self._pending[key].popleft()
+        if not self._pending[key]:
+            del self._pending[key]
+        self._active.add(key)
+        self._size -= 1
+
+        wait = asyncio.get_running_loop().time() - enqueued_at
+        stats = self._stats_for(key)
+        stats.total_wait_seconds += wait
+        stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+        self._wakeup_next(self._putters)
+        return key, item
+
+    def task_done(self, key: Hashable):
+        """
+        Releases key after its item was processed; its next item (if any) queues up behind the other keys.
+        """
+        self._active.discard(key)
+        self._unfinished -= 1
+        self._stats_for(key).processed += 1
+        if key in self._pending:
+            self._ready.append(key)
+            self._wakeup_next(self._getters)
+        if self._unfinished == 0:
+            self._finished.set()
+
+    def pop_oldest_nowait(self) -> Tuple[Hashable, T]:
+        """
+        Removes and returns the oldest waiting item across all keys. Raises asyncio.QueueEmpty if there is none.
+        """
+        if not self._pending:
+            raise asyncio.QueueEmpty
+        key = min(self._pending, key=lambda k: self._pending[k][0][0])
+        _, _, item = self._pending[key].popleft()
+        if not self._pending[key]:
+            del self._pending[key]
+            if key in self._ready:
+                self._ready.remove(key)
+        self._size -= 1
+        self._unfinished -= 1
+        self._stats_for(key).dropped += 1
+        if self._unfinished == 0:
+            self._finished.set()
+        self._wakeup_next(self._putters)
+        return key, item
+
+    async def join(self):
+        """
+        Waits until every item has been processed.
+        """
+        await self._finished.wait()
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Overall counts plus per-key statistics of the keys with the most queued work.
+        """
+        busiest: List[Hashable] = sorted(self._pending, key=lambda k: len(self._pending[k]), reverse=True)[:top]
+        return {
+            "keys_waiting": len(self._pending),
+            "keys_active": len(self._active),
+            "keys_tracked": len(self._key_stats),
+            "busiest_keys": {str(key): {**self._key_stats[key].snapshot(), "depth": len(self._pending[key])}
+                             for key in busiest if key in self._key_stats},
+        }
+
+    def key_stats(self, key: Hashable) -> Dict[str, Any]:
+        stats = self._key_stats.get(key)
+        return {**(stats.snapshot() if stats else KeyStats().snapshot()), "depth": self.key_depth(key)}
+
+class KeyedLock:
+    """
+    One FIFO asyncio.Lock per key, created on demand and discarded once nobody holds or waits for it.
+    Serializes work per key for callers that run inline instead of through a KeyedScheduler.
+    """
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    def __len__(self) -> int:
+        return len(self._locks)
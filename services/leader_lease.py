@@ -0,0 +1,112 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Column, Float, MetaData, String, Table, create_engine, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+_metadata = MetaData()
+
+leases = Table(
+    "scheduler_leases",
+    _metadata,
+    Column("name", String(128), primary_key=True),
+    Column("holder", String(256), nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+class LeaderLease:
+    """
+    Named lease in a SQL database (through SQLAlchemy, so SQLite for several workers on one host or
+    a shared server database for several replicas). At most one holder owns an unexpired lease; the
+    holder keeps it by renewing well within ttl_seconds, and anyone may take it over once it expires.
+    Acquisition and renewal are a single conditional UPDATE (or an INSERT for a new lease), which
+    the database makes atomic. The methods are blocking.
+    """
+    def __init__(self, url: str, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._engine = create_engine(url)
+        _metadata.create_all(self._engine)
+        # Local view of the lease; it is trusted only until the expiry written by our last renewal
+        self._expires_at = 0.0
+
+        self.acquisitions = 0
+        self.renewals = 0
+        self.losses = 0
+
+    @property
+    def held(self) -> bool:
+        return time.time() < self._expires_at
+
+    def try_acquire(self) -> bool:
+        """
+        Acquires or renews the lease. Returns whether this process holds it afterwards.
+        """
+        was_held = self.held
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        try:
+            with self._engine.begin() as conn:
+                result = conn.execute(
+                    update(leases)
+                    .where(leases.c.name == self.name)
+                    .where((leases.c.holder == self.holder) | (leases.c.expires_at < now))
+                    .values(holder=self.holder, expires_at=expires_at)
+                )
+                acquired = result.rowcount == 1
+                if not acquired and conn.execute(select(leases.c.name).where(leases.c.name == self.name)).first() is None:
+                    conn.execute(insert(leases).values(name=self.name, holder=self.holder, expires_at=expires_at))
+                    acquired = True
+        except IntegrityError:
+            # Another process created the lease at the same moment
+            acquired = False
+        except OperationalError as e:
+            # e.g. SQLite busy: keep the current state and try again on the next renewal
+            logging.warning(f"Could not renew the '{self.name}' lease: {e}")
+            return self.held
+
+        if acquired:
+            self._expires_at = expires_at
+            if was_held:
+                self.renewals += 1
+            else:
+                self.acquisitions += 1
+                logging.info(f"Acquired the '{self.name}' lease as {self.holder}.")
+        else:
+            if was_held:
+                self.losses += 1
+                logging.warning(f"Lost the '{self.name}' lease.")
+            self._expires_at = 0.0
+        return acquired
+
+    def release(self):
+        """
+        Gives the lease up so another process can take over without waiting for it to expire.
+        """
+        with self._engine.begin() as conn:
+            conn.execute(delete(leases).where(leases.c.name == self.name).where(leases.c.holder == self.holder))
+        self._expires_at = 0.0
+
+    def current_holder(self) -> Optional[str]:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(leases.c.holder).where(leases.c.name == self.name).where(leases.c.expires_at >= time.time())
+            ).first()
+        return row[0] if row else None
+
+    def close(self):
+        self._engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "holder": self.holder,
+            "held": self.held,
+            "acquisitions": self.acquisitions,
+            "renewals": self.renewals,
+            "losses": self.losses,
+        }
@@ -1,37 +1,40 @@
 from core.config import settings
-from models.openai_models import Transcription, EmailSummary, EmailDraft
+from models.openai_models import Transcription, EmailAnalysis, EmailSummary, EmailDraft
+from prompts.email_summary_prompt import EMAIL_SUMMARY_PROMPT
+from langchain_core.messages import convert_to_openai_messages
+from functools import lru_cache
+from typing import BinaryIO
 import openai
 
 class OpenAIService:
     def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
+        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
-    async def transcribe_audio(self, audio_file_path: str) -> Transcription:
+    async def transcribe_audio(self, audio_file: BinaryIO, filename: str = "voice.ogg") -> Transcription:
         """
-        Transcribes an audio file using the Whisper API.
+        Transcribes an audio stream using the Whisper API.
+        The file object is streamed straight into the upload; filename tells the API the audio format.
         """
-        print(f"Transcribing audio file: {audio_file_path}")
-        with open(audio_file_path, "rb") as audio_file:
-            transcript = await openai.Audio.transcribe(
-                model=settings.OPENAI_MODEL_TRANSCRIPTION,
-                file=audio_file
-            )
+        print(f"Transcribing audio file: {filename}")
+        transcript = await self.client.audio.transcriptions.create(
+            model=settings.OPENAI_MODEL_TRANSCRIPTION,
+            file=(filename, audio_file),
+        )
         return Transcription(text=transcript.text)
 
-    async def summarize_email_content(self, content: str) -> EmailSummary:
+    async def summarize_email_content(self, content: str, sender: str = "", subject: str = "") -> EmailSummary:
         """
-        Summarizes and classifies email content using GPT-4o.
+        Summarizes and classifies email content with structured output.
+        The Gmail pipeline uses the provider-agnostic summarizer in services.gmail_service; this is the OpenAI-only equivalent.
         """
-        print("Summarizing email content...")
-        # Placeholder for summarization logic
-        # This would involve a detailed prompt to classify and summarize.
-        return EmailSummary(
-            classification="FYI",
-            summary="This is a placeholder summary.",
-            is_construction_related=False,
-            original_sender="sender@example.com",
-            original_subject="Placeholder Subject"
+        messages = EMAIL_SUMMARY_PROMPT.format_messages(sender=sender, subject=subject, content=content)
+        completion = await self.client.chat.completions.parse(
+            model="gpt-4o-mini",
+            messages=convert_to_openai_messages(messages),
+            response_format=EmailAnalysis,
         )
+        analysis = completion.choices[0].message.parsed
+        return EmailSummary(**analysis.model_dump(), original_sender=sender, original_subject=subject)
 
     async def draft_email_from_text(self, text: str) -> EmailDraft:
         """
@@ -45,3 +48,10 @@ class OpenAIService:
             body="This is a placeholder email body based on the transcription.",
             recipient="recipient@example.com"
         )
+
+@lru_cache(maxsize=1)
+def get_shared_openai_service() -> OpenAIService:
+    """
+    Returns the process-wide OpenAIService; its AsyncOpenAI client (and connection pool) is built once.
+    """
+    return OpenAIService()
@@ -1,42 +1,195 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED, JobExecutionEvent
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING, STATE_STOPPED
+from apscheduler.triggers.cron import CronTrigger
+
+from core.config import settings
 from services.gmail_service import process_and_summarize_emails
-from services.telegram_service import TelegramService
-from api.v1.dependencies import get_telegram_service
-from fastapi import Depends
-
-# Global scheduler instance
-scheduler = AsyncIOScheduler()
-
-def schedule_daily_summary(telegram_service: TelegramService = Depends(get_telegram_service)):
-    """
-    Schedules the daily email summary job to run at a specific interval.
-    For this POC, we'll run it every hour.
-    """
-    # In a real application, you might want to run this once a day.
-    # For demonstration, we run it more frequently.
-    scheduler.add_job(
-        process_and_summarize_emails,
-        'interval',
-        hours=1,
-        id="daily_email_summary",
-        replace_existing=True,
-        args=[telegram_service]
+from services.issue_tracker import get_issue_tracker
+from services.leader_lease import LeaderLease
+from services.telegram_service import create_telegram_service
+
+# Global scheduler instance. Jobs live in a SQL job store, so they survive restarts and every
+# process sees the same schedule; only the process holding the scheduler lease runs them.
+scheduler = AsyncIOScheduler(
+    jobstores={"default": SQLAlchemyJobStore(url=settings.SCHEDULER_DATABASE_URL)},
+    job_defaults={
+        # Runs missed while no process was leading are made up once, if not too late
+        "coalesce": settings.SCHEDULER_COALESCE,
+        "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        "max_instances": 1,
+    },
+    timezone=settings.CALENDAR_TIMEZONE,
+)
+
+scheduler_lease: Optional[LeaderLease] = None
+_leadership_task: Optional[asyncio.Task] = None
+_missed_runs = 0
+_failed_runs = 0
+_skipped_runs = 0
+
+def leader_only(job_id: str):
+    """
+    Makes a job run only if this process still holds the scheduler lease when it starts.
+    The lease is renewed right before the run, which fences off a leader whose renewals stalled.
+    Otherwise the scheduler is paused and the job is made due again: APScheduler has already moved
+    the next run time in the shared store, so the leader would never see the skipped run.
+    """
+    def decorator(job):
+        @wraps(job)
+        async def run(*args, **kwargs):
+            global _skipped_runs
+            if scheduler_lease is not None and await asyncio.to_thread(scheduler_lease.try_acquire):
+                return await job(*args, **kwargs)
+            _skipped_runs += 1
+            logging.warning(f"Skipping job {job_id}: this process is not the scheduler leader; leaving the run to the leader.")
+            if scheduler.state == STATE_RUNNING:
+                scheduler.pause()
+            try:
+                scheduler.modify_job(job_id, next_run_time=datetime.now(timezone.utc))
+            except JobLookupError:
+                logging.warning(f"Job {job_id} is no longer scheduled.")
+        return run
+    return decorator
+
+@leader_only("daily_email_summary")
+async def daily_email_summary_job():
+    """
+    Sends the daily email summary.
+    Jobs are persisted by reference, so they build their services themselves instead of receiving them.
+    """
+    await process_and_summarize_emails(create_telegram_service())
+
+@leader_only("daily_issue_briefing")
+async def daily_issue_briefing_job():
+    """
+    Sends the daily briefing of routine construction issues.
+    """
+    issues = await get_issue_tracker().send_daily_briefing()
+    logging.info(f"Construction issue briefing sent ({issues} issues listed).")
+
+def _ensure_job(job_id: str, func, trigger: CronTrigger):
+    """
+    Adds a job to the store, or reschedules it if its trigger changed.
+    An unchanged job keeps its stored next run time, so a run missed during a restart is not lost.
+    """
+    job = scheduler.get_job(job_id)
+    if job is None:
+        try:
+            scheduler.add_job(func, trigger, id=job_id)
+        except ConflictingIdError:
+            # Another process registered it at the same time
+            pass
+    elif str(job.trigger) != str(trigger):
+        scheduler.reschedule_job(job_id, trigger=trigger)
+
+def schedule_daily_summary():
+    """
+    Schedules the daily email summary at EMAIL_SUMMARY_HOUR:EMAIL_SUMMARY_MINUTE (CALENDAR_TIMEZONE).
+    """
+    _ensure_job(
+        "daily_email_summary",
+        daily_email_summary_job,
+        CronTrigger(hour=settings.EMAIL_SUMMARY_HOUR, minute=settings.EMAIL_SUMMARY_MINUTE, timezone=settings.CALENDAR_TIMEZONE),
+    )
+
+def schedule_issue_briefing():
+    """
+    Schedules the construction issue briefing at ISSUE_BRIEFING_HOUR:ISSUE_BRIEFING_MINUTE (CALENDAR_TIMEZONE).
+    """
+    _ensure_job(
+        "daily_issue_briefing",
+        daily_issue_briefing_job,
+        CronTrigger(hour=settings.ISSUE_BRIEFING_HOUR, minute=settings.ISSUE_BRIEFING_MINUTE, timezone=settings.CALENDAR_TIMEZONE),
     )
 
+def _on_job_event(event: JobExecutionEvent):
+    global _missed_runs, _failed_runs
+    if event.code == EVENT_JOB_MISSED:
+        _missed_runs += 1
+        logging.warning(f"Job {event.job_id} missed its run at {event.scheduled_run_time}.")
+    else:
+        _failed_runs += 1
+
+async def _maintain_leadership():
+    """
+    Renews (or tries to take) the scheduler lease and runs the scheduler only while holding it.
+    """
+    while True:
+        try:
+            held = await asyncio.to_thread(scheduler_lease.try_acquire)
+        except Exception as e:
+            logging.error(f"Scheduler lease check failed: {e}", exc_info=True)
+            held = scheduler_lease.held
+        if held and scheduler.state == STATE_PAUSED:
+            logging.info("This process is now the scheduler leader; running jobs.")
+            scheduler.resume()
+        elif held:
+            # Picks up runs that another process made due again in the shared store
+            scheduler.wakeup()
+        elif not held and scheduler.state == STATE_RUNNING:
+            logging.info("Scheduler leadership lost; pausing jobs.")
+            scheduler.pause()
+        await asyncio.sleep(settings.SCHEDULER_LEASE_RENEW_SECONDS)
+
 def start_scheduler():
     """
-    Starts the scheduler and adds the jobs.
+    Starts the scheduler (paused until this process becomes the leader) and registers the jobs.
+    Must be called from the running event loop.
     """
-    if not scheduler.running:
-        scheduler.start()
-        # We can't inject the dependency here directly, so we will pass it in the job
-        # schedule_daily_summary()
-        print("Scheduler started.")
+    global scheduler_lease, _leadership_task
+    if scheduler.state != STATE_STOPPED:
+        return
+    scheduler_lease = LeaderLease(settings.SCHEDULER_DATABASE_URL, "scheduler", settings.SCHEDULER_LEASE_TTL_SECONDS)
+    scheduler.add_listener(_on_job_event, EVENT_JOB_MISSED | EVENT_JOB_ERROR)
+    scheduler.start(paused=True)
+    if settings.EMAIL_SUMMARY_ENABLED:
+        schedule_daily_summary()
+    elif scheduler.get_job("daily_email_summary"):
+        scheduler.remove_job("daily_email_summary")
+    if settings.ISSUE_BRIEFING_ENABLED:
+        schedule_issue_briefing()
+    elif scheduler.get_job("daily_issue_briefing"):
+        scheduler.remove_job("daily_issue_briefing")
+    _leadership_task = asyncio.create_task(_maintain_leadership(), name="scheduler-leadership")
+    logging.info("Scheduler started.")
 
-def shutdown_scheduler():
+async def shutdown_scheduler():
     """
-    Shuts down the scheduler.
+    Shuts down the scheduler and hands the lease over to another process.
     """
-    if scheduler.running:
-        scheduler.shutdown()
-        print("Scheduler shut down.")
+    global _leadership_task
+    if _leadership_task is not None:
+        _leadership_task.cancel()
+        await asyncio.gather(_leadership_task, return_exceptions=True)
+        _leadership_task = None
+    if scheduler.state != STATE_STOPPED:
+        scheduler.shutdown(wait=False)
+    if scheduler_lease is not None:
+        try:
+            await asyncio.to_thread(scheduler_lease.release)
+        except Exception as e:
+            logging.error(f"Could not release the scheduler lease: {e}")
+        scheduler_lease.close()
+    logging.info("Scheduler shut down.")
+
+def scheduler_stats() -> Dict[str, Any]:
+    return {
+        "state": {STATE_STOPPED: "stopped", STATE_RUNNING: "running", STATE_PAUSED: "paused"}[scheduler.state],
+        "lease": scheduler_lease.stats() if scheduler_lease else None,
+        "jobs": [
+            {"id": job.id, "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None}
+            for job in scheduler.get_jobs()
+        ] if scheduler.state != STATE_STOPPED else [],
+        "missed_runs": _missed_runs,
+        "failed_runs": _failed_runs,
+        "skipped_runs": _skipped_runs,
+    }
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.config import settings
+from utils.rate_limiter import TokenBucket
+
+# Telegram rejects messages longer than this many characters
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Transport errors raised before the request reached Telegram. Bot API calls are POSTs and not
+# idempotent: after any other error (e.g. a read timeout) the call may have been carried out, and
+# retrying it could post the message twice.
+RETRYABLE_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+class TelegramOutbox:
+    """
+    Process-wide throttle for outgoing Telegram Bot API calls.
+    Every call takes a token from a global bucket (about 30 messages/s) and, when it targets a chat,
+    from that chat's bucket (about 1 message/s with a small burst). 429 responses pause the bucket
+    for the advertised retry_after; 429s, 5xx responses and connection failures are retried with
+    exponential backoff and jitter. Other transport errors are raised without retrying, since the
+    call may already have been carried out.
+    Calls that target a chat are queued per chat and sent in order. Plain messages that pile up
+    while a chat is throttled (or within merge_window seconds) are merged into one sendMessage call
+    as long as the result fits in one message; other calls (edits, messages that will be edited)
+    keep their place in the queue but are sent on their own.
+    """
+    # Idle per-chat buckets are discarded beyond this many chats
+    MAX_TRACKED_CHATS = 10000
+
+    def __init__(
+        self,
+        global_rate: float = settings.TELEGRAM_GLOBAL_MESSAGES_PER_SECOND,
+        chat_rate: float = settings.TELEGRAM_CHAT_MESSAGES_PER_SECOND,
+        chat_burst: int = settings.TELEGRAM_CHAT_BURST,
+        merge_window: float = settings.TELEGRAM_MERGE_WINDOW_SECONDS,
+        max_retries: int = settings.TELEGRAM_SEND_MAX_RETRIES,
+        retry_base_delay: float = settings.TELEGRAM_RETRY_BASE_DELAY_SECONDS,
+        max_message_length: int = TELEGRAM_MAX_MESSAGE_LENGTH,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.merge_window = merge_window
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.max_message_length = max_message_length
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        # Per chat: (client, url, payload, mergeable, future) of each queued call
+        self._pending: Dict[int, List[Tuple[httpx.AsyncClient, str, Dict[str, Any], bool, asyncio.Future]]] = {}
+        self._senders: Dict[int, asyncio.Task] = {}
+
+        self.requests = 0
+        self.messages_queued = 0
+        self.messages_merged = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttle_wait_seconds = 0.0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._chat_buckets) > self.MAX_TRACKED_CHATS:
+                for idle_chat_id in [c for c, b in self._chat_buckets.items() if b.idle and c != chat_id]:
+                    del self._chat_buckets[idle_chat_id]
+        self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        payload: Dict[str, Any],
+        chat_id: Optional[int] = None,
+        chat_token_taken: bool = False,
+    ) -> httpx.Response:
+        """
+        POSTs payload to a Bot API method URL within the rate limits, retrying transient failures.
+        Returns the last response; callers handle non-retryable error statuses themselves.
+        """
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None and (attempt or not chat_token_taken):
+                self.throttle_wait_seconds += await self._chat_bucket(chat_id).acquire()
+            self.throttle_wait_seconds += await self._global_bucket.acquire()
+
+            last_attempt = attempt == self.max_retries
+            self.requests += 1
+            try:
+                response = await client.post(url, json=payload)
+            except RETRYABLE_TRANSPORT_ERRORS as e:
+                if last_attempt:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"Telegram request failed ({e!r}), retrying in {delay:.2f}s.")
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                try:
+                    retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+                except ValueError:
+                    retry_after = 1.0
+                if last_attempt:
+                    return response
+                # Jitter keeps chats that were throttled together from retrying in lockstep
+                pause = retry_after + random.uniform(0, self.retry_base_delay)
+                logging.warning(f"Telegram rate limit hit (chat {chat_id}), retrying in {pause:.2f}s.")
+                (self._chat_bucket(chat_id) if chat_id is not None else self._global_bucket).pause(pause)
+                self.retries += 1
+                continue
+
+            if response.status_code >= 500 and not last_attempt:
+                delay = self._backoff(attempt)
+                logging.warning(f"Telegram returned {response.status_code}, retrying in {delay:.2f}s.")
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            return response
+        return response
+
+    async def send_text(
+        self, client: httpx.AsyncClient, url: str, chat_id: int, text: str, merge: bool = True
+    ) -> httpx.Response:
+        """
+        Queues a sendMessage call for chat_id and returns its response once delivered.
+        With merge, the message may be merged with neighbouring queued messages of the same chat,
+        in which case they all share one response (and message_id).
+        """
+        return await self._enqueue(client, url, chat_id, {"chat_id": chat_id, "text": text}, merge)
+
+    async def send_in_order(self, client: httpx.AsyncClient, url: str, chat_id: int, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        Queues any Bot API call for chat_id behind the chat's earlier queued calls and returns its response.
+        """
+        return await self._enqueue(client, url, chat_id, payload, False)
+
+    async def _enqueue(
+        self, client: httpx.AsyncClient, url: str, chat_id: int, payload: Dict[str, Any], merge: bool
+    ) -> httpx.Response:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(chat_id, []).append((client, url, payload, merge, future))
+        self.messages_queued += 1
+        if chat_id not in self._senders:
+            self._senders[chat_id] = asyncio.create_task(self._send_pending(chat_id))
+        return await asyncio.shield(future)
+
+    def _take_batch(self, chat_id: int) -> Tuple[httpx.AsyncClient, str, Dict[str, Any], List[asyncio.Future]]:
+        """
+        Pops the next queued call of a chat, merged with the mergeable messages right behind it
+        that still fit into one Telegram message.
+        """
+        pending = self._pending[chat_id]
+        client, url, payload, merge, future = pending.pop(0)
+        futures = [future]
+        if merge:
+            text = payload["text"]
+            while pending and pending[0][3] and pending[0][1] == url:
+                _, _, next_payload, _, next_future = pending[0]
+                if len(text) + 2 + len(next_payload["text"]) > self.max_message_length:
+                    break
+                pending.pop(0)
+                text = f"{text}\n\n{next_payload['text']}"
+                futures.append(next_future)
+            payload = {**payload, "text": text}
+        if not pending:
+            del self._pending[chat_id]
+        self.messages_merged += len(futures) - 1
+        return client, url, payload, futures
+
+    async def _send_pending(self, chat_id: int):
+        try:
+            while self._pending.get(chat_id):
+                if self.merge_window and self._pending[chat_id][0][3]:
+                    await asyncio.sleep(self.merge_window)
+                # Messages queued while waiting for the chat's turn are merged into this send
+                self.throttle_wait_seconds += await self._chat_bucket(chat_id).acquire()
+                client, url, payload, futures = self._take_batch(chat_id)
+                try:
+                    response = await self.request(client, url, payload, chat_id, chat_token_taken=True)
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for future in futures:
+                    if not future.done():
+                        future.set_result(response)
+        finally:
+            del self._senders[chat_id]
+            for *_, future in self._pending.pop(chat_id, []):
+                future.cancel()
+
+    async def aclose(self, timeout: float = 10.0):
+        """
+        Waits (up to timeout seconds) for queued messages to be delivered.
+        """
+        senders = list(self._senders.values())
+        if not senders:
+            return
+        _, still_running = await asyncio.wait(senders, timeout=timeout)
+        for sender in still_running:
+            sender.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "messages_queued": self.messages_queued,
+            "messages_merged": self.messages_merged,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttle_wait_seconds": round(self.throttle_wait_seconds, 6),
+            "queued_now": sum(len(pending) for pending in self._pending.values()),
+            "chats_tracked": len(self._chat_buckets),
+        }
+
+# Global outbox shared by every TelegramService instance
+telegram_outbox = TelegramOutbox()
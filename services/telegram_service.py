@@ -1,24 +1,242 @@
 import httpx
+import time
 from core.config import settings
+from tempfile import SpooledTemporaryFile
+from typing import Any, AsyncIterator, Dict, List, Optional
 import logging
+from services.telegram_outbox import TELEGRAM_MAX_MESSAGE_LENGTH, telegram_outbox
+from utils.http_client import HttpClient
+
+def split_message_text(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Splits text into parts Telegram accepts, preferring line breaks and then spaces as split points.
+    """
+    parts = []
+    while len(text) > limit:
+        split_at = text.rfind("\n", 0, limit)
+        if split_at <= 0:
+            split_at = text.rfind(" ", 0, limit)
+        if split_at <= 0:
+            split_at = limit
+        parts.append(text[:split_at])
+        text = text[split_at:].lstrip("\n ")
+    parts.append(text)
+    return parts
+
+class DownloadStats:
+    """
+    Process-wide accounting of streamed file downloads: bytes held in memory, spills to disk and peaks.
+    """
+    def __init__(self):
+        self.downloads = 0
+        self.rejected_too_large = 0
+        self.bytes_downloaded = 0
+        self.spilled_to_disk = 0
+        self.disk_bytes_written = 0
+        self.in_memory_bytes = 0
+        self.peak_in_memory_bytes = 0
+        self.peak_download_bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+class DownloadBuffer(SpooledTemporaryFile):
+    """
+    Spooled buffer of a downloaded file that stays in memory up to max_size bytes and spills to
+    disk beyond that. The bytes it holds in memory are counted in stats.in_memory_bytes until it
+    spills or is closed, so the accounting covers the whole time a consumer holds the buffer.
+    """
+    def __init__(self, max_size: int, stats: DownloadStats, **kwargs: Any):
+        super().__init__(max_size=max_size, **kwargs)
+        self.max_memory_bytes = max_size
+        self.stats = stats
+        self.memory_held = 0
+        self.spilled = False
+
+    def write(self, data: bytes) -> int:
+        # Spill based on our own byte count, before the write that would exceed the memory budget
+        if not self.spilled and self.max_memory_bytes and self.memory_held + len(data) > self.max_memory_bytes:
+            self.rollover()
+        written = super().write(data)
+        if self.spilled:
+            self.stats.disk_bytes_written += len(data)
+        else:
+            self.memory_held += len(data)
+            self.stats.in_memory_bytes += len(data)
+            self.stats.peak_in_memory_bytes = max(self.stats.peak_in_memory_bytes, self.stats.in_memory_bytes)
+        return written
+
+    def rollover(self):
+        if self.spilled:
+            return
+        super().rollover()
+        self.spilled = True
+        # Everything written so far now lives on disk instead of in memory
+        self.stats.disk_bytes_written += self.memory_held
+        self._release_memory()
+
+    def _release_memory(self):
+        self.stats.in_memory_bytes -= self.memory_held
+        self.memory_held = 0
+
+    def close(self):
+        self._release_memory()
+        super().close()
+
+    def __exit__(self, exc, value, tb):
+        # SpooledTemporaryFile.__exit__ closes the underlying file directly, bypassing close()
+        self.close()
+
+class StreamingStats:
+    """
+    Process-wide accounting of streamed replies, including the time until the first token became visible in the chat.
+    """
+    def __init__(self):
+        self.streams = 0
+        self.edits = 0
+        self.failed_edits = 0
+        self.messages_sent = 0
+        self.first_token_count = 0
+        self.first_token_total_seconds = 0.0
+        self.first_token_max_seconds = 0.0
+
+    def observe_first_token(self, seconds: float):
+        self.first_token_count += 1
+        self.first_token_total_seconds += seconds
+        self.first_token_max_seconds = max(self.first_token_max_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = dict(vars(self))
+        snapshot["first_token_avg_seconds"] = (
+            round(self.first_token_total_seconds / self.first_token_count, 6) if self.first_token_count else 0.0
+        )
+        return snapshot
+
+class MessageStream:
+    """
+    A reply that is shown progressively while it is being generated.
+    start() posts a placeholder message; append() adds tokens and edits the message at most once
+    every edit_interval seconds; finish() writes the final text. Text beyond Telegram's length limit
+    continues in follow-up messages. Edit failures while streaming are logged and retried on the
+    next flush, so a slow or failing edit never aborts the reply.
+    """
+    def __init__(
+        self,
+        telegram_service: "TelegramService",
+        chat_id: int,
+        edit_interval: float = settings.TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS,
+        placeholder: str = settings.TELEGRAM_STREAM_PLACEHOLDER,
+    ):
+        self.telegram_service = telegram_service
+        self.chat_id = chat_id
+        self.edit_interval = edit_interval
+        self.placeholder = placeholder
+        self.text = ""
+        self.first_token_latency: Optional[float] = None
+        self._message_ids: List[int] = []
+        self._shown: List[str] = []
+        self._started_at = time.perf_counter()
+        self._last_flush = 0.0
+
+    async def start(self):
+        self._started_at = time.perf_counter()
+        TelegramService.streaming_stats.streams += 1
+        await self._flush()
+
+    async def append(self, delta: str):
+        if not delta:
+            return
+        self.text += delta
+        # The first token is shown right away; later ones are batched into rate-limited edits
+        if self.first_token_latency is None or time.perf_counter() - self._last_flush >= self.edit_interval:
+            try:
+                await self._flush()
+            except httpx.HTTPError as e:
+                TelegramService.streaming_stats.failed_edits += 1
+                logging.warning(f"Could not update streamed reply in chat {self.chat_id}: {e}")
+
+    async def finish(self, final_text: Optional[str] = None):
+        """
+        Replaces the streamed text with final_text (when given) and delivers whatever is not shown yet.
+        """
+        if final_text is not None:
+            self.text = final_text
+        await self._flush()
+
+    async def _flush(self):
+        self._last_flush = time.perf_counter()
+        parts = split_message_text(self.text) if self.text else [self.placeholder]
+        for index, part in enumerate(parts):
+            if index < len(self._message_ids):
+                if self._shown[index] != part:
+                    await self.telegram_service.edit_message_text(self.chat_id, self._message_ids[index], part)
+                    self._shown[index] = part
+                    TelegramService.streaming_stats.edits += 1
+            else:
+                self._message_ids.append(await self.telegram_service.send_message(self.chat_id, part, merge=False))
+                self._shown.append(part)
+                TelegramService.streaming_stats.messages_sent += 1
+        for index in range(len(parts), len(self._message_ids)):
+            # The final text is shorter than what was streamed: blank the surplus messages
+            if self._shown[index] != self.placeholder:
+                await self.telegram_service.edit_message_text(self.chat_id, self._message_ids[index], self.placeholder)
+                self._shown[index] = self.placeholder
+
+        if self.text and self.first_token_latency is None:
+            self.first_token_latency = time.perf_counter() - self._started_at
+            TelegramService.streaming_stats.observe_first_token(self.first_token_latency)
 
 class TelegramService:
+    download_stats = DownloadStats()
+    streaming_stats = StreamingStats()
+
     def __init__(self, client: httpx.AsyncClient):
         self.client = client
-        self.telegram_api_url = f"https://api.telegram.org/bot{settings.telegram_token}"
+        self.telegram_api_url = f"{settings.TELEGRAM_API_BASE_URL}/bot{settings.telegram_token}"
+        self.telegram_file_url = f"{settings.TELEGRAM_API_BASE_URL}/file/bot{settings.telegram_token}"
 
-    async def send_message(self, chat_id: int, text: str):
+    async def send_message(self, chat_id: int, text: str, merge: bool = True) -> int | None:
         """
-        Sends a text message to a specified Telegram chat.
+        Sends a text message to a specified Telegram chat, split into several messages if it exceeds
+        Telegram's length limit. Returns the id of the last message sent.
+        Sends go through the chat's queue in telegram_outbox, which enforces Telegram's rate limits;
+        with merge, the message may be combined with other queued messages to the same chat, so pass
+        merge=False for messages that will be edited later.
+        """
+        message_id = None
+        url = f"{self.telegram_api_url}/sendMessage"
+        for part in split_message_text(text):
+            response = await telegram_outbox.send_text(self.client, url, chat_id, part, merge)
+            if response.status_code != 200:
+                logging.error(f"Error sending message to Telegram: {response.text}")
+                response.raise_for_status()
+            message_id = response.json().get("result", {}).get("message_id")
+        return message_id
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str):
         """
-        response = await self.client.post(
-            f"{self.telegram_api_url}/sendMessage",
-            json={"chat_id": chat_id, "text": text},
+        Replaces the text of a message previously sent by the bot, in order with the chat's queued messages.
+        """
+        response = await telegram_outbox.send_in_order(
+            self.client,
+            f"{self.telegram_api_url}/editMessageText",
+            chat_id,
+            {"chat_id": chat_id, "message_id": message_id, "text": text},
         )
         if response.status_code != 200:
-            logging.error(f"Error sending message to Telegram: {response.text}")
+            if "message is not modified" in response.text:
+                return
+            logging.error(f"Error editing Telegram message: {response.text}")
             response.raise_for_status()
 
+    async def stream_message(self, chat_id: int) -> MessageStream:
+        """
+        Posts a placeholder message and returns a MessageStream that progressively fills it in.
+        """
+        stream = MessageStream(self, chat_id)
+        await stream.start()
+        return stream
+
     async def get_file_path(self, file_id: str) -> str | None:
         """
         Gets the file path of a file from Telegram.
@@ -35,10 +253,80 @@ class TelegramService:
         """
         Downloads a file from Telegram.
         """
-        file_url = f"https://api.telegram.org/file/bot{settings.telegram_token}/{file_path}"
+        file_url = f"{self.telegram_file_url}/{file_path}"
         response = await self.client.get(file_url)
         if response.status_code != 200:
             logging.error(f"Could not download file from Telegram: {response.text}")
             return None
         
         return response.content
+
+    async def download_file_stream(self, file_path: str, max_bytes: int = settings.VOICE_DOWNLOAD_MAX_BYTES) -> DownloadBuffer | None:
+        """
+        Streams a file from Telegram into a spooled buffer that stays in memory up to
+        VOICE_SPOOL_MAX_MEMORY_BYTES and spills to disk beyond that.
+        Returns the buffer rewound to the start, or None if the download failed or exceeded max_bytes.
+        The caller is responsible for closing the returned buffer, which also releases its memory
+        from the download statistics.
+        """
+        stats = TelegramService.download_stats
+        file_url = f"{self.telegram_file_url}/{file_path}"
+        buffer = DownloadBuffer(settings.VOICE_SPOOL_MAX_MEMORY_BYTES, stats, suffix=".ogg")
+        size = 0
+        try:
+            async with self.client.stream("GET", file_url) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    logging.error(f"Could not download file from Telegram: {response.text}")
+                    buffer.close()
+                    return None
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        stats.rejected_too_large += 1
+                        logging.error(f"File {file_path} exceeds the {max_bytes} bytes download limit.")
+                        buffer.close()
+                        return None
+                    buffer.write(chunk)
+        except BaseException:
+            buffer.close()
+            raise
+
+        if buffer.spilled:
+            stats.spilled_to_disk += 1
+        stats.downloads += 1
+        stats.bytes_downloaded += size
+        stats.peak_download_bytes = max(stats.peak_download_bytes, size)
+        buffer.seek(0)
+        return buffer
+
+    async def iter_file_chunks(self, file_path: str, max_bytes: int = settings.VOICE_DOWNLOAD_MAX_BYTES) -> AsyncIterator[bytes]:
+        """
+        Streams a file from Telegram chunk by chunk, so consumers can start working before the download completes.
+        Raises ValueError if the download fails or exceeds max_bytes.
+        """
+        stats = TelegramService.download_stats
+        file_url = f"{self.telegram_file_url}/{file_path}"
+        size = 0
+        async with self.client.stream("GET", file_url) as response:
+            if response.status_code != 200:
+                await response.aread()
+                logging.error(f"Could not download file from Telegram: {response.text}")
+                raise ValueError(f"Could not download file {file_path} from Telegram.")
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    stats.rejected_too_large += 1
+                    raise ValueError(f"File {file_path} exceeds the {max_bytes} bytes download limit.")
+                yield chunk
+
+        stats.downloads += 1
+        stats.bytes_downloaded += size
+        stats.peak_download_bytes = max(stats.peak_download_bytes, size)
+
+def create_telegram_service() -> TelegramService:
+    """
+    Builds a TelegramService on the shared HTTP client, for code outside FastAPI request handling
+    (background workers, scheduled jobs).
+    """
+    return TelegramService(HttpClient.get_client())
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+
+class TranscriptionCache:
+    """
+    Content-addressed cache of voice note transcriptions.
+    Entries are keyed on Telegram's Voice.file_unique_id (identical for forwarded copies and
+    redeliveries of the same audio) plus the transcription provider and model. A bounded in-memory
+    LRU tier sits in front of an optional on-disk tier; both expire entries after a TTL.
+    """
+    # Expired disk entries are swept every this many writes
+    SWEEP_EVERY = 200
+
+    def __init__(
+        self,
+        max_memory_entries: int = settings.TRANSCRIPTION_CACHE_MAX_MEMORY_ENTRIES,
+        ttl_seconds: float = settings.TRANSCRIPTION_CACHE_TTL_SECONDS,
+        disk_dir: Optional[str] = settings.TRANSCRIPTION_CACHE_DIR,
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._writes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(file_unique_id: str, provider: str, model: str) -> str:
+        return hashlib.sha256(f"{provider}:{model}:{file_unique_id}".encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember_in_memory(self, key: str, expires_at: float, text: str):
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, file_unique_id: str, provider: str, model: str) -> Optional[str]:
+        """
+        Returns the cached transcription, or None on a miss.
+        """
+        key = self.make_key(file_unique_id, provider, model)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, text = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+            del self._memory[key]
+            self.evictions += 1
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as cache_file:
+                    record = json.load(cache_file)
+                if record["expires_at"] > now:
+                    self._remember_in_memory(key, record["expires_at"], record["text"])
+                    self.disk_hits += 1
+                    return record["text"]
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Ignoring unreadable transcription cache entry {path}: {e}")
+
+        self.misses += 1
+        return None
+
+    def set(self, file_unique_id: str, provider: str, model: str, text: str):
+        key = self.make_key(file_unique_id, provider, model)
+        expires_at = time.time() + self.ttl_seconds
+        self._remember_in_memory(key, expires_at, text)
+        self.stores += 1
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            temp_path = f"{path}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as cache_file:
+                    json.dump({"text": text, "expires_at": expires_at}, cache_file)
+                # Atomic rename so concurrent readers never see a partial entry
+                os.replace(temp_path, path)
+            except OSError as e:
+                logging.warning(f"Could not write transcription cache entry {path}: {e}")
+
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                self.sweep_disk()
+
+    def sweep_disk(self):
+        """
+        Removes expired entries from the disk tier.
+        """
+        now = time.time()
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as cache_file:
+                    expired = json.load(cache_file)["expires_at"] <= now
+            except (OSError, ValueError, KeyError):
+                expired = True
+            if expired:
+                try:
+                    os.remove(entry.path)
+                    self.evictions += 1
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+
+# Global transcription cache instance
+transcription_cache = TranscriptionCache()
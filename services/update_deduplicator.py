@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.config import settings
+
+class SQLiteDedupBackend:
+    """
+    Persistent record of processed update ids, so duplicates are still recognised after a restart.
+    """
+    # Expired rows are purged every this many inserts
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_updates ("
+            "update_id INTEGER PRIMARY KEY, result TEXT, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._inserts = 0
+
+    def get(self, update_id: int, now: float) -> Tuple[bool, Optional[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM processed_updates WHERE update_id = ? AND expires_at > ?",
+                (update_id, now),
+            ).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def put(self, update_id: int, result: Optional[str], expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_updates (update_id, result, expires_at) VALUES (?, ?, ?)",
+                (update_id, result, expires_at),
+            )
+            self._inserts += 1
+            if self._inserts % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM processed_updates WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class UpdateDeduplicator:
+    """
+    Idempotency layer keyed on Telegram's update_id.
+    Completed updates are remembered in a bounded TTL/LRU map (optionally backed by SQLite) so that
+    redelivered webhooks are short-circuited before any network or LLM work. Duplicates that arrive
+    while the original is still being processed are coalesced onto the in-flight result.
+    """
+    def __init__(
+        self,
+        ttl_seconds: float = settings.UPDATE_DEDUP_TTL_SECONDS,
+        max_entries: int = settings.UPDATE_DEDUP_MAX_ENTRIES,
+        backend: str = settings.UPDATE_DEDUP_BACKEND,
+        sqlite_path: str = settings.UPDATE_DEDUP_SQLITE_PATH,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._completed: "OrderedDict[int, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[int, asyncio.Future] = {}
+
+        if backend == "sqlite":
+            self._persistent: Optional[SQLiteDedupBackend] = SQLiteDedupBackend(sqlite_path)
+        elif backend == "memory":
+            self._persistent = None
+        else:
+            raise ValueError(f"Unsupported dedup backend: {backend}. Choose 'memory' or 'sqlite'.")
+
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _lookup(self, update_id: int) -> Tuple[bool, Any]:
+        now = time.time()
+        entry = self._completed.get(update_id)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > now:
+                self._completed.move_to_end(update_id)
+                return True, result
+            del self._completed[update_id]
+
+        if self._persistent:
+            found, result = self._persistent.get(update_id, now)
+            if found:
+                self._remember_in_memory(update_id, result, now + self.ttl_seconds)
+                return True, result
+        return False, None
+
+    def _remember_in_memory(self, update_id: int, result: Any, expires_at: float):
+        self._completed[update_id] = (expires_at, result)
+        self._completed.move_to_end(update_id)
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    def begin(self, update_id: int) -> Optional[asyncio.Future]:
+        """
+        Claims an update for processing.
+        Returns None if the caller now owns the update and must call complete() or fail().
+        Otherwise returns a future resolving to the result of the original processing.
+        """
+        found, result = self._lookup(update_id)
+        if found:
+            self.hits += 1
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(result)
+            return future
+
+        in_flight = self._in_flight.get(update_id)
+        if in_flight is not None:
+            self.coalesced += 1
+            return in_flight
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Mark exceptions as retrieved so failures without waiting duplicates are not reported as leaks
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[update_id] = future
+        return None
+
+    def in_flight(self, update_id: int) -> Optional[asyncio.Future]:
+        """
+        Returns the future resolved when the claimed update finishes processing, or None if it is not in flight.
+        """
+        return self._in_flight.get(update_id)
+
+    def complete(self, update_id: int, result: Any = None):
+        """
+        Records a successfully processed update and resolves any coalesced duplicates.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        self._remember_in_memory(update_id, result, expires_at)
+        if self._persistent:
+            self._persistent.put(update_id, None if result is None else str(result), expires_at)
+
+        future = self._in_flight.pop(update_id, None)
+        if future and not future.done():
+            future.set_result(result)
+
+    def fail(self, update_id: int, error: BaseException):
+        """
+        Releases a failed update so that a later redelivery is processed again.
+        """
+        future = self._in_flight.pop(update_id, None)
+        if future and not future.done():
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+
+    async def run_once(self, update_id: int, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs func at most once per update_id.
+        Returns the result and whether the call was a duplicate.
+        """
+        existing = self.begin(update_id)
+        if existing is not None:
+            logging.info(f"Duplicate update {update_id} short-circuited.")
+            return await asyncio.shield(existing), True
+
+        try:
+            result = await func()
+        except BaseException as e:
+            self.fail(update_id, e)
+            raise
+        self.complete(update_id, result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "entries": len(self._completed),
+            "in_flight": len(self._in_flight),
+        }
+
+    def close(self):
+        if self._persistent:
+            self._persistent.close()
+
+# Global update deduplicator instance
+update_deduplicator = UpdateDeduplicator()
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+from pydantic import TypeAdapter, ValidationError
+
+from core.config import settings
+from models.telegram_models import Update
+from services.google_service import GoogleService, get_shared_google_service
+from services.openai_service import OpenAIService, get_shared_openai_service
+from services.telegram_service import TelegramService, create_telegram_service
+from services.update_deduplicator import update_deduplicator
+from services.update_queue import QueueFullError, process_in_chat_order, update_queue
+
+# One validation pass for a whole getUpdates batch
+UPDATE_LIST_ADAPTER = TypeAdapter(List[Update])
+
+class UpdatePoller:
+    """
+    getUpdates long-polling runner, an alternative to the webhook that needs no public HTTPS endpoint.
+    Each call fetches up to TELEGRAM_POLL_LIMIT updates, which go through the same deduplication and
+    processing pipeline as webhook updates ('queue' or 'sync' processing mode). Polling goes on while
+    earlier updates are still being processed, so a slow chat does not hold up the others; the number
+    of updates in flight is bounded by the update queue (its overflow policy) and by the poll limit.
+    The offset sent to Telegram only covers the contiguous prefix of finished updates, so nothing is
+    acknowledged before it was handled: after a crash the unfinished updates are delivered again.
+    Updates past the offset keep coming back until then; the ones already in flight are skipped.
+    """
+    def __init__(
+        self,
+        poll_timeout: int = settings.TELEGRAM_POLL_TIMEOUT_SECONDS,
+        limit: int = settings.TELEGRAM_POLL_LIMIT,
+        retry_delay: float = settings.TELEGRAM_POLL_RETRY_DELAY_SECONDS,
+        in_flight_poll_interval: float = settings.TELEGRAM_POLL_IN_FLIGHT_INTERVAL_SECONDS,
+    ):
+        self.poll_timeout = poll_timeout
+        self.limit = limit
+        self.retry_delay = retry_delay
+        self.in_flight_poll_interval = in_flight_poll_interval
+        self.offset: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        # Fetched updates past the offset, in update_id order, with the future resolved when each one is done
+        self._in_flight: "OrderedDict[int, asyncio.Future]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.polls = 0
+        self.empty_polls = 0
+        self.poll_errors = 0
+        self.updates_received = 0
+        self.duplicates = 0
+        self.parse_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """
+        Starts polling in a background task on the running event loop.
+        """
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="update-poller")
+        logging.info(f"Update poller started (timeout={self.poll_timeout}s, limit={self.limit}).")
+
+    async def stop(self):
+        """
+        Stops polling. Updates still in flight are abandoned without advancing the offset (queued
+        ones are left to the update queue's drain).
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(self._task, *self._tasks, return_exceptions=True)
+        self._task = None
+        self._in_flight.clear()
+
+    async def _run(self):
+        telegram_service = create_telegram_service()
+        google_service = get_shared_google_service()
+        openai_service = get_shared_openai_service()
+        api_url = telegram_service.telegram_api_url
+
+        # getUpdates is refused while a webhook is registered
+        try:
+            response = await telegram_service.client.post(f"{api_url}/deleteWebhook")
+            if response.status_code != 200:
+                logging.warning(f"Could not delete the Telegram webhook: {response.text}")
+        except httpx.HTTPError as e:
+            logging.warning(f"Could not delete the Telegram webhook: {e}")
+
+        while True:
+            try:
+                updates = await self._fetch(telegram_service.client, api_url)
+            except (httpx.HTTPError, ValueError, ValidationError) as e:
+                self.poll_errors += 1
+                logging.error(f"getUpdates failed: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            if not updates:
+                self.empty_polls += 1
+                continue
+            # Skip updates already in flight, or finished while this call was pending
+            new_updates = [
+                update for update in updates
+                if update.update_id not in self._in_flight and (self.offset is None or update.update_id >= self.offset)
+            ]
+            self.updates_received += len(new_updates)
+
+            dispatched = await self._dispatch(new_updates, telegram_service, google_service, openai_service)
+            if dispatched < len(new_updates):
+                # The queue is full: give it time to drain; the rest is fetched again
+                await asyncio.sleep(self.retry_delay)
+            elif not new_updates and self._in_flight:
+                # Only unfinished updates came back, and Telegram does not long-poll while there are
+                # unconfirmed ones: ask again once one of them finishes, or after a short interval
+                await asyncio.wait(
+                    list(self._in_flight.values()), timeout=self.in_flight_poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+
+    async def _fetch(self, client: httpx.AsyncClient, api_url: str) -> List[Update]:
+        params: Dict[str, Any] = {"timeout": self.poll_timeout, "limit": self.limit}
+        if self.offset is not None:
+            params["offset"] = self.offset
+        self.polls += 1
+        response = await client.get(
+            f"{api_url}/getUpdates",
+            params=params,
+            # The read timeout has to outlast the long-polling timeout
+            timeout=httpx.Timeout(self.poll_timeout + settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+        )
+        response.raise_for_status()
+        started_at = time.perf_counter()
+        updates = UPDATE_LIST_ADAPTER.validate_python(response.json()["result"])
+        self.parse_seconds += time.perf_counter() - started_at
+        return updates
+
+    def _track(self, update_id: int, future: asyncio.Future):
+        self._in_flight[update_id] = future
+        future.add_done_callback(lambda _: self._advance_offset())
+
+    def _advance_offset(self):
+        """
+        Moves the offset past the finished updates at the head of the in-flight window.
+        """
+        while self._in_flight:
+            update_id, future = next(iter(self._in_flight.items()))
+            if not future.done():
+                break
+            del self._in_flight[update_id]
+            self.offset = update_id + 1
+
+    async def _dispatch(
+        self,
+        updates: List[Update],
+        telegram_service: TelegramService,
+        google_service: GoogleService,
+        openai_service: OpenAIService,
+    ) -> int:
+        """
+        Hands new updates to the pipeline without waiting for them to finish.
+        Returns how many leading updates were accepted (all of them unless the queue filled up).
+        Failed updates were already reported to their chat, as in webhook mode; only completion matters here.
+        """
+        if settings.UPDATE_PROCESSING_MODE != "queue":
+            for update in updates:
+                task = asyncio.create_task(process_in_chat_order(update, telegram_service, google_service, openai_service))
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+                self._track(update.update_id, task)
+            return len(updates)
+
+        dispatched = 0
+        for update in updates:
+            existing = update_deduplicator.begin(update.update_id)
+            if existing is not None:
+                self.duplicates += 1
+                self._track(update.update_id, existing)
+                dispatched += 1
+                continue
+            future = update_deduplicator.in_flight(update.update_id)
+            try:
+                await update_queue.enqueue(update)
+            except QueueFullError as e:
+                update_deduplicator.fail(update.update_id, e)
+                logging.warning(f"Update queue full, pausing polling at update {update.update_id}.")
+                break
+            self._track(update.update_id, future)
+            dispatched += 1
+        return dispatched
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        result = task.exception() or task.result()
+        if isinstance(result, tuple) and result[1]:
+            self.duplicates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "offset": self.offset,
+            "polls": self.polls,
+            "empty_polls": self.empty_polls,
+            "poll_errors": self.poll_errors,
+            "updates_received": self.updates_received,
+            "duplicates": self.duplicates,
+            "in_flight": len(self._in_flight),
+            "avg_batch_size": round(self.updates_received / (self.polls - self.empty_polls - self.poll_errors), 2)
+            if self.polls - self.empty_polls - self.poll_errors > 0 else 0.0,
+            "parse_seconds": round(self.parse_seconds, 6),
+        }
+
+# Global update poller instance (started from main.lifespan when INGESTION_MODE is 'polling')
+update_poller = UpdatePoller()
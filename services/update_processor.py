@@ -0,0 +1,183 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from google.api_core.exceptions import GoogleAPICallError
+
+from core.agent_graph import process_telegram_update
+from core.config import settings
+from models.telegram_models import Update, Voice
+from services.google_service import GoogleService
+from services.openai_service import OpenAIService
+from services.telegram_service import TelegramService
+from services.transcription_cache import transcription_cache
+from utils.metrics import TRANSCRIPTION_LATENCY, observe_latency
+
+class TranscriptionError(Exception):
+    """
+    Raised when a voice message cannot be downloaded or transcribed; the message is shown to the user.
+    """
+
+def _transcription_model() -> str:
+    if settings.LLM_PROVIDER == "openai":
+        return settings.OPENAI_MODEL_TRANSCRIPTION
+    return GoogleService.TRANSCRIPTION_MODEL
+
+async def _download_and_transcribe(
+    voice: Voice,
+    telegram_service: TelegramService,
+    google_service: GoogleService,
+    openai_service: OpenAIService,
+) -> str:
+    if voice.file_size and voice.file_size > settings.VOICE_DOWNLOAD_MAX_BYTES:
+        logging.error(f"Voice message of {voice.file_size} bytes exceeds the download limit.")
+        raise TranscriptionError("[Voice message is too large]")
+
+    file_path = await telegram_service.get_file_path(voice.file_id)
+    if not file_path:
+        logging.error("Could not retrieve file path for voice message.")
+        raise TranscriptionError("[Could not retrieve voice message]")
+
+    logging.info(f"Transcription provider: {settings.LLM_PROVIDER}")
+
+    if settings.LLM_PROVIDER == "google" and settings.GOOGLE_STREAMING_THRESHOLD_SECONDS < voice.duration <= settings.GOOGLE_STREAMING_MAX_SECONDS:
+        # Long notes are recognised while they download, which also lifts the synchronous one-minute limit
+        try:
+            return await google_service.transcribe_audio_stream(telegram_service.iter_file_chunks(file_path))
+        except ValueError as e:
+            logging.error(f"Could not stream voice message: {e}")
+            raise TranscriptionError("[Could not download voice message]")
+        except GoogleAPICallError as e:
+            logging.error(f"Google streaming recognition failed: {e}")
+            raise TranscriptionError("[Could not transcribe voice message]")
+
+    audio_buffer = await telegram_service.download_file_stream(file_path)
+    if not audio_buffer:
+        logging.error("Could not download voice message.")
+        raise TranscriptionError("[Could not download voice message]")
+
+    with audio_buffer:
+        if settings.LLM_PROVIDER == "google":
+            try:
+                if voice.duration > settings.GOOGLE_STREAMING_MAX_SECONDS:
+                    # Beyond a single streaming session: recognised in one long-running operation
+                    return await google_service.transcribe_long_audio(audio_buffer.read())
+                return await google_service.transcribe_audio(audio_buffer.read())
+            except ValueError as e:
+                logging.error(f"Voice message is too long for Google recognition: {e}")
+                raise TranscriptionError("[Voice message is too long]")
+            except GoogleAPICallError as e:
+                logging.error(f"Google recognition failed: {e}")
+                raise TranscriptionError("[Could not transcribe voice message]")
+        transcription = await openai_service.transcribe_audio(audio_buffer)
+        return transcription.text
+
+async def transcribe_voice_message(
+    update: Update,
+    telegram_service: TelegramService,
+    google_service: GoogleService,
+    openai_service: OpenAIService,
+) -> str | None:
+    """
+    Transcribes the voice note of an update, serving repeats of the same audio from transcription_cache.
+    """
+    if not update.message or not update.message.voice:
+        return None
+
+    if settings.LLM_PROVIDER not in ("google", "openai"):
+        logging.warning(f"Unsupported transcription provider: {settings.LLM_PROVIDER}")
+        return "[Unsupported transcription provider]"
+
+    voice = update.message.voice
+    model = _transcription_model()
+    with observe_latency(TRANSCRIPTION_LATENCY, provider=settings.LLM_PROVIDER, source="cache") as labels:
+        cached_text = transcription_cache.get(voice.file_unique_id, settings.LLM_PROVIDER, model)
+        if cached_text is not None:
+            logging.info(f"Transcription cache hit for voice message {voice.file_unique_id}.")
+            return cached_text
+
+        labels["source"] = "api"
+        try:
+            text = await _download_and_transcribe(voice, telegram_service, google_service, openai_service)
+        except TranscriptionError as e:
+            labels["source"] = "failed"
+            return str(e)
+
+    if text:
+        transcription_cache.set(voice.file_unique_id, settings.LLM_PROVIDER, model, text)
+    return text
+
+async def process_update(
+    update: Update,
+    telegram_service: TelegramService,
+    google_service: GoogleService,
+    openai_service: OpenAIService,
+    stage_timings: Optional[Dict[str, float]] = None,
+) -> str:
+    """
+    Runs a Telegram update through transcription, the agent graph and the reply.
+    With RESPONSE_STREAMING_ENABLED the reply is shown progressively through a MessageStream.
+    Returns the processing status. Per-stage latencies (in seconds), including the time until
+    the first streamed token was visible, are written to stage_timings when provided.
+    Errors from the agent are reported to the chat and then re-raised.
+    """
+    if stage_timings is None:
+        stage_timings = {}
+
+    chat_id = None
+    message_text = None
+    message_type = "unsupported"
+
+    if update.message:
+        chat_id = update.message.chat.id
+        if update.message.text:
+            message_text = update.message.text
+            message_type = "text"
+        elif update.message.voice:
+            started_at = time.perf_counter()
+            message_text = await transcribe_voice_message(
+                update, telegram_service, google_service, openai_service
+            )
+            stage_timings["transcription"] = time.perf_counter() - started_at
+            message_type = "voice"
+        else:
+            logging.info("Unsupported message type.")
+            message_text = "[Unsupported message type]"
+
+    if not chat_id or not message_text or message_type == "unsupported":
+        if chat_id:
+            await telegram_service.send_message(chat_id, "I received your message, but could not process it.")
+        return "received_but_not_processed"
+
+    stream = None
+    try:
+        if settings.RESPONSE_STREAMING_ENABLED:
+            stream = await telegram_service.stream_message(chat_id)
+
+        started_at = time.perf_counter()
+        agent_response = await process_telegram_update(
+            message_text, message_type, on_token=stream.append if stream else None, chat_id=chat_id
+        )
+        stage_timings["agent"] = time.perf_counter() - started_at
+
+        if agent_response:
+            started_at = time.perf_counter()
+            if stream:
+                await stream.finish(agent_response)
+            else:
+                await telegram_service.send_message(chat_id, agent_response)
+            stage_timings["send"] = time.perf_counter() - started_at
+        if stream and stream.first_token_latency is not None:
+            stage_timings["first_visible_token"] = stream.first_token_latency
+        return "ok"
+    except Exception as e:
+        logging.error(f"Error processing Telegram update: {e}", exc_info=True)
+        try:
+            error_text = f"An internal error occurred: {e}"
+            if stream:
+                await stream.finish(error_text)
+            else:
+                await telegram_service.send_message(chat_id, error_text)
+        except Exception as send_error:
+            logging.error(f"Failed to send error message to Telegram: {send_error}", exc_info=True)
+        raise
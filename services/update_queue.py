@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+
+from core.config import settings
+from models.telegram_models import Update
+from services.google_service import GoogleService, get_shared_google_service
+from services.keyed_scheduler import KeyedLock, KeyedScheduler
+from services.openai_service import OpenAIService, get_shared_openai_service
+from services.telegram_service import TelegramService, create_telegram_service
+from services.update_processor import process_update
+from services.update_deduplicator import update_deduplicator
+
+OVERFLOW_POLICIES = ("reject", "drop_oldest", "block")
+
+class QueueFullError(Exception):
+    """
+    Raised when an update cannot be enqueued because the queue is at capacity.
+    """
+
+def update_key(update: Update) -> Hashable:
+    """
+    Serialization key of an update: its chat id, or the update id for updates without a message.
+    """
+    message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
+    return message.chat.id if message else f"update:{update.update_id}"
+
+class LatencyStats:
+    """
+    Running latency statistics (count, total, max) with a bounded window for recent averages.
+    """
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._recent.append(value)
+
+    def snapshot(self) -> Dict[str, float]:
+        recent_avg = sum(self._recent) / len(self._recent) if self._recent else 0.0
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "max_seconds": round(self.max, 6),
+            "recent_avg_seconds": round(recent_avg, 6),
+        }
+
+class UpdateQueue:
+    """
+    In-process work queue that decouples Telegram webhook acknowledgement from update processing.
+    A fixed pool of workers pulls updates from a bounded KeyedScheduler keyed by chat: updates of
+    one chat are processed one at a time in arrival order, different chats in parallel and
+    round-robin. When the queue is full the configured overflow policy decides whether to reject
+    the new update, drop the oldest queued one, or wait (up to a timeout) for space.
+    Updates must be claimed with update_deduplicator.begin() before they are enqueued; workers
+    complete or release the claim once processing finishes.
+    """
+    def __init__(
+        self,
+        max_size: int = settings.UPDATE_QUEUE_MAX_SIZE,
+        workers: int = settings.UPDATE_QUEUE_WORKERS,
+        overflow_policy: str = settings.UPDATE_QUEUE_OVERFLOW_POLICY,
+        enqueue_timeout: float = settings.UPDATE_QUEUE_ENQUEUE_TIMEOUT_SECONDS,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow_policy}. Choose one of {OVERFLOW_POLICIES}.")
+        self.max_size = max_size
+        self.worker_count = workers
+        self.overflow_policy = overflow_policy
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue: Optional[KeyedScheduler[Tuple[Update, float]]] = None
+        self._workers: List[asyncio.Task] = []
+        self._accepting = False
+
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.max_depth_seen = 0
+        self.wait_time = LatencyStats()
+        self.stage_latency: Dict[str, LatencyStats] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self):
+        """
+        Creates the queue and spawns the worker tasks on the running event loop.
+        """
+        if self._accepting:
+            return
+        self._queue = KeyedScheduler(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"update-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        self._accepting = True
+        logging.info(f"Update queue started with {self.worker_count} workers (max_size={self.max_size}, overflow_policy={self.overflow_policy}).")
+
+    async def enqueue(self, update: Update):
+        """
+        Enqueues an update for background processing, applying the overflow policy when full.
+        Raises QueueFullError if the update could not be accepted.
+        """
+        if not self._accepting:
+            raise QueueFullError("Update queue is not accepting new updates.")
+
+        key = update_key(update)
+        item = (update, time.perf_counter())
+        try:
+            self._queue.put_nowait(key, item)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "reject":
+                self.rejected += 1
+                raise QueueFullError(f"Update queue is full ({self.max_size} updates).")
+            elif self.overflow_policy == "drop_oldest":
+                _, (dropped_update, _) = self._queue.pop_oldest_nowait()
+                update_deduplicator.fail(dropped_update.update_id, QueueFullError("Dropped from a full update queue."))
+                self.dropped += 1
+                logging.warning(f"Update queue full, dropping oldest update {dropped_update.update_id}.")
+                self._queue.put_nowait(key, item)
+            else:
+                try:
+                    await asyncio.wait_for(self._queue.put(key, item), timeout=self.enqueue_timeout)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise QueueFullError(f"Timed out waiting for space in the update queue after {self.enqueue_timeout}s.")
+
+        self.enqueued += 1
+        self.max_depth_seen = max(self.max_depth_seen, self._queue.qsize())
+
+    async def _worker(self, worker_id: int):
+        telegram_service = create_telegram_service()
+        google_service = get_shared_google_service()
+        openai_service = get_shared_openai_service()
+
+        while True:
+            key, (update, enqueued_at) = await self._queue.get()
+            self.wait_time.observe(time.perf_counter() - enqueued_at)
+            stage_timings: Dict[str, float] = {}
+            try:
+                status = await process_update(update, telegram_service, google_service, openai_service, stage_timings)
+                update_deduplicator.complete(update.update_id, status)
+                self.processed += 1
+            except Exception as e:
+                update_deduplicator.fail(update.update_id, e)
+                self.failed += 1
+                logging.error(f"Worker {worker_id} failed to process update {update.update_id}: {e}", exc_info=True)
+            finally:
+                for stage, seconds in stage_timings.items():
+                    self.stage_latency.setdefault(stage, LatencyStats()).observe(seconds)
+                self._queue.task_done(key)
+
+    async def stop(self, drain_timeout: float = settings.UPDATE_QUEUE_DRAIN_TIMEOUT_SECONDS):
+        """
+        Stops accepting updates, waits for queued updates to be processed and cancels the workers.
+        """
+        if not self._accepting:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+            logging.info("Update queue drained.")
+        except asyncio.TimeoutError:
+            logging.warning(f"Update queue did not drain within {drain_timeout}s; {self.depth()} updates abandoned.")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._accepting,
+            "workers": self.worker_count,
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "max_depth_seen": self.max_depth_seen,
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "wait_time": self.wait_time.snapshot(),
+            "stage_latency": {stage: stats.snapshot() for stage, stats in self.stage_latency.items()},
+            "chats": self._queue.stats() if self._queue else None,
+        }
+
+async def process_in_chat_order(
+    update: Update,
+    telegram_service: TelegramService,
+    google_service: GoogleService,
+    openai_service: OpenAIService,
+) -> Tuple[Any, bool]:
+    """
+    Processes an update inline ('sync' processing mode): at most once per update_id and one at a
+    time per chat. Returns the status and whether the update was a duplicate.
+    """
+    async def process():
+        async with update_chat_locks.hold(update_key(update)):
+            return await process_update(update, telegram_service, google_service, openai_service)
+
+    return await update_deduplicator.run_once(update.update_id, process)
+
+# Global update queue instance
+update_queue = UpdateQueue()
+
+# Per-chat serialization of updates processed inline ('sync' processing mode)
+update_chat_locks = KeyedLock()
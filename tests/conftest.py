@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Settings are read when core.config is first imported: give the required ones dummy values, and
+# run from a scratch directory so the SQLite files and caches the app creates (and any .env in the
+# working directory) stay out of the way.
+os.environ.setdefault("telegram_token", "test-token")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("GOOGLE_API_KEY", "test-google-key")
+os.environ.setdefault("TELEGRAM_WEBHOOK_URL", "https://bot.example.test/api/v1/telegram/webhook")
+os.environ.setdefault("TELEGRAM_API_BASE_URL", "http://telegram.test")
+os.chdir(tempfile.mkdtemp(prefix="assistant-tests-"))
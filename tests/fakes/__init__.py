@@ -0,0 +1,4 @@
+"""
+In-process fakes of the external services (LLM, Telegram Bot API, Google Calendar, Gmail) used by
+the tests and the benchmarks.
+"""
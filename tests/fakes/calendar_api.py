@@ -0,0 +1,222 @@
+import email.parser
+import itertools
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import httplib2
+
+class FakeCalendarBackend:
+    """
+    In-memory Google Calendar v3 server for googleapiclient, reached through http() objects that
+    stand in for httplib2.Http (pass them as CalendarService(http=...)).
+    Supports events list (pagination, syncToken incremental sync, 410 for expired sync tokens),
+    get, insert, patch and delete on any calendar, freeBusy queries and multipart batch requests.
+    Every HTTP round trip sleeps `latency` seconds and is counted in `round_trips`.
+    Busy blocks of other calendars (e.g. attendees) are set directly in `busy`.
+    """
+    def __init__(self, latency: float = 0.0, page_size: int = 250):
+        self.latency = latency
+        self.page_size = page_size
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.busy: Dict[str, List[Tuple[str, str]]] = {}
+        self.round_trips = 0
+        self.requests: List[Tuple[str, str]] = []
+        self._changed_at: Dict[str, int] = {}
+        self._sequence = 0
+        self._oldest_valid_sync = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def http(self) -> "FakeCalendarHttp":
+        return FakeCalendarHttp(self)
+
+    def add_event(self, summary: str, start: str, end: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Stores an event directly (as if created by another client) and returns it.
+        """
+        with self._lock:
+            return self._store({"summary": summary, "start": {"dateTime": start}, "end": {"dateTime": end}, **fields})
+
+    def delete_event(self, event_id: str):
+        with self._lock:
+            self._cancel(event_id)
+
+    def expire_sync_tokens(self):
+        """
+        Invalidates every sync token handed out so far, like Google does after a while.
+        """
+        with self._lock:
+            self._oldest_valid_sync = self._sequence + 1
+
+    def _touch(self, event_id: str):
+        self._sequence += 1
+        self._changed_at[event_id] = self._sequence
+        self.events[event_id]["updated"] = f"seq-{self._sequence}"
+
+    def _store(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        event_id = event.get("id") or f"evt{next(self._ids)}"
+        event = {
+            **event,
+            "id": event_id,
+            "status": "confirmed",
+            "htmlLink": f"https://calendar.example.test/event?eid={event_id}",
+        }
+        self.events[event_id] = event
+        self._touch(event_id)
+        return event
+
+    def _cancel(self, event_id: str) -> bool:
+        event = self.events.get(event_id)
+        if event is None or event["status"] == "cancelled":
+            return False
+        self.events[event_id] = {"id": event_id, "status": "cancelled"}
+        self._touch(event_id)
+        return True
+
+    @staticmethod
+    def _timestamp(value: Dict[str, Any]) -> float:
+        if "dateTime" in value:
+            return datetime.fromisoformat(value["dateTime"]).timestamp()
+        return datetime.fromisoformat(value["date"]).timestamp()
+
+    def _live_events(self) -> List[Dict[str, Any]]:
+        return [event for event in self.events.values() if event["status"] != "cancelled"]
+
+    def handle(self, method: str, uri: str, body: Optional[str], headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Serves one HTTP request and returns (status, headers, content).
+        """
+        parts = urlsplit(uri)
+        path = [unquote(segment) for segment in parts.path.strip("/").split("/")]
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        payload = json.loads(body) if body and not path[0] == "batch" else None
+        self.requests.append((method, parts.path))
+
+        if path[0] == "batch":
+            return self._batch(body, headers)
+        with self._lock:
+            status, content = self._route(method, path[2:], query, payload)
+        if content is None:
+            return status, {}, b""
+        return status, {"content-type": "application/json; charset=UTF-8"}, json.dumps(content).encode()
+
+    def _route(self, method: str, path: List[str], query: Dict[str, str], payload: Any) -> Tuple[int, Any]:
+        if path == ["freeBusy"] and method == "POST":
+            return 200, self._free_busy(payload)
+        if len(path) >= 3 and path[0] == "calendars" and path[2] == "events":
+            if len(path) == 3:
+                if method == "GET":
+                    return self._list(query)
+                if method == "POST":
+                    return 200, self._store(payload)
+            else:
+                event = self.events.get(path[3])
+                if event is None or event["status"] == "cancelled":
+                    return 404, _error(404, "Not Found")
+                if method == "GET":
+                    return 200, event
+                if method == "PATCH":
+                    event.update(payload)
+                    self._touch(event["id"])
+                    return 200, event
+                if method == "DELETE":
+                    self._cancel(event["id"])
+                    return 204, None
+        return 404, _error(404, f"No fake for {method} {'/'.join(path)}")
+
+    def _list(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        sync_token = query.get("syncToken")
+        if sync_token:
+            since = int(sync_token.split("-", 1)[1])
+            if since < self._oldest_valid_sync:
+                return 410, _error(410, "Sync token is no longer valid, a full sync is required.")
+            changed = sorted((seq, event_id) for event_id, seq in self._changed_at.items() if seq > since)
+            items = [self.events[event_id] for _, event_id in changed]
+        else:
+            items = self._live_events()
+            if "timeMin" in query:
+                time_min = datetime.fromisoformat(query["timeMin"]).timestamp()
+                items = [event for event in items if self._timestamp(event["end"]) > time_min]
+            if "timeMax" in query:
+                time_max = datetime.fromisoformat(query["timeMax"]).timestamp()
+                items = [event for event in items if self._timestamp(event["start"]) < time_max]
+            items.sort(key=lambda event: self._timestamp(event["start"]))
+
+        offset = int(query.get("pageToken", "page-0").split("-", 1)[1])
+        page_size = min(int(query.get("maxResults", 250)), self.page_size)
+        page = items[offset:offset + page_size]
+        response: Dict[str, Any] = {"kind": "calendar#events", "items": page}
+        if offset + page_size < len(items):
+            response["nextPageToken"] = f"page-{offset + page_size}"
+        else:
+            response["nextSyncToken"] = f"sync-{self._sequence}"
+        return 200, response
+
+    def _free_busy(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        window_start = datetime.fromisoformat(payload["timeMin"])
+        window_end = datetime.fromisoformat(payload["timeMax"])
+        calendars = {}
+        for item in payload["items"]:
+            calendar_id = item["id"]
+            if calendar_id == "primary":
+                blocks = [
+                    (event["start"]["dateTime"], event["end"]["dateTime"]) for event in self._live_events()
+                    if "dateTime" in event["start"] and event.get("transparency") != "transparent"
+                ]
+            elif calendar_id in self.busy:
+                blocks = self.busy[calendar_id]
+            else:
+                calendars[calendar_id] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                continue
+            calendars[calendar_id] = {"busy": [
+                {"start": start, "end": end} for start, end in sorted(blocks, key=lambda block: datetime.fromisoformat(block[0]))
+                if datetime.fromisoformat(start) < window_end and datetime.fromisoformat(end) > window_start
+            ]}
+        return {"kind": "calendar#freeBusy", "timeMin": payload["timeMin"], "timeMax": payload["timeMax"], "calendars": calendars}
+
+    def _batch(self, body: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        content_type = headers.get("content-type") or headers.get("Content-Type")
+        message = email.parser.Parser().parsestr(f"Content-Type: {content_type}\r\n\r\n{body}")
+        boundary = "batch_fake_boundary"
+        out = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition("\n")
+            raw_headers, _, part_body = rest.replace("\r\n", "\n").partition("\n\n")
+            method, target, _ = request_line.strip().split(" ", 2)
+            part_headers = dict(line.split(": ", 1) for line in raw_headers.splitlines() if ": " in line)
+            status, response_headers, content = self.handle(
+                method, f"https://www.googleapis.com{target}", part_body or None, part_headers
+            )
+            content_id = part["Content-ID"].strip("<>")
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                + "".join(f"{key}: {value}\r\n" for key, value in response_headers.items())
+                + f"\r\n{content.decode()}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return 200, {"content-type": f"multipart/mixed; boundary={boundary}"}, "".join(out).encode()
+
+class FakeCalendarHttp:
+    """
+    httplib2.Http stand-in bound to a FakeCalendarBackend.
+    """
+    def __init__(self, backend: FakeCalendarBackend):
+        self.backend = backend
+        self.credentials = None
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        if self.backend.latency:
+            time.sleep(self.backend.latency)
+        self.backend.round_trips += 1
+        if isinstance(body, bytes):
+            body = body.decode()
+        status, response_headers, content = self.backend.handle(method, uri, body, headers or {})
+        return httplib2.Response({"status": str(status), **response_headers}), content
+
+def _error(status: int, message: str) -> Dict[str, Any]:
+    return {"error": {"code": status, "message": message, "errors": [{"message": message}]}}
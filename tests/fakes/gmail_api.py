@@ -0,0 +1,197 @@
+import base64
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+def _http_error(status: int, reason: str) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), reason.encode())
+
+class FakeRequest:
+    """
+    A pending API call: execute() sleeps one round trip and returns the response (or raises).
+    """
+    def __init__(self, backend: "FakeGmailBackend", call: Callable[[], Dict[str, Any]]):
+        self.backend = backend
+        self.call = call
+
+    def execute(self) -> Dict[str, Any]:
+        self.backend._round_trip()
+        return self.call()
+
+class FakeBatch:
+    def __init__(self, backend: "FakeGmailBackend"):
+        self.backend = backend
+        self.requests: List[tuple] = []
+
+    def add(self, request: FakeRequest, callback: Callable, request_id: Optional[str] = None):
+        self.requests.append((request, callback))
+
+    def execute(self):
+        self.backend._round_trip()
+        for position, (request, callback) in enumerate(self.requests):
+            try:
+                response = request.call()
+            except HttpError as error:
+                callback(str(position), None, error)
+            else:
+                callback(str(position), response, None)
+
+class FakeGmailBackend:
+    """
+    In-memory Gmail v1 mailbox exposing the part of the googleapiclient service used by GmailSync:
+    users().getProfile, users().messages().list/get, users().history().list and
+    new_batch_http_request(). Every message added gets a new historyId and a messageAdded record.
+    history.list and messages.list are paginated (page_size); expire_history() makes history.list
+    answer 404 for every historyId handed out so far, like Gmail does for old ids.
+    Messages in rate_limited answer 429 once. Every round trip sleeps `latency` seconds and is
+    counted in `round_trips`; the list and history calls are recorded in `requests`.
+    """
+    def __init__(self, latency: float = 0.0, page_size: int = 500, history_id: int = 1000):
+        self.latency = latency
+        self.page_size = page_size
+        self.history_id = history_id
+        self.messages_by_id: Dict[str, Dict[str, Any]] = {}
+        self.history_records: List[Dict[str, Any]] = []
+        self.rate_limited: Set[str] = set()
+        self.round_trips = 0
+        self.requests: List[tuple] = []
+        self._oldest_valid_history_id = 0
+        self._lock = threading.Lock()
+
+    def add_message(
+        self,
+        message_id: str,
+        subject: str,
+        body: str,
+        sender: str = "site.manager@example.com",
+        thread_id: Optional[str] = None,
+        labels: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Delivers a text/plain + text/html message to the inbox and returns it.
+        """
+        with self._lock:
+            self.history_id += 1
+            message = {
+                "id": message_id,
+                "threadId": thread_id or message_id,
+                "labelIds": ["INBOX", *(labels or [])],
+                "snippet": body[:120],
+                "historyId": str(self.history_id),
+                "payload": {
+                    "mimeType": "multipart/alternative",
+                    "headers": [
+                        {"name": "From", "value": sender},
+                        {"name": "Subject", "value": subject},
+                        {"name": "Date", "value": "Mon, 4 Mar 2030 08:00:00 +0100"},
+                    ],
+                    "parts": [
+                        {"mimeType": "text/plain", "body": {"data": _b64(body)}},
+                        {"mimeType": "text/html", "body": {"data": _b64(f"<p>{body}</p>")}},
+                    ],
+                },
+            }
+            self.messages_by_id[message_id] = message
+            self.history_records.append({"id": str(self.history_id), "messagesAdded": [{"message": {"id": message_id}}]})
+            return message
+
+    def expire_history(self):
+        with self._lock:
+            self._oldest_valid_history_id = self.history_id + 1
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.round_trips += 1
+
+    # The googleapiclient surface
+    def users(self) -> "FakeGmailBackend":
+        return self
+
+    def messages(self) -> "FakeMessages":
+        return FakeMessages(self)
+
+    def history(self) -> "FakeHistory":
+        return FakeHistory(self)
+
+    def getProfile(self, userId: str) -> FakeRequest:
+        return FakeRequest(self, lambda: {"emailAddress": "me@example.com", "historyId": str(self.history_id)})
+
+    def new_batch_http_request(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def _page(self, items: List[Any], page_token: Optional[str], max_results: int):
+        start = int(page_token or 0)
+        end = start + min(max_results, self.page_size)
+        return items[start:end], (str(end) if end < len(items) else None)
+
+class FakeMessages:
+    def __init__(self, backend: FakeGmailBackend):
+        self.backend = backend
+
+    def list(self, userId: str, labelIds: List[str], q: str = "", maxResults: int = 100, pageToken: Optional[str] = None) -> FakeRequest:
+        backend = self.backend
+        backend.requests.append(("messages.list", pageToken))
+
+        def call():
+            # Newest first, like Gmail
+            newest_first = sorted(backend.messages_by_id.values(), key=lambda message: int(message["historyId"]), reverse=True)
+            page, next_token = backend._page([{"id": message["id"]} for message in newest_first], pageToken, maxResults)
+            response: Dict[str, Any] = {"messages": page}
+            if next_token:
+                response["nextPageToken"] = next_token
+            return response
+        return FakeRequest(backend, call)
+
+    def get(self, userId: str, id: str, format: str = "full", metadataHeaders: Optional[List[str]] = None) -> FakeRequest:
+        backend = self.backend
+
+        def call():
+            if id in backend.rate_limited:
+                backend.rate_limited.discard(id)
+                raise _http_error(429, "Rate limit exceeded")
+            message = backend.messages_by_id.get(id)
+            if message is None:
+                raise _http_error(404, "Not Found")
+            message = dict(message)
+            if format == "metadata":
+                wanted = {header.lower() for header in metadataHeaders or []}
+                message["payload"] = {
+                    "headers": [header for header in message["payload"]["headers"] if header["name"].lower() in wanted]
+                }
+            return message
+        return FakeRequest(backend, call)
+
+class FakeHistory:
+    def __init__(self, backend: FakeGmailBackend):
+        self.backend = backend
+
+    def list(
+        self,
+        userId: str,
+        startHistoryId: str,
+        historyTypes: Optional[List[str]] = None,
+        labelId: Optional[str] = None,
+        maxResults: int = 100,
+        pageToken: Optional[str] = None,
+    ) -> FakeRequest:
+        backend = self.backend
+        backend.requests.append(("history.list", pageToken))
+
+        def call():
+            if int(startHistoryId) < backend._oldest_valid_history_id:
+                raise _http_error(404, "Requested entity was not found.")
+            records = [record for record in backend.history_records if int(record["id"]) > int(startHistoryId)]
+            page, next_token = backend._page(records, pageToken, maxResults)
+            response: Dict[str, Any] = {"history": page, "historyId": str(backend.history_id)}
+            if next_token:
+                response["nextPageToken"] = next_token
+            return response
+        return FakeRequest(backend, call)
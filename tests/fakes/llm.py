@@ -0,0 +1,95 @@
+import asyncio
+import random
+import re
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+from models.openai_models import EmailBatchAnalysis, EmailBatchEntry
+from services.conversation_memory import estimate_tokens
+
+_DIGEST_EMAIL_PATTERN = re.compile(r"^\[\d+\] From:", re.MULTILINE)
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers after a fixed latency, without any network access.
+    reply is a string or a function of the prompt messages. Every prompt is recorded, and the
+    number of calls in flight at the same time is tracked (peak_in_flight).
+    bind_tools() returns the model itself, so it can stand in for the router model too.
+    """
+    reply: Union[str, Callable[[List[BaseMessage]], str]] = "ok"
+    latency: float = 0.0
+    prompts: List[List[BaseMessage]] = Field(default_factory=list)
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        self.prompts.append(list(messages))
+        text = self.reply(messages) if callable(self.reply) else self.reply
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return self._result(messages)
+
+class FakeDigestModel:
+    """
+    Stands in for the chat model of EmailDigest: with_structured_output() returns a runnable that
+    answers an EmailBatchEntry for every '[i] From:' email of the prompt.
+    A call takes latency seconds plus per_output_token seconds for each token of the answer; with
+    fail_rate the call raises, with omit_rate one entry of a multi-email answer is left out.
+    Calls and (estimated) input/output tokens are counted.
+    """
+    OUTPUT_TOKENS_PER_ENTRY = 45
+
+    def __init__(self, latency: float = 0.0, per_output_token: float = 0.0, fail_rate: float = 0.0, omit_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.per_output_token = per_output_token
+        self.fail_rate = fail_rate
+        self.omit_rate = omit_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def with_structured_output(self, schema: Any) -> RunnableLambda:
+        return RunnableLambda(self._answer)
+
+    async def _answer(self, prompt_value: Any) -> EmailBatchAnalysis:
+        text = "\n".join(str(message.content) for message in prompt_value.to_messages())
+        count = len(_DIGEST_EMAIL_PATTERN.findall(text))
+        output_tokens = self.OUTPUT_TOKENS_PER_ENTRY * count + 10
+        self.calls += 1
+        self.input_tokens += estimate_tokens(text)
+        await asyncio.sleep(self.latency + self.per_output_token * output_tokens)
+        if self.random.random() < self.fail_rate:
+            raise ValueError("Malformed structured output")
+        entries = [
+            EmailBatchEntry(index=index, classification="FYI", summary=f"Summary of email {index}", is_construction_related=True)
+            for index in range(count)
+        ]
+        if count > 1 and self.random.random() < self.omit_rate:
+            entries.pop(self.random.randrange(count))
+        self.output_tokens += output_tokens
+        return EmailBatchAnalysis(entries=entries)
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Union
+from urllib.parse import unquote
+
+import httpx
+import uvicorn
+
+# A fault is an HTTP status code to answer with, an httpx exception to raise before the call
+# reaches the server, or DELIVERED_THEN_TIMEOUT: the call is carried out but its response is lost.
+DELIVERED_THEN_TIMEOUT = "delivered-then-timeout"
+Fault = Union[int, Exception, str]
+
+# Files are downloaded in chunks of this size, like a real streamed response
+FILE_CHUNK_BYTES = 64 * 1024
+
+class FakeTelegramAPI:
+    """
+    In-memory Bot API server: sendMessage, editMessageText, deleteWebhook, getFile, file downloads
+    and long-polling getUpdates. It is reached through transport() (an httpx.MockTransport, no
+    sockets) or served over HTTP by serve().
+    Calls are recorded in `calls`; delivered messages in `messages`. inject() queues faults for a
+    method, and `latency` delays every answer. Over HTTP, a lost response is answered only after
+    `lost_response_delay` seconds, so that the client times out while reading it.
+    """
+    def __init__(self, latency: float = 0.0, lost_response_delay: float = 2.0):
+        self.latency = latency
+        self.lost_response_delay = lost_response_delay
+        self.calls: List[Dict[str, Any]] = []
+        self.messages: List[Dict[str, Any]] = []
+        self.files: Dict[str, bytes] = {}
+        self.updates: List[Dict[str, Any]] = []
+        self._faults: Dict[str, List[Fault]] = defaultdict(list)
+        self._next_message_id = 1
+
+    def inject(self, method: str, *faults: Fault):
+        self._faults[method].extend(faults)
+
+    def add_updates(self, updates: List[Dict[str, Any]]):
+        self.updates.extend(updates)
+
+    def sent_to(self, chat_id: int) -> List[str]:
+        return [message["text"] for message in self.messages if message["chat_id"] == chat_id]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = unquote(request.url.path)
+        if path.startswith("/file/"):
+            file_path = path.split("/", 3)[3]
+            if file_path not in self.files:
+                return httpx.Response(404, json={"ok": False, "error_code": 404, "description": "Not Found"})
+            return httpx.Response(200, content=self._file_chunks(self.files[file_path]))
+
+        method = path.rsplit("/", 1)[-1]
+        payload: Dict[str, Any] = dict(request.url.params)
+        if request.content:
+            payload.update(json.loads(request.content))
+        self.calls.append({"method": method, "payload": payload})
+
+        fault = self._faults[method].pop(0) if self._faults[method] else None
+        if isinstance(fault, Exception):
+            raise fault
+        if isinstance(fault, int):
+            body: Dict[str, Any] = {"ok": False, "error_code": fault, "description": "Injected fault"}
+            if fault == 429:
+                body["parameters"] = {"retry_after": 0.05}
+            return httpx.Response(fault, json=body)
+
+        result = await getattr(self, f"_{method}")(payload)
+        if fault == DELIVERED_THEN_TIMEOUT:
+            raise httpx.ReadTimeout("Injected timeout after delivery", request=request)
+        return httpx.Response(200, json={"ok": True, "result": result})
+
+    async def _file_chunks(self, data: bytes):
+        for offset in range(0, len(data), FILE_CHUNK_BYTES):
+            yield data[offset:offset + FILE_CHUNK_BYTES]
+
+    async def _sendMessage(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        self.messages.append({"message_id": message_id, "chat_id": int(payload["chat_id"]), "text": payload["text"]})
+        return {"message_id": message_id, "chat": {"id": int(payload["chat_id"])}, "text": payload["text"]}
+
+    async def _editMessageText(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        for message in self.messages:
+            if message["message_id"] == int(payload["message_id"]):
+                message["text"] = payload["text"]
+        return {"message_id": int(payload["message_id"]), "text": payload["text"]}
+
+    async def _deleteWebhook(self, payload: Dict[str, Any]) -> bool:
+        return True
+
+    async def _getFile(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        file_path = f"voice/{payload['file_id']}.oga"
+        return {"file_id": payload["file_id"], "file_path": file_path, "file_size": len(self.files.get(file_path, b""))}
+
+    async def _getUpdates(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(payload.get("offset", 0))
+        limit = int(payload.get("limit", 100))
+        deadline = time.monotonic() + float(payload.get("timeout", 0))
+        while True:
+            pending = [update for update in self.updates if update["update_id"] >= offset][:limit]
+            if pending or time.monotonic() >= deadline:
+                return pending
+            await asyncio.sleep(0.01)
+
+    def asgi_app(self):
+        """
+        The fake as an ASGI app, to be served by uvicorn on a local port.
+        """
+        async def app(scope, receive, send):
+            body = b""
+            while True:
+                event = await receive()
+                body += event.get("body", b"")
+                if not event.get("more_body"):
+                    break
+            query = scope["query_string"].decode()
+            request = httpx.Request(
+                scope["method"], f"http://fake{scope['path']}" + (f"?{query}" if query else ""), content=body
+            )
+            try:
+                response = await self.handle(request)
+                await response.aread()
+            except httpx.TransportError:
+                # A lost response: answer too late for the client
+                await asyncio.sleep(self.lost_response_delay)
+                response = httpx.Response(504, json={"ok": False, "error_code": 504, "description": "Lost response"})
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(b"content-type", response.headers.get("content-type", "application/json").encode())],
+            })
+            await send({"type": "http.response.body", "body": response.content})
+        return app
+
+@contextmanager
+def serve(api: FakeTelegramAPI) -> Iterator[str]:
+    """
+    Serves api over HTTP with uvicorn on a free local port, in a background thread. Yields the base URL.
+    """
+    with serve_asgi(api.asgi_app()) as base_url:
+        yield base_url
+
+def _server(app: Any) -> "tuple[uvicorn.Server, socket.socket]":
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return uvicorn.Server(uvicorn.Config(app, lifespan="off", log_level="warning", timeout_graceful_shutdown=1)), sock
+
+@asynccontextmanager
+async def serve_in_loop(app: Any) -> AsyncIterator[str]:
+    """
+    Serves an ASGI app (without its lifespan) with uvicorn on a free local port, on the running
+    event loop, so that it can share asyncio objects with the caller. Yields the base URL.
+    """
+    server, sock = _server(app)
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        await task
+        sock.close()
+
+@contextmanager
+def serve_asgi(app: Any) -> Iterator[str]:
+    """
+    Serves an ASGI app (without its lifespan) with uvicorn on a free local port, in a background thread.
+    Yields the base URL.
+    """
+    server, sock = _server(app)
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        sock.close()
+
+def text_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    """
+    A Telegram update carrying a private text message.
+    """
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Tester"},
+            "chat": {"id": chat_id, "type": "private"},
+            "date": int(time.time()),
+            "text": text,
+        },
+    }
@@ -0,0 +1,143 @@
+"""
+Calendar tools against a FakeCalendarBackend, with relative dates as the LLM passes them.
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import core.tools
+from core.config import settings
+from services.calendar_mirror import CalendarMirror
+from services.calendar_service import CalendarService, CalendarServicePool
+from tests.conftest import ROOT
+from tests.fakes.calendar_api import FakeCalendarBackend
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = FakeCalendarBackend()
+    monkeypatch.setattr(settings, "WORKING_DAYS", [0, 1, 2, 3, 4, 5, 6])
+    monkeypatch.setattr(core.tools, "get_calendar_service", lambda: CalendarService(mirror=None, http=backend.http()))
+    return backend
+
+def _tomorrow_at(hour: int) -> datetime:
+    tz = ZoneInfo(settings.CALENDAR_TIMEZONE)
+    tomorrow = datetime.now(tz).date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, hour, tzinfo=tz)
+
+def test_find_available_slots_accepts_relative_dates(backend):
+    backend.add_event("Site inspection", _tomorrow_at(8).isoformat(), _tomorrow_at(10).isoformat())
+    backend.busy["foreman@example.com"] = [(_tomorrow_at(10).isoformat(), _tomorrow_at(11).isoformat())]
+
+    result = core.tools.find_available_slots("tomorrow", duration_minutes=60, attendees=["foreman@example.com"])
+
+    assert result["status"] == "success", result
+    assert datetime.fromisoformat(result["slots"][0]) == _tomorrow_at(11)
+    assert all(_tomorrow_at(0) <= datetime.fromisoformat(slot) < _tomorrow_at(0) + timedelta(days=7) for slot in result["slots"])
+
+def test_schedule_appointment_accepts_relative_dates(backend):
+    result = core.tools.schedule_appointment("Crane delivery", "tomorrow", "14:30", 45)
+
+    assert result["status"] == "success", result
+    event = backend.events[result["event_id"]]
+    assert datetime.fromisoformat(event["start"]["dateTime"]) == _tomorrow_at(14) + timedelta(minutes=30)
+    assert datetime.fromisoformat(event["end"]["dateTime"]) == _tomorrow_at(15) + timedelta(minutes=15)
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = CalendarMirror(path=str(tmp_path / "calendar_mirror.sqlite3"))
+    yield mirror
+    mirror.close()
+
+def _list_calls(backend: FakeCalendarBackend) -> int:
+    return sum(1 for method, path in backend.requests if method == "GET" and path.endswith("/events"))
+
+def test_mirror_syncs_all_pages_then_only_changes(mirror):
+    backend = FakeCalendarBackend(page_size=3)
+    service = CalendarService(mirror=None, http=backend.http())
+    events = [
+        backend.add_event(f"Meeting {i}", _tomorrow_at(8 + i).isoformat(), _tomorrow_at(9 + i).isoformat())
+        for i in range(7)
+    ]
+
+    assert mirror.sync(service.service) == 7
+    assert _list_calls(backend) == 3
+
+    backend.add_event("Late meeting", _tomorrow_at(17).isoformat(), _tomorrow_at(18).isoformat())
+    service.reschedule_event(events[0]["id"], _tomorrow_at(19).isoformat(), _tomorrow_at(20).isoformat())
+    backend.delete_event(events[1]["id"])
+
+    assert mirror.sync(service.service) == 3
+    summaries = [event["summary"] for event in mirror.events_between(_tomorrow_at(0), _tomorrow_at(23))]
+    assert summaries == ["Meeting 2", "Meeting 3", "Meeting 4", "Meeting 5", "Meeting 6", "Late meeting", "Meeting 0"]
+
+def test_expired_sync_token_falls_back_to_a_full_sync(mirror):
+    backend = FakeCalendarBackend()
+    service = CalendarService(mirror=None, http=backend.http())
+    kept = backend.add_event("Kept", _tomorrow_at(9).isoformat(), _tomorrow_at(10).isoformat())
+    dropped = backend.add_event("Dropped", _tomorrow_at(11).isoformat(), _tomorrow_at(12).isoformat())
+    mirror.sync(service.service)
+
+    backend.delete_event(dropped["id"])
+    backend.expire_sync_tokens()
+
+    assert mirror.sync(service.service) == 1
+    assert [event["id"] for event in mirror.events_between(_tomorrow_at(0), _tomorrow_at(23))] == [kept["id"]]
+
+def test_list_appointments_for_tomorrow_is_served_from_the_mirror(monkeypatch, mirror):
+    backend = FakeCalendarBackend()
+    backend.add_event("Concrete pour", _tomorrow_at(9).isoformat(), _tomorrow_at(11).isoformat())
+    backend.add_event("Next day", (_tomorrow_at(9) + timedelta(days=1)).isoformat(), (_tomorrow_at(10) + timedelta(days=1)).isoformat())
+    service = CalendarService(mirror=mirror, http=backend.http())
+    monkeypatch.setattr(core.tools, "get_calendar_service", lambda: service)
+
+    first = core.tools.list_appointments("tomorrow")
+    second = core.tools.list_appointments("tomorrow")
+
+    assert first["status"] == "success", first
+    assert [event["summary"] for event in first["events"]] == ["Concrete pour"]
+    assert second["events"] == first["events"]
+    # The second read is answered locally: the mirror is still fresh
+    assert _list_calls(backend) == 1
+
+def test_batched_writes_take_one_round_trip_and_update_the_mirror(mirror):
+    backend = FakeCalendarBackend()
+    service = CalendarService(mirror=mirror, http=backend.http())
+    existing = backend.add_event("Handover", _tomorrow_at(15).isoformat(), _tomorrow_at(16).isoformat())
+    requests = [
+        service.create_event_request(f"Visit {i}", _tomorrow_at(9 + i).isoformat(), _tomorrow_at(10 + i).isoformat(), [])
+        for i in range(3)
+    ]
+    requests.append(service.reschedule_event_request(existing["id"], _tomorrow_at(16).isoformat(), _tomorrow_at(17).isoformat()))
+    round_trips = backend.round_trips
+
+    results = service.execute_batch(requests)
+
+    assert backend.round_trips == round_trips + 1
+    assert [error for _, error in results] == [None] * 4
+    assert [event["summary"] for event in mirror.events_between(_tomorrow_at(0), _tomorrow_at(23))] == [
+        "Visit 0", "Visit 1", "Visit 2", "Handover",
+    ]
+    assert mirror.get_event(existing["id"])["start"]["dateTime"] == _tomorrow_at(16).isoformat()
+
+def test_token_refresh_is_scheduled_before_the_naive_utc_expiry():
+    pool = CalendarServicePool(refresh_margin_seconds=300)
+    # google-auth keeps expiry as a naive UTC datetime
+    expiry = (datetime.now(timezone.utc) + timedelta(hours=1)).replace(tzinfo=None)
+    pool._creds = Credentials(token="access-token", expiry=expiry)
+
+    assert 3290 < pool._seconds_until_refresh() <= 3300
+
+    pool._creds = Credentials(token="access-token", expiry=expiry - timedelta(hours=2))
+    assert pool._seconds_until_refresh() == 0.0
+
+def test_importing_the_app_opens_no_database(tmp_path):
+    subprocess.run([sys.executable, "-c", "import main"], cwd=tmp_path, env={**os.environ, "PYTHONPATH": ROOT}, check=True)
+
+    # The calendar mirror and the issue tracker open their SQLite files on first use
+    assert not (tmp_path / settings.CALENDAR_MIRROR_PATH).exists()
+    assert list(tmp_path.glob("*.sqlite3")) == []
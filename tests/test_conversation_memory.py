@@ -0,0 +1,77 @@
+"""
+Conversation memory stays bounded however long a chat runs, with a stub LLM writing the summaries.
+"""
+import asyncio
+
+import pytest
+
+from services.conversation_memory import ConversationMemory, estimate_tokens
+from tests.fakes.llm import FakeChatModel
+
+BUDGET = 300
+SUMMARY_MAX_TOKENS = 80
+MAX_MESSAGES = 12
+
+@pytest.fixture(params=["memory", "sqlite"])
+def memory(request, tmp_path):
+    memory = ConversationMemory(
+        backend=request.param,
+        sqlite_path=str(tmp_path / "conversation_memory.sqlite3"),
+        max_messages=MAX_MESSAGES,
+        history_token_budget=BUDGET,
+        summary_max_tokens=SUMMARY_MAX_TOKENS,
+    )
+    yield memory
+    asyncio.run(memory.aclose())
+
+def _context_tokens(memory: ConversationMemory, chat_id: int) -> int:
+    return sum(estimate_tokens(message.content) for message in memory.get_context(chat_id))
+
+def _run_chat(memory: ConversationMemory, llm: FakeChatModel, turns: int, message_length: int, drain_every: int = 1):
+    """
+    Feeds turns exchanges through the memory, letting pending summaries finish every drain_every
+    turns, and returns the largest context size seen.
+    """
+    async def chat():
+        largest = 0
+        for turn in range(turns):
+            memory.record_turn(1, f"question {turn} " + "q" * message_length, f"answer {turn} " + "a" * message_length, llm)
+            if turn % drain_every == 0:
+                await asyncio.gather(*memory._tasks)
+            largest = max(largest, _context_tokens(memory, 1))
+        await asyncio.gather(*memory._tasks)
+        return largest
+    return asyncio.run(chat())
+
+def test_context_stays_within_budget_plus_summary(memory):
+    # A verbose summarizer: its output must still be capped at summary_max_tokens
+    llm = FakeChatModel(reply="the user asked many questions " * 100)
+
+    largest = _run_chat(memory, llm, turns=200, message_length=150, drain_every=3)
+
+    assert largest <= BUDGET + SUMMARY_MAX_TOKENS
+    assert memory.summaries > 0
+    assert memory.messages_dropped == 0
+
+def test_short_messages_are_folded_before_they_fall_out_of_the_buffer(memory):
+    llm = FakeChatModel(reply="summary")
+
+    _run_chat(memory, llm, turns=60, message_length=5)
+
+    # Every message was either summarized or is still in the buffer
+    summarized = "\n".join(prompt[-1].content for prompt in llm.prompts)
+    _, remaining = memory._backend.load(1)
+    kept = {content for _, _, content in remaining}
+    for turn in range(60):
+        question = f"question {turn} " + "q" * 5
+        assert question in kept or question in summarized
+    assert memory.messages_dropped == 0
+
+def test_failing_summaries_drop_the_oldest_messages_and_count_them(memory):
+    llm = FakeChatModel(reply=lambda messages: 1 / 0)
+
+    largest = _run_chat(memory, llm, turns=40, message_length=5)
+
+    assert memory.summary_failures > 0
+    assert memory.messages_dropped == 40 * 2 - MAX_MESSAGES
+    assert largest <= BUDGET
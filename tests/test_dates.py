@@ -0,0 +1,38 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from utils.dates import parse_datetime
+
+TZ = ZoneInfo("Europe/Rome")
+# A Friday
+NOW = datetime(2026, 10, 16, 9, 30, tzinfo=TZ)
+
+@pytest.mark.parametrize("text, expected", [
+    ("today 14:00", datetime(2026, 10, 16, 14, 0)),
+    ("tomorrow", datetime(2026, 10, 17)),
+    ("tomorrow 3pm", datetime(2026, 10, 17, 15, 0)),
+    ("the day after tomorrow at 09:30", datetime(2026, 10, 18, 9, 30)),
+    ("yesterday", datetime(2026, 10, 15)),
+    ("Monday 10:00", datetime(2026, 10, 19, 10, 0)),
+    ("next Monday", datetime(2026, 10, 19)),
+    ("this Friday", datetime(2026, 10, 16)),
+    ("next Friday", datetime(2026, 10, 23)),
+    ("in 3 days", datetime(2026, 10, 19)),
+    ("in two weeks", datetime(2026, 10, 30)),
+    ("next week", datetime(2026, 10, 19)),
+    ("July 25th 10:00", datetime(2026, 7, 25, 10, 0)),
+])
+def test_relative_and_absolute_dates_are_resolved_against_now(text, expected):
+    assert parse_datetime(text, TZ, NOW) == expected.replace(tzinfo=TZ)
+
+def test_explicit_offsets_are_kept():
+    parsed = parse_datetime("2026-11-02T10:00:00+00:00", TZ, NOW)
+
+    assert parsed.utcoffset().total_seconds() == 0
+    assert parsed.hour == 10
+
+def test_text_without_a_date_is_rejected():
+    with pytest.raises(ValueError):
+        parse_datetime("whenever suits you", TZ, NOW)
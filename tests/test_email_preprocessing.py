@@ -0,0 +1,116 @@
+"""
+The cleaning regexes of utils.email_preprocessing: what is cut as quoted history, signature or
+boilerplate, and what must be kept.
+"""
+import pytest
+
+from utils.email_preprocessing import (
+    ContentDeduplicator,
+    clean_email_text,
+    html_to_text,
+    strip_boilerplate,
+    strip_quoted_history,
+    strip_signature,
+)
+
+REPLY = "The pour is confirmed for Thursday."
+
+@pytest.mark.parametrize("header", [
+    "On Mon, 3 Mar 2025 at 10:02, Marco Rossi <marco@example.it> wrote:",
+    "On Mon, 3 Mar 2025 at 10:02, Marco Rossi <\nmarco@example.it> wrote:",
+    "On 3 Mar 2025, at 10:02, Marco Rossi <marco@example.it> wrote:",
+    "On Monday at 10:02 Marco Rossi wrote:",
+    "Il giorno lun 3 mar 2025 alle ore 10:02 Marco Rossi <marco@example.it> ha scritto:",
+    "Le lun. 3 mars 2025 à 10:02, Marco Rossi <marco@example.it> a écrit :",
+    "Am Mo., 3. März 2025 um 10:02 Uhr schrieb Marco Rossi <marco@example.it>:",
+    "-----Original Message-----\nFrom: Marco Rossi",
+    "---------- Forwarded message ---------\nFrom: Marco Rossi",
+    "________________________________\nFrom: Marco Rossi",
+    "From: Marco Rossi <marco@example.it>\nSent: Monday, March 3, 2025 10:02",
+])
+def test_quoted_history_is_cut_at_the_reply_header(header):
+    text = f"{REPLY}\n\n{header}\nThe old message with the old plan.\n> and older quotes"
+    assert strip_quoted_history(text).strip() == REPLY
+
+@pytest.mark.parametrize("line", [
+    "On 3 May the engineer wrote: the slab needs another week to cure.",
+    "On site 4 the foreman wrote: all clear for the crane.",
+    "On 3 May 2025 the engineer wrote: the slab needs another week to cure.",
+    "On Monday the engineer wrote:",
+])
+def test_ordinary_lines_starting_with_on_are_kept(line):
+    # Only a line ending in 'wrote:' and carrying a year or a time is an attribution header
+    text = f"{REPLY}\n{line}\nPlease plan the formwork accordingly."
+    assert strip_quoted_history(text) == text
+
+def test_inline_quotes_are_collapsed():
+    text = "> Can you come on Friday?\n> At 9?\nYes, at 9.\n> And the crane?\nBooked."
+    assert strip_quoted_history(text) == "[...]\nYes, at 9.\n[...]\nBooked."
+
+def test_signature_after_valediction_is_cut():
+    text = f"{REPLY}\n\nBest regards,\nMarco Rossi\nSite Manager | Rossi Costruzioni\nTel +39 02 1234 5678"
+    assert strip_signature(text).strip() == REPLY
+
+def test_valediction_followed_by_content_is_kept():
+    text = "Thanks,\n" + "\n".join(f"Item {index}: rebar bundle {index} delivered to the north gate." for index in range(12))
+    assert strip_signature(text) == text
+
+@pytest.mark.parametrize("text", [
+    "Hi Marco,\n\nThanks!\n\nThe concrete delivery moved to Tuesday 8am, please confirm…",
+    "Thank you.\nThe inspector found cracks in slab B2; we must stop pouring until Monday.",
+    "Best,\nthe crane is booked for Friday",
+    "Kind regards,\nThe scaffolding inspection failed, nobody may climb above level 3 until it is fixed.",
+])
+def test_short_body_after_greeting_or_thanks_is_kept(text):
+    assert clean_email_text(text) == text
+
+def test_bare_valediction_cuts_only_a_short_signature():
+    assert strip_signature(f"{REPLY}\n\nThanks!\nMarco").strip() == REPLY
+    signature = "Marco Rossi\nSite Manager\nRossi Costruzioni S.r.l.\nVia Roma 12, Milano\nTel +39 02 1234 5678"
+    # A formal closing may be followed by a longer signature, a bare 'Thanks' may not
+    assert strip_signature(f"{REPLY}\n\nKind regards,\n{signature}").strip() == REPLY
+    assert strip_signature(f"{REPLY}\n\nThanks,\n{signature}") == f"{REPLY}\n\nThanks,\n{signature}"
+
+def test_signature_before_a_disclaimer_is_cut():
+    text = (
+        f"{REPLY}\n\nBest regards,\nMarco Rossi\nwww.rossicostruzioni.it\n\n"
+        "CONFIDENTIALITY NOTICE: This email and any attachments are confidential and intended solely for the addressee."
+    )
+    assert clean_email_text(text) == REPLY
+
+def test_delimiter_and_mobile_signatures_are_cut():
+    assert strip_signature(f"{REPLY}\n-- \nMarco").strip() == REPLY
+    assert strip_signature(f"{REPLY}\nSent from my iPhone").strip() == REPLY
+
+def test_disclaimer_paragraphs_are_dropped():
+    text = (
+        f"{REPLY}\n\nCONFIDENTIALITY NOTICE: This email and any attachments are confidential."
+        "\n\nTo unsubscribe from these emails click here."
+    )
+    assert strip_boilerplate(text).strip() == REPLY
+
+def test_html_is_converted_without_quotes_and_styles():
+    markup = (
+        "<html><head><style>p{color:red}</style></head><body><p>Pour on <b>Thursday</b> &amp; Friday.</p>"
+        "<div class=\"gmail_quote\"><blockquote>Old plan</blockquote></div></body></html>"
+    )
+    assert html_to_text(markup).strip() == "Pour on Thursday & Friday."
+
+def test_clean_email_text_keeps_only_the_new_content():
+    text = (
+        "Hi,\r\n\r\nThe pour is confirmed for Thursday.\r\n\r\nBest regards,\r\nMarco\r\n\r\n"
+        "On Mon, 3 Mar 2025 at 10:02, Giulia <giulia@example.it> wrote:\r\n> When is the pour?"
+    )
+    assert clean_email_text(text) == "Hi,\n\nThe pour is confirmed for Thursday."
+
+def test_deduplicator_drops_repeated_paragraphs_within_a_thread():
+    update = "The crane inspection for site 4 is scheduled for Friday at 8am."
+    deduplicator = ContentDeduplicator()
+
+    assert deduplicator.dedupe(f"Hi all,\n\n{update}", "t1") == f"Hi all,\n\n{update}"
+    assert deduplicator.dedupe(f"Ok.\n\n{update}", "t1") == "Ok."
+    # Other threads keep their paragraphs; an identical whole message is emptied
+    assert deduplicator.dedupe(f"Fyi\n\n{update}", "t2") == f"Fyi\n\n{update}"
+    assert deduplicator.dedupe(f"Hi all,\n\n{update}", "t3") == ""
+    assert deduplicator.stats()["duplicate_paragraphs"] == 1
+    assert deduplicator.stats()["duplicate_messages"] == 1
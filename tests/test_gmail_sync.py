@@ -0,0 +1,183 @@
+"""
+Incremental Gmail sync against a FakeGmailBackend: history.list pagination, the full resync when
+Gmail no longer knows the stored historyId, and the daily summary job only committing the
+historyId once the report has been delivered. Without a stored token the job fails fast instead
+of starting the interactive OAuth flow.
+"""
+import asyncio
+import json
+
+import pytest
+
+import services.email_digest
+import services.gmail_service
+from core.config import settings
+from services.email_digest import EmailDigest
+from services.gmail_service import GmailNotAuthorizedError, GmailSync, GmailSyncState, get_gmail_service, process_and_summarize_emails
+from tests.fakes.gmail_api import FakeGmailBackend
+from tests.fakes.llm import FakeDigestModel
+
+@pytest.fixture
+def state(tmp_path):
+    state = GmailSyncState(str(tmp_path / "gmail_sync.sqlite3"))
+    yield state
+    state.close()
+
+def _deliver(backend: FakeGmailBackend, first: int, count: int):
+    for index in range(first, first + count):
+        backend.add_message(f"m{index:03d}", f"Pour schedule {index}", f"Concrete pour at site {index} moved to Thursday.")
+
+class FakeTelegramService:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str, merge: bool = True):
+        if self.fail:
+            raise RuntimeError("Telegram is unreachable")
+        self.sent.append((chat_id, text))
+        return len(self.sent)
+
+def test_first_sync_lists_the_recent_inbox_oldest_first(state):
+    backend = FakeGmailBackend(page_size=4)
+    _deliver(backend, 0, 10)
+    sync = GmailSync(backend, state)
+
+    message_ids, history_id = sync.list_new_message_ids()
+
+    assert message_ids == [f"m{index:03d}" for index in range(10)]
+    assert history_id == str(backend.history_id)
+    assert backend.requests == [("messages.list", None), ("messages.list", "4"), ("messages.list", "8")]
+
+def test_history_list_is_paginated(state):
+    backend = FakeGmailBackend(page_size=3)
+    _deliver(backend, 0, 2)
+    state.set_history_id("me", str(backend.history_id))
+    _deliver(backend, 2, 7)
+    sync = GmailSync(backend, state)
+
+    message_ids, history_id = sync.list_new_message_ids()
+
+    assert message_ids == [f"m{index:03d}" for index in range(2, 9)]
+    assert history_id == str(backend.history_id)
+    assert backend.requests == [("history.list", None), ("history.list", "3"), ("history.list", "6")]
+    assert sync.stats()["list_pages"] == 3
+
+def test_expired_history_id_falls_back_to_a_full_sync(state):
+    backend = FakeGmailBackend()
+    _deliver(backend, 0, 3)
+    state.set_history_id("me", str(backend.history_id))
+    backend.expire_history()
+    _deliver(backend, 3, 2)
+    sync = GmailSync(backend, state)
+
+    message_ids, history_id = sync.list_new_message_ids()
+
+    assert [method for method, _ in backend.requests] == ["history.list", "messages.list"]
+    # Everything within the lookback is summarized again rather than silently skipped
+    assert message_ids == [f"m{index:03d}" for index in range(5)]
+    assert history_id == str(backend.history_id)
+
+def test_rate_limited_messages_are_retried_in_the_next_batch(state, monkeypatch):
+    monkeypatch.setattr(services.gmail_service, "BATCH_RETRY_BASE_DELAY_SECONDS", 0)
+    backend = FakeGmailBackend()
+    _deliver(backend, 0, 6)
+    backend.rate_limited.update({"m001", "m004"})
+    sync = GmailSync(backend, state, batch_size=10)
+
+    messages = sync.fetch_messages([f"m{index:03d}" for index in range(6)])
+
+    assert [message.id for message in messages] == [f"m{index:03d}" for index in range(6)]
+    assert all(message.body for message in messages)
+    assert sync.stats()["batch_retried"] == 2
+    assert sync.stats()["fetch_failures"] == 0
+
+def test_forwarded_copy_is_summarized_from_its_snippet(state):
+    backend = FakeGmailBackend()
+    body = "The scaffolding on the north side fails inspection until the new anchors are installed."
+    backend.add_message("m000", "Scaffolding inspection", body, thread_id="t1")
+    backend.add_message("m001", "Fwd: Scaffolding inspection", body, thread_id="t2")
+    sync = GmailSync(backend, state)
+
+    original, copy = sync.fetch_messages(["m000", "m001"])
+
+    assert original.body == body
+    assert copy.body is None
+    # The copy still gets its content, not a placeholder, in the digest prompt
+    assert EmailDigest(FakeDigestModel())._render(copy).endswith(f"\n{copy.snippet}")
+    assert copy.snippet
+
+@pytest.fixture
+def summary_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = FakeGmailBackend()
+    monkeypatch.setattr(settings, "telegram_chat_id", "42")
+    monkeypatch.setattr(services.gmail_service, "get_gmail_service", lambda: backend)
+    monkeypatch.setattr(services.email_digest, "get_llm_model", FakeDigestModel)
+    return backend
+
+def _stored_history_id():
+    state = GmailSyncState()
+    try:
+        return state.get_history_id("me")
+    finally:
+        state.close()
+
+def test_history_id_is_committed_only_after_the_summary_is_sent(summary_job):
+    backend = summary_job
+    _deliver(backend, 0, 3)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(process_and_summarize_emails(FakeTelegramService(fail=True)))
+    assert _stored_history_id() is None
+
+    telegram = FakeTelegramService()
+    asyncio.run(process_and_summarize_emails(telegram))
+    assert _stored_history_id() == str(backend.history_id)
+    assert telegram.sent[0][0] == 42
+    assert "(3 emails)" in telegram.sent[0][1]
+
+    # A failed incremental run is repeated in full by the next one
+    _deliver(backend, 3, 2)
+    committed = _stored_history_id()
+    with pytest.raises(RuntimeError):
+        asyncio.run(process_and_summarize_emails(FakeTelegramService(fail=True)))
+    assert _stored_history_id() == committed
+
+    telegram = FakeTelegramService()
+    asyncio.run(process_and_summarize_emails(telegram))
+    assert "(2 emails)" in telegram.sent[0][1]
+    assert "Pour schedule 3" in telegram.sent[0][1] and "Pour schedule 4" in telegram.sent[0][1]
+    assert _stored_history_id() == str(backend.history_id)
+
+@pytest.fixture
+def no_oauth_flow(tmp_path, monkeypatch):
+    def run_flow(*args, **kwargs):
+        raise AssertionError("the interactive OAuth flow was started")
+    monkeypatch.setattr(services.gmail_service.InstalledAppFlow, "from_client_secrets_file", run_flow)
+    monkeypatch.setattr(settings, "GMAIL_TOKEN_FILE", str(tmp_path / "gmail_token.json"))
+    return tmp_path / "gmail_token.json"
+
+def test_missing_token_fails_fast_without_oauth_flow(no_oauth_flow):
+    with pytest.raises(GmailNotAuthorizedError, match="python -m services.gmail_service"):
+        get_gmail_service()
+
+def test_token_without_refresh_token_fails_fast(no_oauth_flow):
+    no_oauth_flow.write_text(json.dumps({
+        "token": "expired-access-token",
+        "client_id": "client-id",
+        "client_secret": "client-secret",
+        "expiry": "2020-01-01T00:00:00Z",
+    }))
+    with pytest.raises(GmailNotAuthorizedError):
+        get_gmail_service()
+
+def test_summary_job_without_token_does_not_block(no_oauth_flow, monkeypatch):
+    monkeypatch.setattr(settings, "telegram_chat_id", "42")
+    telegram = FakeTelegramService()
+    with pytest.raises(GmailNotAuthorizedError):
+        asyncio.run(asyncio.wait_for(process_and_summarize_emails(telegram), timeout=5))
+    assert telegram.sent == []
+
+def test_email_summary_is_disabled_by_default():
+    assert type(settings).model_fields["EMAIL_SUMMARY_ENABLED"].default is False
@@ -0,0 +1,118 @@
+"""
+Google voice transcription against a fake SpeechAsyncClient and a FakeTelegramAPI: which
+recognition method a note of a given duration uses, streaming of the download, and Google API
+errors reported as a TranscriptionError.
+"""
+import asyncio
+import os
+
+import httpx
+import pytest
+from google.api_core.exceptions import OutOfRange
+from google.cloud import speech
+
+from core.config import settings
+from models.telegram_models import Voice
+from services.google_service import STREAMING_CHUNK_BYTES, GoogleService
+from services.telegram_service import TelegramService
+from services.update_processor import TranscriptionError, _download_and_transcribe
+from tests.fakes.telegram_api import FakeTelegramAPI
+
+def _result(transcript: str, is_final: bool = True) -> speech.StreamingRecognitionResult:
+    return speech.StreamingRecognitionResult(
+        alternatives=[speech.SpeechRecognitionAlternative(transcript=transcript)], is_final=is_final
+    )
+
+class FakeOperation:
+    def __init__(self, response):
+        self.response = response
+
+    async def result(self, timeout=None):
+        return self.response
+
+class FakeSpeechClient:
+    """
+    Records what each recognition method received; streaming answers with one interim and one
+    final result per segment, after it has consumed all requests.
+    """
+    def __init__(self, segments=("Pour on Thursday", "bring the pump"), error=None):
+        self.segments = segments
+        self.error = error
+        self.calls = []
+        self.stream_requests = []
+
+    async def recognize(self, config, audio):
+        self.calls.append("recognize")
+        return speech.RecognizeResponse(results=[speech.SpeechRecognitionResult(
+            alternatives=[speech.SpeechRecognitionAlternative(transcript=" ".join(self.segments))]
+        )])
+
+    async def long_running_recognize(self, config, audio):
+        self.calls.append("long_running_recognize")
+        if self.error:
+            raise self.error
+        return FakeOperation(speech.LongRunningRecognizeResponse(results=[speech.SpeechRecognitionResult(
+            alternatives=[speech.SpeechRecognitionAlternative(transcript=segment)]
+        ) for segment in self.segments]))
+
+    async def streaming_recognize(self, requests):
+        self.calls.append("streaming_recognize")
+        async for request in requests:
+            self.stream_requests.append(request)
+
+        async def responses():
+            for segment in self.segments:
+                yield speech.StreamingRecognizeResponse(results=[_result(segment[:4], is_final=False)])
+                yield speech.StreamingRecognizeResponse(results=[_result(segment)])
+            if self.error:
+                raise self.error
+        return responses()
+
+@pytest.fixture
+def google(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "google")
+    client = FakeSpeechClient()
+    monkeypatch.setattr(GoogleService, "_client", client)
+    return client
+
+def _transcribe(client: FakeSpeechClient, duration: int, audio: bytes):
+    telegram = FakeTelegramAPI()
+    telegram.files["voice/note.oga"] = audio
+    voice = Voice(file_id="note", file_unique_id="note-unique", duration=duration, file_size=len(audio))
+
+    async def run():
+        async with httpx.AsyncClient(transport=telegram.transport()) as http_client:
+            return await _download_and_transcribe(voice, TelegramService(http_client), GoogleService(), None)
+    return asyncio.run(run())
+
+def test_long_note_is_streamed_in_chunks(google):
+    audio = os.urandom(3 * STREAMING_CHUNK_BYTES + 100)
+
+    text = _transcribe(google, settings.GOOGLE_STREAMING_THRESHOLD_SECONDS + 10, audio)
+
+    assert text == "Pour on Thursday bring the pump"
+    assert google.calls == ["streaming_recognize"]
+    config_request, *audio_requests = google.stream_requests
+    assert config_request.streaming_config.config.encoding == speech.RecognitionConfig.AudioEncoding.OGG_OPUS
+    assert all(len(request.audio_content) <= STREAMING_CHUNK_BYTES for request in audio_requests)
+    assert b"".join(request.audio_content for request in audio_requests) == audio
+
+def test_short_note_uses_synchronous_recognition(google):
+    assert _transcribe(google, 5, b"ogg") == "Pour on Thursday bring the pump"
+    assert google.calls == ["recognize"]
+
+def test_note_beyond_a_streaming_session_uses_long_running_recognition(google):
+    text = _transcribe(google, settings.GOOGLE_STREAMING_MAX_SECONDS + 1, os.urandom(1024))
+
+    assert text == "Pour on Thursday bring the pump"
+    assert google.calls == ["long_running_recognize"]
+
+@pytest.mark.parametrize("duration", [
+    settings.GOOGLE_STREAMING_THRESHOLD_SECONDS + 10,
+    settings.GOOGLE_STREAMING_MAX_SECONDS + 1,
+])
+def test_google_api_errors_become_transcription_errors(google, duration):
+    google.error = OutOfRange("Exceeded maximum allowed stream duration of 305 seconds.")
+
+    with pytest.raises(TranscriptionError, match="Could not transcribe"):
+        _transcribe(google, duration, os.urandom(1024))
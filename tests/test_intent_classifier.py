@@ -0,0 +1,86 @@
+"""
+The local pre-router of core.intent_classifier: which messages the keyword rules claim, that
+compound requests with a calendar or issue action are left to the LLM router, the confidence
+threshold for classifier decisions, and the evaluate() report.
+"""
+import pytest
+
+from core.intent_classifier import KeywordIntentMatcher, PreRouter, evaluate
+
+class FixedClassifier:
+    def __init__(self, route: str, confidence: float):
+        self.route = route
+        self.confidence = confidence
+
+    def predict(self, message: str):
+        return self.route, self.confidence
+
+@pytest.mark.parametrize("message", [
+    "Write an email to Luca about the delayed rebar delivery",
+    "Please prepare the reply to the client",
+    "can you draft me a follow-up email for the architect",
+    "Compose an e-mail to the supplier",
+])
+def test_email_requests_are_matched(message):
+    assert KeywordIntentMatcher().match(message) == ("email_draft_generator", 0.99)
+
+@pytest.mark.parametrize("message", [
+    "Luca asked whether I could write an email, what do you think?",
+    "Hello",
+    "Thanks!",
+    "What did the supplier write in the email yesterday?",
+])
+def test_other_messages_are_not_matched(message):
+    assert KeywordIntentMatcher().match(message) is None
+
+@pytest.mark.parametrize("message", [
+    "Write an email to Luca and book a site meeting Monday at 10",
+    "Please prepare the reply to the client and schedule the inspection tomorrow",
+    "Draft an email to the site manager and report the water leak in block B",
+])
+def test_compound_requests_go_to_the_llm_router(message):
+    pre_router = PreRouter(classifier=FixedClassifier("email_draft_generator", 1.0))
+    assert pre_router.route(message) is None
+    assert pre_router.stats() == {"decided": 0, "deferred": 1}
+
+def test_classifier_decisions_need_the_threshold():
+    confident = PreRouter(classifier=FixedClassifier("general_message_handler", 0.95), threshold=0.9)
+    unsure = PreRouter(classifier=FixedClassifier("general_message_handler", 0.85), threshold=0.9)
+
+    assert confident.route("How thick is a standard screed?") == ("general_message_handler", 0.95, "classifier")
+    assert unsure.route("How thick is a standard screed?") is None
+
+def test_tool_routes_are_never_decided_locally():
+    pre_router = PreRouter(classifier=FixedClassifier("execute_tool", 1.0))
+    assert pre_router.route("What is on the agenda for the pour?") is None
+
+def test_keyword_rules_take_precedence_over_the_classifier():
+    pre_router = PreRouter(classifier=FixedClassifier("general_message_handler", 1.0))
+    assert pre_router.route("Write an email to the crane company") == ("email_draft_generator", 0.99, "keyword")
+
+def test_evaluate_reports_coverage_accuracy_and_savings():
+    samples = [
+        ("Write an email to Luca about the pour", "email_draft_generator"),
+        ("Draft a reply to the architect", "email_draft_generator"),
+        ("Write an email to Luca and book a meeting Monday", "execute_tool"),
+        ("How do I cure concrete in winter?", "general_message_handler"),
+    ]
+    report = evaluate(PreRouter(), samples)
+
+    assert report["samples"] == 4
+    assert report["decided_locally"] == 2
+    assert report["coverage"] == 0.5
+    assert report["accuracy"] == 1.0
+    assert report["misrouted"] == 0
+    assert report["total_llm_calls_saved"] == 2
+    assert report["confusion"] == {"email_draft_generator": {"email_draft_generator": 2}}
+
+def test_evaluate_counts_misrouted_decisions():
+    report = evaluate(PreRouter(classifier=FixedClassifier("general_message_handler", 0.99)), [
+        ("Is the site open on holidays?", "general_message_handler"),
+        ("Summarize the safety rules", "email_draft_generator"),
+    ])
+    assert report["accuracy"] == 0.5
+    assert report["misrouted"] == 1
+    assert report["total_llm_calls_saved"] == 0
+    assert evaluate(PreRouter(), [])["coverage"] == 0.0
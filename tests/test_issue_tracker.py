@@ -0,0 +1,170 @@
+"""
+Construction issue tracker: merging of near-identical reports, urgent alerts claimed once and given
+back when they could not be sent, and briefing windows that only advance once a briefing was delivered.
+Notifications go through TelegramService to a FakeTelegramAPI.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import core.tools
+import services.issue_tracker
+import services.telegram_service
+from core.config import settings
+from models.openai_models import ConstructionIssue
+from services.issue_tracker import IssueTracker, format_briefing
+from services.telegram_outbox import TelegramOutbox
+from services.telegram_service import TelegramService
+from tests.fakes.telegram_api import FakeTelegramAPI
+
+CHATS = [11, 22]
+
+def _issue(description: str, location: str = "Site A, Building 3", urgency: str = "routine") -> ConstructionIssue:
+    return ConstructionIssue(
+        urgency=urgency, description=description, location=location, reported_by="Mario", action_required="Check it"
+    )
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    telegram = FakeTelegramAPI()
+    tracker = IssueTracker(str(tmp_path / "issues.sqlite3"))
+    monkeypatch.setattr(settings, "ISSUE_NOTIFY_CHAT_IDS", CHATS)
+    monkeypatch.setattr(services.telegram_service, "telegram_outbox", TelegramOutbox(retry_base_delay=0.01, merge_window=0))
+    monkeypatch.setattr(
+        services.issue_tracker, "create_telegram_service",
+        lambda: TelegramService(httpx.AsyncClient(transport=telegram.transport())),
+    )
+    yield tracker, telegram
+    tracker.close()
+
+def test_near_identical_reports_are_merged(harness):
+    tracker, _ = harness
+    first, _ = tracker.record(_issue("Scaffolding on the north facade has a loose guard rail"))
+    again, _ = tracker.record(_issue("The scaffolding guard rail on north facade is loose"))
+    other_site, _ = tracker.record(_issue("Scaffolding on the north facade has a loose guard rail", location="Site C"))
+    other_issue, _ = tracker.record(_issue("Water pump in the basement is broken"))
+
+    assert again.id == first.id
+    assert again.report_count == 2
+    assert len({first.id, other_site.id, other_issue.id}) == 3
+    assert [issue.id for issue in tracker.open_issues("site a")] == [other_issue.id, first.id]
+    assert tracker.stats()["duplicates"] == 1
+
+def test_resolved_issues_absorb_no_reports(harness):
+    tracker, _ = harness
+    first, _ = tracker.record(_issue("Crack in the slab of the third floor"))
+    assert tracker.set_status(first.id, "resolved")
+
+    second, _ = tracker.record(_issue("Crack in the slab of the third floor"))
+
+    assert second.id != first.id
+    assert not tracker.set_status(9999, "resolved")
+
+def test_urgent_report_escalates_a_routine_issue(harness):
+    tracker, _ = harness
+    routine, needs_alert = tracker.record(_issue("Loose guard rail on the north facade scaffolding"))
+    assert not needs_alert
+
+    escalated, needs_alert = tracker.record(_issue("Loose guard rail on the north facade scaffolding", urgency="urgent"))
+
+    assert escalated.id == routine.id
+    assert escalated.urgency == "urgent"
+    assert needs_alert
+    assert tracker.stats()["escalations"] == 1
+
+def test_urgent_alert_is_sent_once(harness):
+    tracker, telegram = harness
+    gas_leak = _issue("Gas leak smell near the boiler room", location="Site B", urgency="urgent")
+
+    first = asyncio.run(tracker.report(gas_leak))
+    second = asyncio.run(tracker.report(gas_leak))
+
+    assert first["notified_chats"] == len(CHATS)
+    assert second == {**first, "duplicate": True, "notified_chats": 0}
+    for chat_id in CHATS:
+        assert len(telegram.sent_to(chat_id)) == 1
+        assert telegram.sent_to(chat_id)[0].startswith(f"URGENT construction issue #{first['issue_id']}")
+
+def test_failed_alert_is_released_for_the_next_report(harness):
+    tracker, telegram = harness
+    gas_leak = _issue("Gas leak smell near the boiler room", location="Site B", urgency="urgent")
+    telegram.inject("sendMessage", 403, 403)
+
+    failed = asyncio.run(tracker.report(gas_leak))
+    assert failed["notified_chats"] == 0
+    assert tracker.stats()["alert_failures"] == 1
+
+    retried = asyncio.run(tracker.report(gas_leak))
+    assert retried["issue_id"] == failed["issue_id"]
+    assert retried["notified_chats"] == len(CHATS)
+    assert "Reported 2 times." in telegram.sent_to(CHATS[0])[0]
+    assert tracker.stats()["alerts_sent"] == 1
+
+def test_briefing_covers_each_routine_issue_once(harness):
+    tracker, telegram = harness
+    first, _ = tracker.record(_issue("Crack in the slab of the third floor"))
+    tracker.record(_issue("Gas leak smell near the boiler room", location="Site B", urgency="urgent"))
+
+    assert asyncio.run(tracker.send_daily_briefing()) == 1
+    briefing = telegram.sent_to(CHATS[0])[-1]
+    assert f"#{first.id} Site A, Building 3: Crack in the slab" in briefing
+    assert "Gas leak" not in briefing
+
+    second, _ = tracker.record(_issue("Water pump in the basement is broken"))
+    assert asyncio.run(tracker.send_daily_briefing()) == 1
+    briefing = telegram.sent_to(CHATS[0])[-1]
+    assert f"#{second.id}" in briefing and f"#{first.id}" not in briefing
+    assert tracker.stats()["briefings"] == 2
+
+def test_undelivered_briefing_is_included_in_the_next_one(harness):
+    tracker, telegram = harness
+    # A first (empty) briefing fixes the start of the next window
+    assert asyncio.run(tracker.send_daily_briefing()) == 0
+    since, _ = tracker.briefing_window()
+    issue, _ = tracker.record(_issue("Crack in the slab of the third floor"))
+    telegram.messages.clear()
+    telegram.inject("sendMessage", 403, 403)
+
+    asyncio.run(tracker.send_daily_briefing())
+    assert telegram.messages == []
+    assert tracker.briefing_window()[0] == since
+
+    assert asyncio.run(tracker.send_daily_briefing()) == 1
+    assert f"#{issue.id}" in telegram.sent_to(CHATS[0])[-1]
+    assert tracker.briefing_window()[0] > since
+
+def test_briefing_lists_at_most_max_per_site(harness):
+    tracker, _ = harness
+    for description in ("Missing fire extinguisher in the stairwell", "Crack in the slab of the third floor", "Water pump in the basement is broken"):
+        tracker.record(_issue(description))
+    busiest, _ = tracker.record(_issue("Crack in the slab of the third floor"))
+    tracker.record(_issue("Broken window in the site office", location="Site B"))
+    since, until = tracker.briefing_window()
+
+    rows = tracker.briefing_rows(since, until + 1, max_per_site=2)
+
+    assert [(issue.site, total) for issue, total in rows] == [("Site A", 3), ("Site A", 3), ("Site B", 1)]
+    assert rows[0][0].id == busiest.id
+    assert "- ... and 1 more" in format_briefing(rows, until)
+
+def test_report_and_resolve_tools(harness, monkeypatch):
+    tracker, telegram = harness
+    monkeypatch.setattr(core.tools, "get_issue_tracker", lambda: tracker)
+    report = {
+        "urgency": "urgent", "description": "Gas leak smell near the boiler room", "location": "Site B",
+        "reported_by": "Mario", "action_required": "Evacuate and call the gas company",
+    }
+
+    async def run():
+        first = await core.tools.run_tool("report_construction_issue", report)
+        second = await core.tools.run_tool("report_construction_issue", report)
+        resolved = await core.tools.run_tool("resolve_construction_issue", {"issue_id": first["issue_id"]})
+        return first, second, resolved
+    first, second, resolved = asyncio.run(run())
+
+    assert first["status"] == "success" and "Urgent alert sent to 2 chat(s)." in first["message"]
+    assert f"matches issue #{first['issue_id']}" in second["message"]
+    assert resolved["status"] == "success"
+    assert tracker.get(first["issue_id"]).status == "resolved"
+    assert len(telegram.messages) == len(CHATS)
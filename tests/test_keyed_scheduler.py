@@ -0,0 +1,102 @@
+"""
+KeyedScheduler and KeyedLock: items of one key are handed out one at a time in arrival order,
+keys with pending work take turns round-robin, and the queue bound applies across keys.
+"""
+import asyncio
+
+import pytest
+
+from services.keyed_scheduler import KeyedLock, KeyedScheduler
+
+async def _drain(scheduler: KeyedScheduler, workers: int = 1):
+    """
+    Processes everything with the given number of workers and returns the (key, item) order.
+    """
+    order = []
+
+    async def worker():
+        while True:
+            key, item = await scheduler.get()
+            order.append((key, item))
+            await asyncio.sleep(0)
+            scheduler.task_done(key)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    await asyncio.wait_for(scheduler.join(), 1)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return order
+
+def test_items_of_one_key_are_handed_out_in_order_one_at_a_time():
+    async def scenario():
+        scheduler = KeyedScheduler()
+        for item in range(3):
+            scheduler.put_nowait("chat", item)
+        key, first = await scheduler.get()
+        # The key is reserved until task_done, even with items waiting
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.get(), 0.05)
+        scheduler.task_done(key)
+        return [first] + [item for _, item in await _drain(scheduler)]
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+
+def test_busy_key_takes_turns_with_the_others():
+    async def scenario():
+        scheduler = KeyedScheduler()
+        for item in range(4):
+            scheduler.put_nowait("busy", item)
+        scheduler.put_nowait("a", 0)
+        scheduler.put_nowait("b", 0)
+        return await _drain(scheduler)
+
+    order = asyncio.run(scenario())
+    assert [key for key, _ in order] == ["busy", "a", "b", "busy", "busy", "busy"]
+    assert [item for key, item in order if key == "busy"] == [0, 1, 2, 3]
+
+def test_parallel_workers_keep_per_key_order():
+    async def scenario():
+        scheduler = KeyedScheduler()
+        for item in range(20):
+            scheduler.put_nowait(item % 3, item)
+        return await _drain(scheduler, workers=4), scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    for key in range(3):
+        assert [item for k, item in order if k == key] == list(range(key, 20, 3))
+    assert scheduler.key_stats(0)["processed"] == 7
+    assert scheduler.stats()["keys_waiting"] == 0
+
+def test_capacity_is_shared_across_keys():
+    async def scenario():
+        scheduler = KeyedScheduler(maxsize=2)
+        scheduler.put_nowait("a", 1)
+        scheduler.put_nowait("b", 1)
+        with pytest.raises(asyncio.QueueFull):
+            scheduler.put_nowait("c", 1)
+        assert scheduler.pop_oldest_nowait() == ("a", 1)
+        scheduler.put_nowait("c", 1)
+        return await _drain(scheduler), scheduler.key_stats("a")
+
+    order, stats = asyncio.run(scenario())
+    assert order == [("b", 1), ("c", 1)]
+    assert stats["dropped"] == 1
+
+def test_keyed_lock_serializes_per_key_and_cleans_up():
+    lock = KeyedLock()
+    events = []
+
+    async def hold(key: str, name: str):
+        async with lock.hold(key):
+            events.append(f"{name} in")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} out")
+
+    async def scenario():
+        await asyncio.gather(hold("x", "first"), hold("x", "second"), hold("y", "other"))
+
+    asyncio.run(scenario())
+    assert events.index("first out") < events.index("second in")
+    assert events.index("other in") < events.index("first out")
+    assert len(lock) == 0
@@ -0,0 +1,39 @@
+"""
+The shared HTTP client's connection-pool metrics are exported at /metrics.
+"""
+import asyncio
+import re
+
+import httpx
+
+from main import app
+from tests.fakes.telegram_api import FakeTelegramAPI, serve
+from utils.http_client import HttpClient
+
+def _metric(text: str, name: str, **labels: str) -> float:
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{name}\{{{label_text}\}} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name}{{{label_text}}} not exported"
+    return float(match.group(1))
+
+def test_pool_metrics_are_exported():
+    async def scenario(base_url: str) -> str:
+        client = HttpClient.get_client()
+        try:
+            for _ in range(3):
+                response = await client.get(f"{base_url}/bottest-token/getUpdates", params={"timeout": 0})
+                assert response.status_code == 200
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as app_client:
+                return (await app_client.get("/metrics")).text
+        finally:
+            await HttpClient.close_client()
+
+    with serve(FakeTelegramAPI()) as base_url:
+        text = asyncio.run(scenario(base_url))
+
+    assert _metric(text, "http_pool_requests_total", pool="default") >= 3
+    assert _metric(text, "http_pool_new_connections_total", pool="default") >= 1
+    assert _metric(text, "http_pool_connections", pool="default", state="idle") == 1
+    assert _metric(text, "http_pool_connections", pool="default", state="active") == 0
+    assert _metric(text, "http_pool_queued_requests", pool="default") == 0
+    assert _metric(text, "http_pool_connection_wait_seconds_count", pool="default") >= 3
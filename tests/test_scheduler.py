@@ -0,0 +1,121 @@
+"""
+Scheduler leadership: the LeaderLease shared by two processes through one SQLite file (acquire,
+renew, expiry and takeover, release), and leader-only jobs that leave a skipped run due for the
+leader instead of losing it.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_PAUSED
+from apscheduler.triggers.cron import CronTrigger
+
+import services.scheduler_service
+from services.leader_lease import LeaderLease
+from services.scheduler_service import daily_issue_briefing_job, scheduler_stats
+
+TTL_SECONDS = 0.3
+
+@pytest.fixture
+def leases(tmp_path):
+    url = f"sqlite:///{tmp_path / 'scheduler.sqlite3'}"
+    first, second = LeaderLease(url, "scheduler", TTL_SECONDS), LeaderLease(url, "scheduler", TTL_SECONDS)
+    yield first, second
+    first.close()
+    second.close()
+
+def test_only_one_process_holds_the_lease(leases):
+    first, second = leases
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.current_holder() == first.holder
+    assert first.held and not second.held
+
+def test_renewal_keeps_the_lease(leases):
+    first, second = leases
+    assert first.try_acquire()
+
+    for _ in range(3):
+        time.sleep(TTL_SECONDS / 2)
+        assert first.try_acquire()
+        assert not second.try_acquire()
+
+    assert first.stats()["acquisitions"] == 1
+    assert first.stats()["renewals"] == 3
+
+def test_expired_lease_is_taken_over(leases):
+    first, second = leases
+    assert first.try_acquire()
+    time.sleep(TTL_SECONDS + 0.1)
+    assert not first.held
+
+    assert second.try_acquire()
+    assert second.current_holder() == second.holder
+    # The old leader notices on its next renewal that it lost the lease
+    assert not first.try_acquire()
+
+def test_released_lease_is_free_at_once(leases):
+    first, second = leases
+    assert first.try_acquire()
+    assert first.try_acquire()
+
+    first.release()
+
+    assert first.current_holder() is None
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert first.stats()["losses"] == 0
+
+class FakeIssueTracker:
+    def __init__(self):
+        self.briefings = 0
+
+    async def send_daily_briefing(self) -> int:
+        self.briefings += 1
+        return 0
+
+@pytest.fixture
+def follower(leases, monkeypatch):
+    """
+    Runs the briefing job in a process whose lease is held by another one.
+    """
+    leader, lease = leases
+    tracker = FakeIssueTracker()
+    scheduler = AsyncIOScheduler(jobstores={"default": MemoryJobStore()}, timezone="UTC")
+    monkeypatch.setattr(services.scheduler_service, "scheduler", scheduler)
+    monkeypatch.setattr(services.scheduler_service, "scheduler_lease", lease)
+    monkeypatch.setattr(services.scheduler_service, "get_issue_tracker", lambda: tracker)
+    return scheduler, leader, lease, tracker
+
+def test_follower_leaves_the_run_due_for_the_leader(follower):
+    scheduler, leader, lease, tracker = follower
+    assert leader.try_acquire()
+
+    async def run():
+        scheduler.start()
+        try:
+            scheduler.add_job(daily_issue_briefing_job, CronTrigger(hour=7, timezone="UTC"), id="daily_issue_briefing")
+            await daily_issue_briefing_job()
+            return scheduler.state, scheduler.get_job("daily_issue_briefing").next_run_time
+        finally:
+            scheduler.shutdown(wait=False)
+    state, next_run_time = asyncio.run(run())
+
+    assert tracker.briefings == 0
+    # Paused, and the run moved back to now instead of tomorrow at 7
+    assert state == STATE_PAUSED
+    assert next_run_time <= datetime.now(timezone.utc) + timedelta(seconds=1)
+    assert scheduler_stats()["skipped_runs"] >= 1
+
+def test_leader_runs_the_job(follower):
+    scheduler, _, lease, tracker = follower
+    assert lease.try_acquire()
+
+    asyncio.run(daily_issue_briefing_job())
+
+    assert tracker.briefings == 1
+    assert lease.stats()["renewals"] == 1
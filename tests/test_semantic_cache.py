@@ -0,0 +1,135 @@
+"""
+Semantic cache of router decisions: the similarity threshold, the bypass for actionable
+requests, TTL and LRU eviction in the preallocated matrix, and how router_node uses it (email
+content always taken from the current message; in conversations with history, self-contained
+questions are answered from the cache and follow-ups go to the LLM router).
+"""
+import asyncio
+import importlib
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core.semantic_cache import SemanticCache
+from models.agent_state import AgentState
+from tests.fakes.llm import FakeChatModel
+
+# core.nodes re-exports router_node, which shadows the module of the same name
+router_module = importlib.import_module("core.nodes.router_node")
+router_node = router_module.router_node
+
+QUESTION = "How long does concrete need to cure in winter?"
+CACHED = {"next_node": "general_message_handler", "general_response": "About two weeks."}
+HISTORY = [HumanMessage("Who delivers the rebar?"), AIMessage("Ferri Srl delivers it on Thursday.")]
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SemanticCache(threshold=0.9, max_entries=8, max_age_seconds=3600, audit_log_path=None)
+    monkeypatch.setattr(router_module, "semantic_cache", cache)
+    monkeypatch.setattr(router_module, "pre_router", None)
+    return cache
+
+def _route(message: str, history=(), reply: str = "From the LLM."):
+    llm = FakeChatModel(reply=reply)
+    decision = asyncio.run(router_node(AgentState(input_message=message, history=list(history), llm=llm)))
+    return decision, llm
+
+def test_self_contained_question_is_answered_from_the_cache_with_history(cache):
+    cache.store(QUESTION, CACHED)
+
+    decision, llm = _route(QUESTION, HISTORY)
+
+    assert decision == CACHED
+    assert llm.prompts == []
+
+@pytest.mark.parametrize("message", [
+    "Is it enough for the slab too?",
+    "yes",
+    "What about the other one?",
+    "and in summer",
+    "3pm",
+])
+def test_follow_ups_bypass_the_cache_with_history(cache, message):
+    cache.store(message, CACHED)
+
+    decision, llm = _route(message, HISTORY)
+
+    assert decision["general_response"] == "From the LLM."
+    assert len(llm.prompts) == 1
+    # Without history the same message may be answered from the cache
+    assert _route(message)[0] == CACHED
+
+def test_replies_written_with_history_are_not_stored(cache):
+    _route(QUESTION, HISTORY, reply="As Ferri Srl said, about two weeks.")
+    assert cache.stats()["stores"] == 0
+
+    _route(QUESTION, reply="About two weeks.")
+    assert cache.stats()["stores"] == 1
+    assert _route(QUESTION, HISTORY)[0]["general_response"] == "About two weeks."
+
+def test_similar_message_hits_and_unrelated_one_misses():
+    cache = SemanticCache(threshold=0.8, max_entries=4, audit_log_path=None)
+    cache.store(QUESTION, CACHED)
+
+    assert cache.lookup("How long does concrete need to cure in winter") == CACHED
+    assert cache.lookup("Which crane do we rent for the roof?") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["lookups"] == 2
+
+    strict = SemanticCache(threshold=0.999, max_entries=4, audit_log_path=None)
+    strict.store(QUESTION, CACHED)
+    assert strict.lookup("How long does the concrete need to cure during winter?") is None
+
+def test_actionable_requests_are_never_cached():
+    cache = SemanticCache(threshold=0.5, max_entries=4, audit_log_path=None)
+    cache.store("Book the crane for Monday", CACHED)
+    cache.store(QUESTION, {**CACHED, "tool_calls": [{"name": "create_calendar_event"}]})
+
+    assert cache.stats()["stores"] == 0
+    assert cache.lookup("Book the crane for Monday") is None
+    assert cache.stats()["bypassed"] == 1
+
+def test_expired_entries_are_not_served_and_their_slot_is_reused(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = SemanticCache(threshold=0.9, max_entries=2, max_age_seconds=60, audit_log_path=None)
+    cache.store(QUESTION, CACHED)
+    cache.store("What is the minimum rebar cover?", CACHED)
+
+    now[0] += 61
+    assert cache.lookup(QUESTION) is None
+    assert cache.stats()["entries"] == 0
+
+    cache.store("How wide must a fire exit be?", CACHED)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 1
+
+def test_least_recently_used_entry_is_replaced_when_full(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = SemanticCache(threshold=0.9, max_entries=2, max_age_seconds=3600, audit_log_path=None)
+    cache.store(QUESTION, {**CACHED, "general_response": "curing"})
+    now[0] += 1
+    cache.store("What is the minimum rebar cover?", {**CACHED, "general_response": "cover"})
+    now[0] += 1
+    assert cache.lookup(QUESTION)["general_response"] == "curing"
+
+    now[0] += 1
+    cache.store("How wide must a fire exit be?", {**CACHED, "general_response": "exit"})
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("What is the minimum rebar cover?") is None
+    assert cache.lookup(QUESTION)["general_response"] == "curing"
+    assert cache.lookup("How wide must a fire exit be?")["general_response"] == "exit"
+
+def test_cached_email_route_carries_the_current_message(cache):
+    cache.store("Write an email to the architect about the facade samples", {
+        "next_node": "email_draft_generator", "general_response": None,
+        "email_request_content": "Write an email to the architect about the facade samples",
+    })
+
+    decision, llm = _route("Write an email to the architect about the facade sample")
+
+    assert decision["next_node"] == "email_draft_generator"
+    assert decision["email_request_content"] == "Write an email to the architect about the facade sample"
+    assert llm.prompts == []
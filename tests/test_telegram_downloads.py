@@ -0,0 +1,71 @@
+"""
+Streamed file downloads and their memory accounting, against a FakeTelegramAPI.
+"""
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from core.config import settings
+from services.telegram_service import TelegramService
+from tests.fakes.telegram_api import FakeTelegramAPI
+
+SPOOL_BYTES = 256 * 1024
+
+@pytest.fixture
+def telegram(monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_SPOOL_MAX_MEMORY_BYTES", SPOOL_BYTES)
+    return FakeTelegramAPI()
+
+def _download(telegram: FakeTelegramAPI, content: bytes, max_bytes: int = settings.VOICE_DOWNLOAD_MAX_BYTES):
+    telegram.files["voice/note.oga"] = content
+
+    async def download():
+        async with httpx.AsyncClient(transport=telegram.transport()) as client:
+            return await TelegramService(client).download_file_stream("voice/note.oga", max_bytes)
+    return asyncio.run(download())
+
+def test_small_file_stays_in_memory_until_the_buffer_is_closed(telegram):
+    stats = TelegramService.download_stats
+    in_memory_before = stats.in_memory_bytes
+    content = os.urandom(100 * 1024)
+
+    buffer = _download(telegram, content)
+
+    assert not buffer.spilled
+    # The consumer still holds the bytes: they are accounted for until it closes the buffer
+    assert stats.in_memory_bytes == in_memory_before + len(content)
+    with buffer:
+        assert buffer.read() == content
+    assert stats.in_memory_bytes == in_memory_before
+    buffer.close()
+    assert stats.in_memory_bytes == in_memory_before
+
+def test_large_file_spills_to_disk_and_releases_its_memory(telegram):
+    stats = TelegramService.download_stats
+    in_memory_before = stats.in_memory_bytes
+    disk_before = stats.disk_bytes_written
+    spilled_before = stats.spilled_to_disk
+    stats.peak_in_memory_bytes = stats.in_memory_bytes
+    content = os.urandom(SPOOL_BYTES + 200 * 1024)
+
+    buffer = _download(telegram, content)
+
+    assert buffer.spilled
+    assert stats.in_memory_bytes == in_memory_before
+    assert stats.disk_bytes_written == disk_before + len(content)
+    assert stats.spilled_to_disk == spilled_before + 1
+    # Nothing beyond the memory budget was ever held in memory by this download
+    assert stats.peak_in_memory_bytes - in_memory_before <= SPOOL_BYTES
+    with buffer:
+        assert buffer.read() == content
+
+def test_oversized_file_is_rejected_without_leaking_accounting(telegram):
+    stats = TelegramService.download_stats
+    in_memory_before = stats.in_memory_bytes
+    rejected_before = stats.rejected_too_large
+
+    assert _download(telegram, os.urandom(200 * 1024), max_bytes=150 * 1024) is None
+    assert stats.rejected_too_large == rejected_before + 1
+    assert stats.in_memory_bytes == in_memory_before
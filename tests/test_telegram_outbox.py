@@ -0,0 +1,103 @@
+"""
+Retry behaviour of the Telegram outbox: calls that may have reached Telegram are never repeated.
+Calls to one chat keep their order: a streamed reply's placeholder and edits queue up behind
+earlier merged messages.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import services.telegram_service
+from services.telegram_outbox import TelegramOutbox
+from services.telegram_service import TelegramService
+from tests.fakes.telegram_api import DELIVERED_THEN_TIMEOUT, FakeTelegramAPI, serve
+
+URL = "/bottest-token/sendMessage"
+
+def _send(api: FakeTelegramAPI, outbox: TelegramOutbox, base_url: str | None = None, timeout: float = 5.0):
+    """
+    Sends one message through the outbox, in-process or (with base_url) over HTTP to a served fake.
+    """
+    async def send():
+        transport = api.transport() if base_url is None else None
+        async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+            url = (base_url or "http://telegram.test") + URL
+            return await outbox.request(client, url, {"chat_id": 7, "text": "Crane arrives at 9"}, chat_id=7)
+    return asyncio.run(send())
+
+@pytest.fixture
+def outbox():
+    return TelegramOutbox(retry_base_delay=0.01, merge_window=0)
+
+def test_read_timeout_after_delivery_is_not_retried(outbox):
+    api = FakeTelegramAPI()
+    api.inject("sendMessage", DELIVERED_THEN_TIMEOUT)
+
+    with pytest.raises(httpx.ReadTimeout):
+        _send(api, outbox)
+
+    assert api.sent_to(7) == ["Crane arrives at 9"]
+    assert outbox.retries == 0
+
+@pytest.mark.parametrize("error", [httpx.ConnectError("refused"), httpx.ConnectTimeout("slow"), httpx.PoolTimeout("busy")])
+def test_connection_failures_are_retried(outbox, error):
+    api = FakeTelegramAPI()
+    api.inject("sendMessage", error, error)
+
+    response = _send(api, outbox)
+
+    assert response.status_code == 200
+    assert api.sent_to(7) == ["Crane arrives at 9"]
+    assert outbox.retries == 2
+
+def test_rate_limit_is_retried_after_retry_after(outbox):
+    api = FakeTelegramAPI()
+    api.inject("sendMessage", 429)
+
+    started_at = time.perf_counter()
+    response = _send(api, outbox)
+
+    assert response.status_code == 200
+    # The fake asks to retry after 0.05 s
+    assert time.perf_counter() - started_at >= 0.05
+    assert outbox.rate_limited == 1
+    assert api.sent_to(7) == ["Crane arrives at 9"]
+
+def test_lost_response_from_a_local_server_is_not_retried(outbox):
+    api = FakeTelegramAPI(lost_response_delay=1.0)
+    api.inject("sendMessage", DELIVERED_THEN_TIMEOUT)
+
+    with serve(api) as base_url:
+        with pytest.raises(httpx.ReadTimeout):
+            _send(api, outbox, base_url, timeout=0.3)
+        response = _send(api, outbox, base_url)
+
+    assert response.status_code == 200
+    assert api.sent_to(7) == ["Crane arrives at 9", "Crane arrives at 9"]
+    assert outbox.retries == 0
+
+def test_streamed_reply_keeps_its_place_among_queued_messages(monkeypatch):
+    api = FakeTelegramAPI()
+    # One message per 50 ms to the chat, so the first messages pile up in its queue
+    outbox = TelegramOutbox(chat_rate=20, chat_burst=1, merge_window=0)
+    monkeypatch.setattr(services.telegram_service, "telegram_outbox", outbox)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=api.transport()) as client:
+            telegram = TelegramService(client)
+            first = asyncio.create_task(telegram.send_message(7, "Crane arrives at 9"))
+            await asyncio.sleep(0)
+            queued = [asyncio.create_task(telegram.send_message(7, text)) for text in ("Pump at 10", "Pour at 11")]
+            await asyncio.sleep(0)
+            stream = asyncio.create_task(telegram.stream_message(7))
+            await asyncio.sleep(0)
+            after = asyncio.create_task(telegram.send_message(7, "Site closes at 17"))
+            await asyncio.gather(first, *queued, after)
+            await (await stream).finish("Your reply")
+        return [call["method"] for call in api.calls]
+    methods = asyncio.run(scenario())
+
+    assert api.sent_to(7) == ["Crane arrives at 9", "Pump at 10\n\nPour at 11", "Your reply", "Site closes at 17"]
+    assert methods == ["sendMessage"] * 4 + ["editMessageText"]
@@ -0,0 +1,115 @@
+"""
+Update deduplication by update_id: TTL expiry and LRU bound of the in-memory map, the SQLite
+backend remembering processed updates across restarts, and duplicates that arrive while the
+original is still being processed waiting for its result instead of running again.
+"""
+import asyncio
+import time
+
+import pytest
+
+from services.update_deduplicator import UpdateDeduplicator
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+def _process(deduplicator: UpdateDeduplicator, update_id: int, result: str = "ok"):
+    async def run():
+        return await deduplicator.run_once(update_id, lambda: asyncio.sleep(0, result))
+    return asyncio.run(run())
+
+def test_processed_update_is_a_duplicate_until_the_ttl_expires(clock):
+    deduplicator = UpdateDeduplicator(ttl_seconds=60, backend="memory")
+
+    assert _process(deduplicator, 1) == ("ok", False)
+    clock[0] += 59
+    assert _process(deduplicator, 1, "again") == ("ok", True)
+    clock[0] += 2
+    assert _process(deduplicator, 1, "again") == ("again", False)
+    assert deduplicator.stats()["hits"] == 1
+
+def test_least_recently_used_update_ids_are_forgotten():
+    deduplicator = UpdateDeduplicator(max_entries=2, backend="memory")
+    for update_id in (1, 2):
+        _process(deduplicator, update_id)
+    # Seeing update 1 again makes update 2 the least recently used
+    assert _process(deduplicator, 1)[1]
+
+    _process(deduplicator, 3)
+
+    assert deduplicator.stats()["entries"] == 2
+    assert _process(deduplicator, 1)[1]
+    assert not _process(deduplicator, 2)[1]
+
+def test_sqlite_backend_survives_a_restart(tmp_path):
+    path = str(tmp_path / "update_dedup.sqlite3")
+    deduplicator = UpdateDeduplicator(backend="sqlite", sqlite_path=path)
+    _process(deduplicator, 7, "sent")
+    deduplicator.close()
+
+    restarted = UpdateDeduplicator(backend="sqlite", sqlite_path=path)
+    try:
+        assert _process(restarted, 7, "again") == ("sent", True)
+        assert not _process(restarted, 8)[1]
+    finally:
+        restarted.close()
+
+def test_sqlite_backend_forgets_expired_updates(tmp_path, clock):
+    path = str(tmp_path / "update_dedup.sqlite3")
+    deduplicator = UpdateDeduplicator(ttl_seconds=60, backend="sqlite", sqlite_path=path)
+    _process(deduplicator, 7)
+    deduplicator.close()
+    clock[0] += 61
+
+    restarted = UpdateDeduplicator(ttl_seconds=60, backend="sqlite", sqlite_path=path)
+    try:
+        assert not _process(restarted, 7)[1]
+    finally:
+        restarted.close()
+
+def test_duplicates_in_flight_wait_for_the_original():
+    deduplicator = UpdateDeduplicator(backend="memory")
+    runs = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def process():
+            runs.append(1)
+            await release.wait()
+            return "done"
+
+        original = asyncio.create_task(deduplicator.run_once(5, process))
+        await asyncio.sleep(0)
+        duplicates = [asyncio.create_task(deduplicator.run_once(5, process)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert not any(duplicate.done() for duplicate in duplicates)
+        release.set()
+        return await original, await asyncio.gather(*duplicates)
+    original, duplicates = asyncio.run(scenario())
+
+    assert runs == [1]
+    assert original == ("done", False)
+    assert duplicates == [("done", True)] * 3
+    assert deduplicator.stats()["coalesced"] == 3
+    assert deduplicator.stats()["in_flight"] == 0
+
+def test_failed_update_is_released_for_redelivery():
+    deduplicator = UpdateDeduplicator(backend="memory")
+
+    async def scenario():
+        async def fail():
+            raise RuntimeError("LLM unavailable")
+
+        with pytest.raises(RuntimeError):
+            await deduplicator.run_once(5, fail)
+        return await deduplicator.run_once(5, lambda: asyncio.sleep(0, "retried"))
+
+    assert asyncio.run(scenario()) == ("retried", False)
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        UpdateDeduplicator(backend="redis")
@@ -0,0 +1,83 @@
+"""
+getUpdates polling against a FakeTelegramAPI: polling continues while an update of one chat is
+still being processed, and the offset only covers the updates that have finished.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import services.update_poller
+import services.update_queue
+from core.config import settings
+from services.telegram_service import TelegramService
+from services.update_deduplicator import UpdateDeduplicator
+from services.update_poller import UpdatePoller
+from services.update_queue import UpdateQueue
+from tests.fakes.telegram_api import FakeTelegramAPI, text_update
+
+SLOW_CHAT = 1
+FAST_CHAT = 2
+
+async def _until(condition, timeout: float = 5.0):
+    async def wait():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(wait(), timeout)
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    telegram = FakeTelegramAPI()
+    deduplicator = UpdateDeduplicator(backend="memory")
+    release = asyncio.Event()
+    processed = []
+
+    async def process_update(update, *args, **kwargs):
+        if update.message.chat.id == SLOW_CHAT:
+            await release.wait()
+        processed.append(update.update_id)
+        return "ok"
+
+    def create_telegram_service():
+        return TelegramService(httpx.AsyncClient(transport=telegram.transport()))
+
+    for module in (services.update_poller, services.update_queue):
+        monkeypatch.setattr(module, "create_telegram_service", create_telegram_service)
+        monkeypatch.setattr(module, "get_shared_google_service", lambda: None)
+        monkeypatch.setattr(module, "get_shared_openai_service", lambda: None)
+        monkeypatch.setattr(module, "update_deduplicator", deduplicator)
+    monkeypatch.setattr(services.update_queue, "process_update", process_update)
+    return telegram, release, processed
+
+@pytest.mark.parametrize("mode", ["queue", "sync"])
+def test_slow_chat_does_not_hold_up_polling(pipeline, monkeypatch, mode):
+    telegram, release, processed = pipeline
+    monkeypatch.setattr(settings, "UPDATE_PROCESSING_MODE", mode)
+
+    async def scenario():
+        queue = UpdateQueue(workers=4)
+        monkeypatch.setattr(services.update_poller, "update_queue", queue)
+        queue.start()
+        poller = UpdatePoller(poll_timeout=1, in_flight_poll_interval=0.05)
+        try:
+            telegram.add_updates([text_update(1, SLOW_CHAT, "Summarize my week")])
+            poller.start()
+            await _until(lambda: poller.stats()["in_flight"] == 1)
+
+            # Fetched while the first update is still being processed
+            telegram.add_updates([text_update(2, FAST_CHAT, "Hi")])
+            await _until(lambda: processed == [2])
+            # Update 1 is unfinished, so nothing has been confirmed to Telegram yet
+            assert poller.offset is None
+
+            release.set()
+            await _until(lambda: poller.offset == 3)
+            assert processed == [2, 1]
+            assert poller.stats()["in_flight"] == 0
+            # Each update was handed to the pipeline once, although update 1 was fetched repeatedly
+            assert poller.stats()["updates_received"] == 2
+        finally:
+            await poller.stop()
+            await queue.stop(drain_timeout=1)
+
+    asyncio.run(scenario())
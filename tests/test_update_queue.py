@@ -0,0 +1,118 @@
+"""
+Background update queue: the 'reject', 'drop_oldest' and 'block' overflow policies, the release of
+the deduplication claim of an update that is dropped, and the webhook answering 503 (so Telegram
+redelivers) when the queue cannot take an update.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import api.v1.endpoints.telegram
+import services.update_queue
+from core.config import settings
+from main import app
+from models.telegram_models import Update
+from services.update_deduplicator import UpdateDeduplicator
+from services.update_queue import QueueFullError, UpdateQueue
+from tests.fakes.telegram_api import text_update
+
+@pytest.fixture
+def deduplicator(monkeypatch):
+    deduplicator = UpdateDeduplicator(backend="memory")
+    monkeypatch.setattr(services.update_queue, "update_deduplicator", deduplicator)
+    monkeypatch.setattr(api.v1.endpoints.telegram, "update_deduplicator", deduplicator)
+    return deduplicator
+
+def _update(update_id: int, chat_id: int = 1) -> Update:
+    return Update.model_validate(text_update(update_id, chat_id, f"Message {update_id}"))
+
+async def _claim_and_enqueue(queue: UpdateQueue, deduplicator: UpdateDeduplicator, update_id: int):
+    assert deduplicator.begin(update_id) is None
+    await queue.enqueue(_update(update_id, chat_id=update_id))
+
+def test_reject_policy_refuses_updates_beyond_capacity(deduplicator):
+    async def scenario():
+        # Without workers nothing leaves the queue
+        queue = UpdateQueue(max_size=2, workers=0, overflow_policy="reject")
+        queue.start()
+        await _claim_and_enqueue(queue, deduplicator, 1)
+        await _claim_and_enqueue(queue, deduplicator, 2)
+        with pytest.raises(QueueFullError):
+            await _claim_and_enqueue(queue, deduplicator, 3)
+        return queue.stats()
+    stats = asyncio.run(scenario())
+
+    assert stats["depth"] == 2
+    assert stats["rejected"] == 1
+    assert stats["enqueued"] == 2
+
+def test_drop_oldest_policy_releases_the_dropped_update(deduplicator):
+    async def scenario():
+        queue = UpdateQueue(max_size=2, workers=0, overflow_policy="drop_oldest")
+        queue.start()
+        for update_id in (1, 2, 3):
+            await _claim_and_enqueue(queue, deduplicator, update_id)
+        queued = [queue._queue.pop_oldest_nowait()[1][0].update_id for _ in range(queue.depth())]
+        return queue.stats(), queued, deduplicator.in_flight(1), deduplicator.begin(1)
+    stats, queued, in_flight, redelivery = asyncio.run(scenario())
+
+    assert stats["dropped"] == 1
+    assert queued == [2, 3]
+    # The dropped update is no longer claimed, so Telegram's redelivery is processed again
+    assert in_flight is None
+    assert redelivery is None
+
+def test_block_policy_waits_for_space(deduplicator):
+    async def scenario():
+        queue = UpdateQueue(max_size=1, workers=0, overflow_policy="block", enqueue_timeout=1.0)
+        queue.start()
+        await _claim_and_enqueue(queue, deduplicator, 1)
+        blocked = asyncio.create_task(_claim_and_enqueue(queue, deduplicator, 2))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+
+        # A worker taking the first update makes room
+        key, _ = await queue._queue.get()
+        await asyncio.wait_for(blocked, 1)
+        queue._queue.task_done(key)
+        return queue.stats()
+    stats = asyncio.run(scenario())
+
+    assert stats["enqueued"] == 2
+    assert stats["rejected"] == 0
+
+def test_block_policy_gives_up_after_the_timeout(deduplicator):
+    async def scenario():
+        queue = UpdateQueue(max_size=1, workers=0, overflow_policy="block", enqueue_timeout=0.05)
+        queue.start()
+        await _claim_and_enqueue(queue, deduplicator, 1)
+        with pytest.raises(QueueFullError, match="Timed out"):
+            await _claim_and_enqueue(queue, deduplicator, 2)
+        return queue.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+def test_unknown_overflow_policy_is_refused():
+    with pytest.raises(ValueError):
+        UpdateQueue(overflow_policy="drop_newest")
+
+def test_webhook_answers_503_when_the_queue_is_full(deduplicator, monkeypatch):
+    monkeypatch.setattr(settings, "UPDATE_PROCESSING_MODE", "queue")
+
+    async def scenario():
+        queue = UpdateQueue(max_size=1, workers=0, overflow_policy="reject")
+        monkeypatch.setattr(api.v1.endpoints.telegram, "update_queue", queue)
+        queue.start()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as client:
+            first = await client.post("/api/v1/telegram/webhook", json=text_update(1, 1, "Hello"))
+            second = await client.post("/api/v1/telegram/webhook", json=text_update(2, 2, "Hello"))
+            return first, second, queue.stats()
+    first, second, stats = asyncio.run(scenario())
+
+    assert (first.status_code, first.json()) == (200, {"status": "queued"})
+    assert second.status_code == 503
+    assert stats["rejected"] == 1
+    # The rejected update is released for Telegram's redelivery
+    assert deduplicator.in_flight(2) is None
+    assert deduplicator.in_flight(1) is not None
@@ -0,0 +1,81 @@
+"""
+Load test of the webhook path: concurrent updates must be processed concurrently, so the wall time
+of a burst stays close to one agent round trip instead of growing with the number of updates.
+The app is driven in-process through httpx.ASGITransport, the LLM is a FakeChatModel with a fixed
+latency and the Bot API is a FakeTelegramAPI.
+"""
+import asyncio
+import itertools
+import time
+
+import httpx
+import pytest
+
+import core.agent_graph
+import services.telegram_service
+from core.config import settings
+from main import app
+from services.telegram_outbox import TelegramOutbox
+from tests.fakes.llm import FakeChatModel
+from tests.fakes.telegram_api import FakeTelegramAPI, text_update
+from utils.http_client import get_http_client
+
+AGENT_LATENCY = 0.3
+
+# Update ids are unique across tests: processed ids are remembered by the update deduplicator
+_update_ids = itertools.count(1)
+
+@pytest.fixture
+def harness(monkeypatch):
+    telegram = FakeTelegramAPI()
+    llm = FakeChatModel(reply="Hello from the assistant", latency=AGENT_LATENCY)
+    monkeypatch.setattr(settings, "UPDATE_PROCESSING_MODE", "sync")
+    monkeypatch.setattr(settings, "RESPONSE_STREAMING_ENABLED", False)
+    monkeypatch.setattr(core.agent_graph, "get_llm_model", lambda: llm)
+    monkeypatch.setattr(services.telegram_service, "telegram_outbox", TelegramOutbox(merge_window=0))
+    # Warm up (lazy imports, first graph run) so that it is not timed
+    asyncio.run(_post_burst(telegram, 1))
+    telegram.messages.clear()
+    llm.peak_in_flight = 0
+    yield telegram, llm
+    app.dependency_overrides.clear()
+
+async def _post_burst(telegram: FakeTelegramAPI, count: int) -> float:
+    update_ids = [next(_update_ids) for _ in range(count)]
+    async with httpx.AsyncClient(transport=telegram.transport()) as telegram_client:
+        async def override_http_client():
+            yield telegram_client
+        app.dependency_overrides[get_http_client] = override_http_client
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as client:
+            started_at = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post(
+                    "/api/v1/telegram/webhook",
+                    json=text_update(update_id, 1000 + update_id, "Hello, how are you today?"),
+                )
+                for update_id in update_ids
+            ))
+            elapsed = time.perf_counter() - started_at
+    assert [response.status_code for response in responses] == [200] * count
+    return elapsed
+
+def test_burst_of_updates_is_processed_concurrently(harness):
+    telegram, llm = harness
+    count = 20
+
+    elapsed = asyncio.run(_post_burst(telegram, count))
+
+    assert llm.peak_in_flight == count
+    assert len({message["chat_id"] for message in telegram.messages}) == count
+    assert all(message["text"] == "Hello from the assistant" for message in telegram.messages)
+    # Sequential processing would take count * AGENT_LATENCY
+    assert elapsed < 4 * AGENT_LATENCY
+
+def test_throughput_scales_with_in_flight_requests(harness):
+    telegram, _ = harness
+    timings = {count: asyncio.run(_post_burst(telegram, count)) for count in (1, 5, 20)}
+
+    # Twenty times the load in about the same wall time
+    assert timings[20] < 2.5 * timings[1]
+    assert 20 / timings[20] > 8 / timings[1]
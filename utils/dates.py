@@ -0,0 +1,63 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from dateutil.parser import parse as date_parse
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+
+_RELATIVE_DAY_PATTERN = re.compile(r"\b(?:the\s+)?day\s+after\s+tomorrow\b|\btoday\b|\btonight\b|\btomorrow\b|\byesterday\b", re.IGNORECASE)
+_OFFSET_PATTERN = re.compile(r"\bin\s+(\d+|an?|one|two|three|four|five|six|seven)\s+(day|week)s?\b", re.IGNORECASE)
+_NEXT_WEEK_PATTERN = re.compile(r"\bnext\s+week\b", re.IGNORECASE)
+_WEEKDAY_PATTERN = re.compile(
+    r"\b(?:(next|this|coming)\s+)?(" + "|".join(WEEKDAYS) + r")\b", re.IGNORECASE
+)
+
+def resolve_relative_dates(text: str, today: date) -> str:
+    """
+    Replaces relative day expressions ('tomorrow', 'next Monday', 'in 3 days', 'next week') with
+    ISO dates counted from today, so that the result can be handed to dateutil.
+    A bare or 'this' weekday means its next occurrence, today included; 'next <weekday>' is
+    always after today; 'next week' is the Monday of the following week.
+    """
+    def relative_day(match: re.Match) -> str:
+        word = match.group(0).lower()
+        if "after" in word:
+            offset = 2
+        else:
+            offset = {"today": 0, "tonight": 0, "tomorrow": 1, "yesterday": -1}[word]
+        return (today + timedelta(days=offset)).isoformat()
+
+    def offset(match: re.Match) -> str:
+        amount = match.group(1).lower()
+        count = int(amount) if amount.isdigit() else _NUMBERS[amount]
+        days = count * 7 if match.group(2).lower() == "week" else count
+        return (today + timedelta(days=days)).isoformat()
+
+    def weekday(match: re.Match) -> str:
+        days_ahead = (WEEKDAYS.index(match.group(2).lower()) - today.weekday()) % 7
+        if match.group(1) and match.group(1).lower() in ("next", "coming") and days_ahead == 0:
+            days_ahead = 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+
+    text = _RELATIVE_DAY_PATTERN.sub(relative_day, text)
+    text = _OFFSET_PATTERN.sub(offset, text)
+    text = _NEXT_WEEK_PATTERN.sub(lambda _: (today + timedelta(days=7 - today.weekday())).isoformat(), text)
+    return _WEEKDAY_PATTERN.sub(weekday, text)
+
+def parse_datetime(text: str, tz: ZoneInfo, now: Optional[datetime] = None) -> datetime:
+    """
+    Parses a date/time as written by a user or the LLM ('tomorrow 3pm', 'next Monday', 'July 25th 10:00')
+    into an aware datetime in tz. Relative expressions are resolved against now (default: the
+    current time in tz); missing parts default to midnight of the current day.
+    Raises ValueError when no date can be found in text.
+    """
+    now = (now or datetime.now(tz)).astimezone(tz)
+    default = now.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    parsed = date_parse(resolve_relative_dates(text, now.date()), fuzzy=True, default=default)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
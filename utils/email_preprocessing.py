@@ -0,0 +1,207 @@
+import hashlib
+import html
+import re
+from typing import Any, Dict, Set, Tuple
+
+# --- HTML to text ---
+
+# Everything from the first quoted-reply container on is history (Gmail, Outlook, Apple Mail, Yahoo)
+_HTML_QUOTE_PATTERN = re.compile(
+    r"<div[^>]+class=\"?[^\">]*\bgmail_quote\b"
+    r"|<div[^>]+id=\"?(?:divRplyFwdMsg|appendonsend)\b"
+    r"|<blockquote[^>]+type=\"?cite\b"
+    r"|<div[^>]+class=\"?[^\">]*\byahoo_quoted\b",
+    re.IGNORECASE,
+)
+_HTML_DROP_PATTERN = re.compile(r"<(script|style|head|title)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+_HTML_LINE_BREAK_PATTERN = re.compile(r"<(?:br|/tr|/li)\b[^>]*>", re.IGNORECASE)
+# Block ends become blank lines so that paragraphs survive the conversion
+_HTML_BLOCK_END_PATTERN = re.compile(r"<(?:/p|/div|/h[1-6]|/table|hr)\b[^>]*>", re.IGNORECASE)
+_HTML_ITEM_PATTERN = re.compile(r"<li\b[^>]*>", re.IGNORECASE)
+_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+def html_to_text(markup: str) -> str:
+    """
+    Converts an HTML email body to plain text, dropping quoted replies, scripts, styles and comments.
+    """
+    quote = _HTML_QUOTE_PATTERN.search(markup)
+    if quote:
+        markup = markup[:quote.start()]
+    markup = _HTML_DROP_PATTERN.sub("", markup)
+    markup = _HTML_BLOCK_END_PATTERN.sub("\n\n", markup)
+    markup = _HTML_LINE_BREAK_PATTERN.sub("\n", markup)
+    markup = _HTML_ITEM_PATTERN.sub("\n- ", markup)
+    return html.unescape(_HTML_TAG_PATTERN.sub("", markup))
+
+# --- Quoted history ---
+
+# Start of the quoted history in plain text replies and forwards; everything from here on is dropped.
+# Attribution lines ('On <date>, <sender> wrote:') must end their line, and the English one must
+# carry a year or a time, so that a sentence such as 'On 3 May the engineer wrote: ...' is kept.
+_REPLY_HEADER_PATTERN = re.compile(
+    r"^(?:"
+    r"On\s[^\n]{0,200}?(?:\b(?:19|20)\d{2}\b|\b\d{1,2}:\d{2}\b)[^\n]{0,200}?(?:\n[^\n]{1,200}?)?\swrote:[ \t]*$"  # Gmail/Apple (may wrap over two lines)
+    r"|Il giorno\s.{1,200}?\sha scritto:[ \t]*$"                 # Italian Gmail
+    r"|Le\s.{1,200}?\sa écrit\s?:[ \t]*$"                        # French Gmail
+    r"|Am\s.{1,200}?\sschrieb\s.{0,100}?:[ \t]*$"                # German Gmail
+    r"|-{2,}\s*(?:Original Message|Messaggio originale|Forwarded message|Messaggio inoltrato)\s*-{2,}"
+    r"|_{10,}\s*\n\s*(?:From|Da|De|Von):"                         # Outlook separator line
+    r"|(?:From|Da):\s[^\n]+\n(?:Sent|Inviato|Date|Data):\s"        # Outlook header block
+    r")",
+    re.IGNORECASE | re.MULTILINE | re.DOTALL,
+)
+# Runs of '>'-quoted lines (inline replies keep the surrounding text)
+_QUOTED_LINES_PATTERN = re.compile(r"(?:^[ \t]*>.*(?:\n|$))+", re.MULTILINE)
+
+def strip_quoted_history(text: str) -> str:
+    """
+    Drops the quoted history of a reply or forward and collapses inline '>' quotes.
+    """
+    header = _REPLY_HEADER_PATTERN.search(text)
+    if header:
+        text = text[:header.start()]
+    return _QUOTED_LINES_PATTERN.sub("[...]\n", text)
+
+# --- Signatures and boilerplate ---
+
+_SIGNATURE_DELIMITER_PATTERN = re.compile(r"^-- ?$", re.MULTILINE)
+_MOBILE_SIGNATURE_PATTERN = re.compile(
+    r"^(?:Sent from my \w+.*|Sent from (?:Outlook|Mail) for \w+.*|Get Outlook for \w+.*|Inviato da(?:l mio)? \w+.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Closings that usually start a signature, and bare ones ('Thanks!', 'Best,') that also open a reply
+_VALEDICTION_PATTERN = re.compile(
+    r"^[ \t]*(?:(?P<formal>(?:best|kind|warm)(?:est)? regards|regards|best wishes|sincerely|cordiali saluti|distinti saluti|saluti|un saluto)"
+    r"|best|thanks(?: again)?|thank you|many thanks|cheers|grazie(?: mille)?)[ \t]*[,.!]?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# A valediction only starts a signature when what follows looks like one: a few short lines
+# (name, title, company, address, contacts) and no sentences
+SIGNATURE_MAX_LINES = 8
+SIGNATURE_MAX_CHARS = 400
+SIGNATURE_LINE_MAX_WORDS = 6
+# A bare valediction must also be within this many lines of the end
+BARE_VALEDICTION_MAX_LINES = 3
+_SIGNATURE_CONTACT_PATTERN = re.compile(
+    r"https?://|www\.|@|\+?\d[\d \t()./-]{6,}\d|\b(?:tel|phone|mob(?:ile)?|cell|fax)\b"
+    r"|\b(?:s\.?r\.?l|s\.?p\.?a|ltd|inc|llc|gmbh)\b",
+    re.IGNORECASE,
+)
+_SENTENCE_PATTERN = re.compile(r"^[a-z]|[!?;]|[a-z]{3,}\.[ \t]*$")
+
+_BOILERPLATE_PATTERN = re.compile(
+    r"confidential(?:ity)? notice|this (?:e-?mail|message)(?: and any (?:files|attachments)[^.]*)? (?:is|are|may be) (?:strictly )?(?:confidential|privileged|intended)"
+    r"|if you (?:are not|have received this)[^.]{0,40}(?:intended recipient|in error)"
+    r"|please consider the environment before printing"
+    r"|(?:to )?unsubscribe(?: from)? (?:this|these|our)|you are receiving this (?:e-?mail|message) because"
+    r"|questa e-?mail[^.]{0,60}(?:riservat|confidenzial)|ai sensi del (?:d\.?\s?lgs|regolamento)",
+    re.IGNORECASE,
+)
+_PARAGRAPH_SPLIT_PATTERN = re.compile(r"\n[ \t]*\n")
+_SPACES_PATTERN = re.compile(r"[ \t\xa0]+")
+_BLANK_LINES_PATTERN = re.compile(r"\n[ \t]*(?:\n[ \t]*)+")
+
+def _looks_like_signature(tail: str) -> bool:
+    lines = [line.strip() for line in tail.splitlines() if line.strip()]
+    if len(tail) > SIGNATURE_MAX_CHARS or len(lines) > SIGNATURE_MAX_LINES:
+        return False
+    for line in lines:
+        if _SIGNATURE_CONTACT_PATTERN.search(line):
+            continue
+        if len(line.split()) > SIGNATURE_LINE_MAX_WORDS or _SENTENCE_PATTERN.search(line):
+            return False
+    return True
+
+def strip_signature(text: str) -> str:
+    """
+    Cuts the signature: from an RFC 3676 '-- ' delimiter, a mobile client signature, or a closing
+    valediction followed only by signature-like lines. A bare 'Thanks!' or 'Best,' also has to be
+    within the last few lines, since it often opens the actual message.
+    """
+    delimiter = _SIGNATURE_DELIMITER_PATTERN.search(text)
+    if delimiter:
+        text = text[:delimiter.start()]
+    text = _MOBILE_SIGNATURE_PATTERN.sub("", text)
+    for valediction in _VALEDICTION_PATTERN.finditer(text, max(len(text) - SIGNATURE_MAX_CHARS - 40, 0)):
+        tail = text[valediction.end():]
+        if not valediction.group("formal") and sum(1 for line in tail.splitlines() if line.strip()) > BARE_VALEDICTION_MAX_LINES:
+            continue
+        if _looks_like_signature(tail):
+            return text[:valediction.start()]
+    return text
+
+def _normalize_whitespace(text: str) -> str:
+    return _BLANK_LINES_PATTERN.sub("\n\n", _SPACES_PATTERN.sub(" ", text)).strip()
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Drops paragraphs that are legal disclaimers, unsubscribe footers and similar boilerplate.
+    """
+    return "\n\n".join(
+        paragraph for paragraph in _PARAGRAPH_SPLIT_PATTERN.split(text) if not _BOILERPLATE_PATTERN.search(paragraph)
+    )
+
+def clean_email_text(text: str, is_html: bool = False) -> str:
+    """
+    Reduces an email body to the text worth summarizing: HTML converted to text, quoted history,
+    signature and boilerplate removed, whitespace collapsed.
+    """
+    if is_html:
+        text = html_to_text(text)
+    text = text.replace("\r\n", "\n")
+    text = strip_quoted_history(text)
+    # Disclaimers often follow the signature; drop them first so the signature is the tail
+    text = strip_boilerplate(text)
+    return _normalize_whitespace(strip_signature(text))
+
+# --- Deduplication ---
+
+# Paragraphs shorter than this ("Thanks!", "See below") are never treated as duplicates
+DEDUP_MIN_PARAGRAPH_CHARS = 40
+
+def _content_hash(text: str) -> bytes:
+    return hashlib.blake2b(" ".join(text.lower().split()).encode(), digest_size=8).digest()
+
+class ContentDeduplicator:
+    """
+    Removes content already seen earlier in the same thread (e.g. the same update pasted into
+    every reply, or a forwarded message body), using 64-bit hashes of normalized paragraphs.
+    A message whose whole text was already seen, in any thread, is reduced to an empty string, so
+    the summarizer falls back to its snippet.
+    """
+
+    def __init__(self):
+        self._messages: Set[bytes] = set()
+        self._paragraphs: Set[Tuple[str, bytes]] = set()
+        self.duplicate_messages = 0
+        self.duplicate_paragraphs = 0
+        self.chars_removed = 0
+
+    def dedupe(self, text: str, thread_id: str = "") -> str:
+        if not text:
+            return text
+        message_hash = _content_hash(text)
+        if message_hash in self._messages:
+            self.duplicate_messages += 1
+            self.chars_removed += len(text)
+            return ""
+        self._messages.add(message_hash)
+
+        kept = []
+        for paragraph in text.split("\n\n"):
+            if len(paragraph) >= DEDUP_MIN_PARAGRAPH_CHARS:
+                key = (thread_id, _content_hash(paragraph))
+                if key in self._paragraphs:
+                    self.duplicate_paragraphs += 1
+                    self.chars_removed += len(paragraph)
+                    continue
+                self._paragraphs.add(key)
+            kept.append(paragraph)
+        return "\n\n".join(kept)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "duplicate_messages": self.duplicate_messages,
+            "duplicate_paragraphs": self.duplicate_paragraphs,
+            "chars_removed": self.chars_removed,
+        }
@@ -1,21 +1,217 @@
-import httpx
+import asyncio
+import importlib.util
+import logging
+import random
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import settings
+from utils.metrics import HTTP_CONNECTION_WAIT, register_http_pool_collector
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Only requests that are safe to repeat are retried
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+RETRYABLE_STATUS_CODES = (502, 503, 504)
+RETRY_BASE_DELAY_SECONDS = 0.2
+
+# httpcore trace events that set up a new connection; their duration is not time spent waiting for the pool
+_CONNECTION_SETUP_EVENTS = ("connection.connect_tcp", "connection.start_tls", "http2.send_connection_init")
+
+class PoolStats:
+    """
+    Counters of one transport: requests, retries, new connections and time spent waiting for a pooled connection.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.connection_waits = 0
+        self.connection_wait_total_seconds = 0.0
+        self.connection_wait_max_seconds = 0.0
+
+    def observe_connection_wait(self, seconds: float):
+        self.connection_waits += 1
+        self.connection_wait_total_seconds += seconds
+        self.connection_wait_max_seconds = max(self.connection_wait_max_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = dict(vars(self))
+        snapshot["connection_wait_avg_seconds"] = (
+            round(self.connection_wait_total_seconds / self.connection_waits, 6) if self.connection_waits else 0.0
+        )
+        return snapshot
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Pooled httpx transport with its own timeout, retries of idempotent requests and connection-pool metrics.
+    The time a request waits for a pooled connection is derived from httpcore trace events: everything
+    between entering the transport and sending the request headers, minus connection setup.
+    """
+    def __init__(self, name: str, limits: httpx.Limits, timeout: httpx.Timeout, http2: bool = False, retries: int = 0):
+        self.name = name
+        self.http2 = http2
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = PoolStats()
+        self._transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get("timeout") == HttpClient.DEFAULT_TIMEOUT.as_dict():
+            # Only replace the client default; explicit per-request timeouts win
+            request.extensions["timeout"] = self.timeout.as_dict()
+
+        attempts = self.retries + 1 if request.method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            self.stats.requests += 1
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await self._send(request)
+            except httpx.TransportError:
+                self.stats.errors += 1
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    return response
+                await response.aclose()
+            self.stats.retries += 1
+            await asyncio.sleep(RETRY_BASE_DELAY_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        caller_trace = request.extensions.get("trace")
+        started_at = time.perf_counter()
+        setup_started: Dict[str, float] = {}
+        setup_seconds = 0.0
+        measured = False
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal setup_seconds, measured
+            now = time.perf_counter()
+            prefix, _, phase = event_name.rpartition(".")
+            if prefix in _CONNECTION_SETUP_EVENTS:
+                if phase == "started":
+                    setup_started[prefix] = now
+                    if prefix == "connection.connect_tcp":
+                        self.stats.new_connections += 1
+                elif prefix in setup_started:
+                    setup_seconds += now - setup_started.pop(prefix)
+            elif event_name.endswith("send_request_headers.started") and not measured:
+                measured = True
+                wait_seconds = max(now - started_at - setup_seconds, 0.0)
+                self.stats.observe_connection_wait(wait_seconds)
+                HTTP_CONNECTION_WAIT.labels(pool=self.name).observe(wait_seconds)
+            if caller_trace is not None:
+                result = caller_trace(event_name, info)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        request.extensions["trace"] = trace
+        try:
+            return await self._transport.handle_async_request(request)
+        finally:
+            if caller_trace is not None:
+                request.extensions["trace"] = caller_trace
+            else:
+                request.extensions.pop("trace", None)
+
+    def pool_snapshot(self) -> Dict[str, Any]:
+        """
+        Live state of the connection pool (relies on httpcore's pool introspection).
+        """
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        closed = sum(1 for connection in connections if connection.is_closed())
+        queued = sum(1 for pool_request in getattr(pool, "_requests", []) if pool_request.is_queued())
+        return {
+            "http2": self.http2,
+            "connections": len(connections),
+            "active_connections": len(connections) - idle - closed,
+            "idle_connections": idle,
+            "queued_requests": queued,
+            **self.stats.snapshot(),
+        }
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def _host_timeout(host: str) -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.HTTP_HOST_TIMEOUTS.get(host, settings.HTTP_TIMEOUT_SECONDS),
+        connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+    )
 
 class HttpClient:
+    """
+    Process-wide pooled httpx.AsyncClient.
+    Connection limits, keep-alive expiry and timeouts come from the settings. The Telegram Bot API
+    host gets its own transport, using HTTP/2 when available, and every host listed in
+    HTTP_HOST_TIMEOUTS gets a transport with its own timeout. Idempotent requests are retried on
+    transport errors and 502/503/504 responses.
+    """
+    DEFAULT_TIMEOUT = httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+
     _client: httpx.AsyncClient | None = None
+    _transports: Dict[str, InstrumentedTransport] = {}
+
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        telegram_host = urlsplit(settings.TELEGRAM_API_BASE_URL).hostname
+        http2 = settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+        if settings.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logging.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1 for Telegram.")
+
+        default_transport = InstrumentedTransport("default", limits, cls.DEFAULT_TIMEOUT, retries=settings.HTTP_GET_RETRIES)
+        cls._transports = {"default": default_transport}
+        for host in {telegram_host, *settings.HTTP_HOST_TIMEOUTS}:
+            cls._transports[host] = InstrumentedTransport(
+                host,
+                limits,
+                _host_timeout(host),
+                http2=http2 and host == telegram_host,
+                retries=settings.HTTP_GET_RETRIES,
+            )
+
+        return httpx.AsyncClient(
+            transport=default_transport,
+            mounts={f"all://{host}": transport for host, transport in cls._transports.items() if host != "default"},
+            timeout=cls.DEFAULT_TIMEOUT,
+        )
 
     @classmethod
     def get_client(cls) -> httpx.AsyncClient:
         if cls._client is None:
-            cls._client = httpx.AsyncClient()
+            cls._client = cls._build_client()
         return cls._client
 
+    @classmethod
+    def pool_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Connection-pool metrics per transport (the key is the host, or 'default').
+        """
+        return {name: transport.pool_snapshot() for name, transport in cls._transports.items()}
+
     @classmethod
     async def close_client(cls):
         if cls._client:
             await cls._client.aclose()
             cls._client = None
+            cls._transports = {}
+
+# The pool metrics are read from HttpClient at scrape time
+register_http_pool_collector(HttpClient.pool_stats)
 
 async def get_http_client() -> AsyncGenerator[httpx.AsyncClient, None]:
     """
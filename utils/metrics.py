@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Buckets from 5 ms to 2 min: covers a webhook ack as well as a slow LLM call or a long voice note
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+WEBHOOK_LATENCY = Histogram(
+    "telegram_webhook_latency_seconds",
+    "Time to answer a Telegram webhook request",
+    ["mode", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+TRANSCRIPTION_LATENCY = Histogram(
+    "transcription_latency_seconds",
+    "Time to transcribe a voice message, including the download",
+    ["provider", "source"],
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_LATENCY = Histogram(
+    "agent_latency_seconds",
+    "Time to run one message through the agent graph",
+    ["provider", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+NODE_LATENCY = Histogram(
+    "agent_node_latency_seconds",
+    "Time spent in one LangGraph node",
+    ["provider", "node"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens used, by the graph node (or component) that made the call",
+    ["provider", "node", "kind"],
+)
+TOOL_CALL_LATENCY = Histogram(
+    "tool_call_latency_seconds",
+    "Time to execute a tool call",
+    ["tool", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_CONNECTION_WAIT = Histogram(
+    "http_pool_connection_wait_seconds",
+    "Time a request waited for a pooled HTTP connection (excluding connection setup)",
+    ["pool"],
+    # Waits are usually well under a millisecond; long ones mean the pool is exhausted
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+class HttpPoolCollector(Collector):
+    """
+    Exposes the live connection-pool state and counters of the shared HTTP client at scrape time.
+    pool_stats returns the per-pool snapshots (see HttpClient.pool_stats); it is passed in so that
+    this module does not import the HTTP client.
+    """
+    def __init__(self, pool_stats: Callable[[], Dict[str, Dict[str, Any]]]):
+        self.pool_stats = pool_stats
+
+    def collect(self):
+        connections = GaugeMetricFamily("http_pool_connections", "Connections of an HTTP connection pool", labels=["pool", "state"])
+        queued = GaugeMetricFamily("http_pool_queued_requests", "Requests waiting for a pooled HTTP connection", labels=["pool"])
+        counters = {
+            key: CounterMetricFamily(f"http_pool_{key}", description, labels=["pool"])
+            for key, description in (
+                ("requests", "HTTP requests sent through a pool, including retries"),
+                ("retries", "HTTP requests retried after a transport error or a 502/503/504"),
+                ("errors", "HTTP requests that failed with a transport error"),
+                ("new_connections", "HTTP connections opened by a pool"),
+            )
+        }
+        for pool, snapshot in self.pool_stats().items():
+            connections.add_metric([pool, "active"], snapshot["active_connections"])
+            connections.add_metric([pool, "idle"], snapshot["idle_connections"])
+            queued.add_metric([pool], snapshot["queued_requests"])
+            for key, counter in counters.items():
+                counter.add_metric([pool], snapshot[key])
+        yield connections
+        yield queued
+        yield from counters.values()
+
+def register_http_pool_collector(pool_stats: Callable[[], Dict[str, Dict[str, Any]]]):
+    REGISTRY.register(HttpPoolCollector(pool_stats))
+
+@contextmanager
+def observe_latency(histogram: Histogram, **labels: str) -> Iterator[Dict[str, str]]:
+    """
+    Times the block into histogram. Yields the label dict so the block can fill in labels
+    that are only known at the end; if the block raises without changing 'status', it becomes 'error'.
+    """
+    initial_status = labels.get("status")
+    started_at = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        if initial_status is not None and labels["status"] == initial_status:
+            labels["status"] = "error"
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started_at)
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that counts the tokens reported in usage_metadata into LLM_TOKENS.
+    Calls made inside a LangGraph node are attributed to that node, other calls to default_node.
+    """
+    # Only increments counters, so it can run on the event loop instead of a worker thread
+    run_inline = True
+
+    def __init__(self, provider: str, default_node: str = "other"):
+        self.provider = provider
+        self.default_node = default_node
+        self._nodes: Dict[UUID, str] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any):
+        self._nodes[run_id] = (metadata or {}).get("langgraph_node", self.default_node)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        node = self._nodes.pop(run_id, self.default_node)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                LLM_TOKENS.labels(provider=self.provider, node=node, kind="input").inc(usage.get("input_tokens", 0))
+                LLM_TOKENS.labels(provider=self.provider, node=node, kind="output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._nodes.pop(run_id, None)
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Returns the Prometheus text exposition of every registered metric and its content type.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Async token bucket: refills at rate tokens per second and banks up to capacity tokens.
+    Waiters are served in FIFO order. pause() empties the bucket and blocks it for a while,
+    e.g. when the remote side asks to retry later.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, now + seconds)
+
+    @property
+    def idle(self) -> bool:
+        """
+        True when the bucket is full and nobody is waiting, i.e. it can be dropped without losing state.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        return self._tokens >= self.capacity and now >= self._blocked_until and not self._lock.locked()
+
+    async def acquire(self) -> float:
+        """
+        Takes one token, waiting until one is available. Returns the time spent waiting.
+        """
+        started_at = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - started_at
+                else:
+                    delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
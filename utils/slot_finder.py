@@ -0,0 +1,93 @@
+import heapq
+from datetime import datetime, time, timedelta
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+Interval = Tuple[datetime, datetime]
+
+def merge_busy_intervals(calendars: Iterable[Iterable[Interval]]) -> List[Interval]:
+    """
+    Merges the busy intervals of several calendars into a sorted list of disjoint intervals.
+    Each calendar is sorted on its own (free/busy responses usually already are) and the
+    calendars are combined with a k-way heap merge, so the cost is O(n log k) for sorted input.
+    """
+    sorted_calendars = [sorted(intervals) for intervals in calendars]
+    merged: List[Interval] = []
+    for start, end in heapq.merge(*sorted_calendars):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def working_windows(
+    window_start: datetime,
+    window_end: datetime,
+    tz: ZoneInfo,
+    work_start: time,
+    work_end: time,
+    working_days: Sequence[int],
+) -> Iterator[Interval]:
+    """
+    Yields the working-hours windows (in tz) that fall within [window_start, window_end).
+    working_days uses Monday=0 ... Sunday=6.
+    """
+    day = window_start.astimezone(tz).date()
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day:
+        if day.weekday() in working_days:
+            start = max(datetime.combine(day, work_start, tzinfo=tz), window_start)
+            end = min(datetime.combine(day, work_end, tzinfo=tz), window_end)
+            if start < end:
+                yield start, end
+        day += timedelta(days=1)
+
+def _align_up(moment: datetime, align: timedelta, tz: ZoneInfo) -> datetime:
+    local = moment.astimezone(tz)
+    midnight = datetime.combine(local.date(), time(0), tzinfo=tz)
+    remainder = (local - midnight) % align
+    return local if not remainder else local + (align - remainder)
+
+def find_free_slots(
+    busy: Sequence[Interval],
+    window_start: datetime,
+    window_end: datetime,
+    duration: timedelta,
+    tz: ZoneInfo,
+    work_start: time = time(8, 0),
+    work_end: time = time(18, 0),
+    working_days: Sequence[int] = (0, 1, 2, 3, 4),
+    align: timedelta = timedelta(minutes=15),
+    max_results: int | None = None,
+) -> List[Interval]:
+    """
+    Finds non-overlapping free slots of the given duration inside working hours.
+    busy must be sorted and disjoint (see merge_busy_intervals). A single sweep advances one
+    pointer over the busy intervals and one cursor over the working windows, so the whole search
+    is linear in the number of busy intervals plus working days.
+    Slot starts are aligned to multiples of align from local midnight.
+    """
+    slots: List[Interval] = []
+    busy_index = 0
+    for day_start, day_end in working_windows(window_start, window_end, tz, work_start, work_end, working_days):
+        # Skip busy intervals that ended before this working window
+        while busy_index < len(busy) and busy[busy_index][1] <= day_start:
+            busy_index += 1
+
+        cursor = _align_up(day_start, align, tz)
+        index = busy_index
+        while cursor + duration <= day_end:
+            if index < len(busy) and busy[index][0] < cursor + duration:
+                # The candidate overlaps a busy interval: jump past it
+                if busy[index][1] > cursor:
+                    cursor = _align_up(busy[index][1], align, tz)
+                index += 1
+                continue
+            slots.append((cursor, cursor + duration))
+            if max_results is not None and len(slots) >= max_results:
+                return slots
+            cursor += duration
+    return slots
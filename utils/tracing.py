@@ -0,0 +1,28 @@
+import logging
+from contextlib import nullcontext
+from typing import Any, ContextManager
+
+from core.config import settings
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Tracing is optional
+    trace = None
+
+# Shared no-op context: with tracing disabled a span costs one attribute check and no allocation
+_NO_SPAN = nullcontext()
+
+_tracer = None
+if settings.TRACING_ENABLED:
+    if trace is None:
+        logging.warning("TRACING_ENABLED is set but opentelemetry-api is not installed; spans are disabled.")
+    else:
+        _tracer = trace.get_tracer("ai-assistant")
+
+def span(name: str, **attributes: Any) -> ContextManager:
+    """
+    Opens an OpenTelemetry span when TRACING_ENABLED (exported by whatever SDK the process configured).
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes)